@@ -0,0 +1,370 @@
+"""
+Офлайн-бенчмарк качества и скорости поиска: помогает выбрать threshold, N_PROBE,
+N_LIST, INDEX_TYPE и EMBEDDING_REDUCTION по замерам, а не на глаз.
+
+Запуск: bin/bench_search [--cv путь к cv.json | --synthetic N] [--queries queries.json]
+        [--configs configs.json] [--embedder hash|model|модуль:функция] [--k 30]
+        [--json отчёт.json] [--min-recall 0.9]
+
+Корпус нарезается на чанки так же, как в create_FAISS, и складывается в MetaStore во
+временном каталоге. Для каждой конфигурации строится свой индекс, а поиск идёт через
+search_FAISS.search_records (агрегация по записям и адаптивный k, как на сервере).
+В отчёте: recall@k по размеченным запросам, среднее число различных записей в выдаче,
+p50/p95 задержки одного запроса, память индекса и время сборки.
+
+Запросы с разметкой берутся из --queries ([{"query": ..., "relevant": [telegram_id, ...]}])
+или генерируются по корпусу: пара слов одной записи, релевантны все записи,
+где встречаются оба слова (--save-queries сохраняет набор для следующих прогонов).
+
+Эмбеддер подключаемый. По умолчанию — детерминированная замена модели (HashEmbedder):
+без сети и без кэша эмбеддингов, поэтому прогон воспроизводим и годится для CI.
+С --min-recall код возврата 1, если recall@k какой-либо конфигурации ниже порога.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from importlib import import_module
+from typing import Callable, Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from configs.cfg import (
+    embedding_model,
+    embedding_dim,
+    emb_cache_path,
+    relevant_text_path,
+    threshold,
+    N_PROBE,
+    HNSW_EF_SEARCH,
+    RERANK_OVERFETCH,
+    SEARCH_RECORDS_PER_QUERY,
+)
+from backend.dim_reduction import EmbeddingReducer, normalize_rows
+from backend.faiss_index import apply_search_params, build_index, choose_nlist, index_bytes
+from backend.meta_store import MetaStore, MetaStoreBuilder
+from backend.search_FAISS import rescore, search_records
+from backend.text_norm import STOPWORDS, lexical_tokens, record_chunks, record_lexical_text
+
+Embedder = Callable[[List[str]], np.ndarray]
+
+# конфигурации по умолчанию; в --configs те же ключи, пропущенные берутся из конфига
+DEFAULT_CONFIGS = (
+    {"name": "flat"},
+    {"name": "flat, threshold -0.1", "threshold_delta": -0.1},
+    {"name": "flat, threshold +0.1", "threshold_delta": 0.1},
+    {"name": "ivf_flat, nprobe 4", "index_type": "IVF_FLAT", "nprobe": 4},
+    {"name": "ivf_flat", "index_type": "IVF_FLAT"},
+    {"name": "ivf_sq8, без пересчёта", "index_type": "IVF_SQ8", "rerank": 0},
+    {"name": "ivf_sq8", "index_type": "IVF_SQ8"},
+    {"name": "ivf_pq, без пересчёта", "index_type": "IVF_PQ", "rerank": 0},
+    {"name": "ivf_pq", "index_type": "IVF_PQ"},
+    {"name": "hnsw", "index_type": "HNSW"},
+    {"name": "flat, truncate 1/2", "reduction": "truncate", "dim_ratio": 0.5},
+    {"name": "flat, pca 1/4", "reduction": "pca", "dim_ratio": 0.25},
+)
+
+
+# --- эмбеддеры ---
+
+class HashEmbedder:
+    """
+    Детерминированная замена модели эмбеддингов для офлайн-прогонов и CI: каждое слово
+    и его символьные триграммы дают случайное направление ±1 (по хэшу blake2b), вектор
+    текста — их нормированная сумма. Тексты с общими словами и близким написанием
+    похожи, как и у настоящей модели, но без семантики и синонимов.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self._features: Dict[str, Tuple[int, float]] = {}
+
+    def _feature(self, feature: str) -> Tuple[int, float]:
+        found = self._features.get(feature)
+        if found is None:
+            h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            found = self._features[feature] = (h % self.dim, 1.0 if (h >> 63) & 1 else -1.0)
+        return found
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        vecs = np.zeros((len(texts), self.dim), dtype="float32")
+        for row, text in enumerate(texts):
+            for token in lexical_tokens(text):
+                col, sign = self._feature(token)
+                vecs[row, col] += sign
+                padded = f"#{token}#"
+                for i in range(len(padded) - 2):
+                    col, sign = self._feature(padded[i:i + 3])
+                    vecs[row, col] += 0.5 * sign
+        return normalize_rows(vecs)
+
+
+def model_embedder() -> Embedder:
+    """Модель из конфига (EMBEDDING_MODE) через кэш эмбеддингов create_FAISS."""
+    from backend.create_FAISS import embed_chunks
+    from backend.embedding_cache import EmbeddingCache
+
+    cache = EmbeddingCache(emb_cache_path, embedding_model, embedding_dim)
+    return lambda texts: cache.get_or_embed(texts, embed_chunks)
+
+
+def load_embedder(name: str) -> Embedder:
+    """hash, model или "модуль:имя" — функция texts -> np.ndarray либо класс с такой __call__."""
+    if name == "hash":
+        return HashEmbedder()
+    if name == "model":
+        return model_embedder()
+    module, _, attr = name.partition(":")
+    obj = getattr(import_module(module), attr)
+    return obj() if isinstance(obj, type) else obj
+
+
+def embed_in_batches(embed: Embedder, texts: List[str], batch_size: int = 4096) -> np.ndarray:
+    parts = [embed(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+    return np.ascontiguousarray(np.concatenate(parts), dtype="float32")
+
+
+# --- корпус и запросы ---
+
+ROLES = ("Python разработчик", "Go разработчик", "Frontend разработчик", "DevOps инженер", "Data Scientist",
+         "ML инженер", "аналитик данных", "продакт-менеджер", "SMM специалист", "HR менеджер",
+         "дизайнер интерфейсов", "QA инженер", "CTO", "1С программист", "системный администратор")
+SKILLS = ("Django", "FastAPI", "PostgreSQL", "Kubernetes", "Docker", "React", "TypeScript", "PyTorch", "pandas",
+          "Airflow", "Figma", "Jira", "Selenium", "Terraform", "Kafka", "Redis", "ClickHouse", "n8n", "Tableau",
+          "Excel", "Linux", "Ansible", "Spark", "GraphQL", "Vue", "Swift", "Kotlin", "Unity", "SEO", "Photoshop")
+CITIES = ("Москва", "Белград", "Тбилиси", "Ереван", "Алматы", "Берлин", "удалённо")
+FILLER = ("Ищу интересные проекты и сильную команду.", "Готов к релокации.", "Есть опыт менторства.",
+          "Открыт к предложениям о работе.", "Работал в стартапах и крупных компаниях.", "Пишите в личку.")
+
+
+def synthetic_records(n: int = 500, seed: int = 0) -> List[Dict]:
+    """Синтетические резюме: роль, стаж, стек, город — достаточно, чтобы запросы различали записи."""
+    rnd = random.Random(seed)
+    records = []
+    for i in range(n):
+        role = rnd.choice(ROLES)
+        skills = ", ".join(rnd.sample(SKILLS, rnd.randint(3, 7)))
+        content = (f"#ищу_работу {role}. Опыт {rnd.randint(1, 15)} лет. Стек: {skills}. "
+                   f"Город: {rnd.choice(CITIES)}. {' '.join(rnd.sample(FILLER, 2))}")
+        records.append({"telegram_id": i, "date": "2024-01-01T00:00:00", "content": content,
+                        "author": f"@user{i}", "media_path": None, "c_translated": None})
+    return records
+
+
+def load_records(path: str) -> List[Dict]:
+    from backend.create_FAISS import flatten_json
+    with open(path, encoding="utf-8") as f:
+        records = flatten_json(json.load(f))
+    # как и в индексе, из повторов telegram_id остаётся последняя версия записи
+    return list({rec["telegram_id"]: rec for rec in records}.values())
+
+
+def build_corpus(records: List[Dict], path: str) -> MetaStore:
+    """MetaStore корпуса: записи и уникальные чанки с posting-списками, как в create_FAISS."""
+    meta = MetaStoreBuilder(path)
+    for rec in records:
+        rec_idx = meta.add_record(rec)
+        for chunk in record_chunks(rec):
+            meta.add_chunk_ref(chunk, rec_idx)
+    meta.flush(compact=True)
+    meta.close()
+    return MetaStore(path)
+
+
+def generate_queries(meta: MetaStore, n: int = 100, seed: int = 0, words: int = 2,
+                     max_relevant: int = SEARCH_RECORDS_PER_QUERY) -> List[Dict]:
+    """
+    Запросы из слов случайных записей (без стоп-слов и чисел, каждое слово — не больше
+    чем в четверти записей). Релевантны все записи, где есть все слова запроса; запросы,
+    у которых таких записей больше max_relevant, отбрасываются.
+    """
+    tids = np.asarray(meta.telegram_ids).tolist()
+    docs = [set(lexical_tokens(record_lexical_text(meta.record(i)))) for i in range(meta.n_records)]
+    df = Counter(token for doc in docs for token in doc)
+    max_df = max(2, len(docs) // 4)
+    rnd = random.Random(seed)
+    queries, seen = [], set()
+    for rec_idx in rnd.sample(range(len(docs)), len(docs)):
+        candidates = sorted(t for t in docs[rec_idx]
+                            if len(t) > 2 and t not in STOPWORDS and not t.isdigit() and df[t] <= max_df)
+        if len(candidates) < words:
+            continue
+        terms = rnd.sample(candidates, words)
+        query = " ".join(terms)
+        relevant = [tid for tid, doc in zip(tids, docs) if doc.issuperset(terms)]
+        if query in seen or len(relevant) > max_relevant:
+            continue
+        seen.add(query)
+        queries.append({"query": query, "relevant": relevant})
+        if len(queries) >= n:
+            break
+    return queries
+
+
+# --- конфигурации ---
+
+class BenchShard:
+    """
+    Шард для search_records: индекс конфигурации поверх общего MetaStore корпуса.
+    При rerank > 1 кандидаты пересчитываются точно, как в SearchShard (vectors[id чанка]).
+    """
+
+    def __init__(self, index: faiss.Index, metadata: MetaStore, reducer: EmbeddingReducer,
+                 vectors: np.ndarray, rerank: int = 0):
+        self.index = index
+        self.metadata = metadata
+        self.reducer = reducer
+        self.vectors = vectors
+        self.rerank = rerank
+
+    def search(self, vecs: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        vecs = self.reducer.transform(vecs)
+        if self.rerank <= 1:
+            return self.index.search(vecs, k)
+        scores, ids = self.index.search(vecs, k * self.rerank)
+        return rescore(self.vectors, ids, vecs, scores, ids, k)
+
+
+def run_config(config: Dict, meta: MetaStore, vecs: np.ndarray, ids: np.ndarray, queries: List[Dict],
+               query_vecs: np.ndarray, k: int) -> Optional[Dict]:
+    kind = config.get("index_type", "FLAT")
+    mode = config.get("reduction", "")
+    in_dim = vecs.shape[1]
+    dim = config.get("dim") or (int(in_dim * config["dim_ratio"]) if "dim_ratio" in config else None)
+    min_score = config.get("threshold", threshold + config.get("threshold_delta", 0.0))
+    nlist = (config.get("nlist") or choose_nlist(len(ids), force=True)) if kind.startswith("IVF") else 0
+
+    started = time.perf_counter()
+    try:
+        reducer = EmbeddingReducer("", mode, in_dim, dim)
+        reducer.fit(vecs)
+        reduced = reducer.transform(vecs)
+        index = build_index(reduced, ids, kind, nlist)
+    except (RuntimeError, ValueError) as e:
+        print(f"[BENCH] {config['name']} пропущена: {e}")
+        return None
+    build_s = time.perf_counter() - started
+    apply_search_params(index, nprobe=config.get("nprobe", N_PROBE), ef_search=config.get("ef_search", HNSW_EF_SEARCH))
+    # как на сервере: пересчёт только для сжатых индексов
+    rerank = config.get("rerank", RERANK_OVERFETCH if kind in ("IVF_SQ8", "IVF_PQ") else 0)
+    shard = BenchShard(index, meta, reducer, reduced, rerank)
+
+    tids = np.asarray(meta.telegram_ids)
+    recalls, n_found, latencies = [], [], []
+    for query, vec in zip(queries, query_vecs):
+        # запросы по одному, как их ищет сервер
+        started = time.perf_counter()
+        _, keys, _, _ = search_records([shard], vec[None, :], n_records=k, min_score=min_score)
+        latencies.append((time.perf_counter() - started) * 1000)
+        found = set(tids[keys & 0xFFFFFFFF].tolist())
+        relevant = set(query["relevant"])
+        n_found.append(len(found))
+        if relevant:
+            recalls.append(len(found & relevant) / min(k, len(relevant)))
+
+    memory = index_bytes(index)
+    return {
+        "name": config["name"],
+        "index": kind,
+        "nlist": nlist,
+        "rerank": rerank if rerank > 1 else 0,
+        "dim": reducer.out_dim,
+        "threshold": round(float(min_score), 4),
+        "memory_mb": memory / 2 ** 20,
+        "bytes_per_vector": memory / max(len(ids), 1),
+        "build_s": build_s,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        f"recall@{k}": float(np.mean(recalls)) if recalls else 0.0,
+        "records": float(np.mean(n_found)),
+    }
+
+
+def print_report(rows: List[Dict], n_records: int, n_vectors: int, dim: int, n_queries: int, k: int):
+    print(f"\n[BENCH] {n_records} записей, {n_vectors} векторов, dim={dim}, {n_queries} запросов, k={k}")
+    print(f"{'конфигурация':<24} {'dim':>5} {'пересчёт':>8} {'порог':>6} {'память МБ':>10} {'Б/вектор':>9} {'сборка с':>9} "
+          f"{'p50 мс':>8} {'p95 мс':>8} {f'recall@{k}':>10} {'записей':>8}")
+    for r in rows:
+        print(f"{r['name']:<24} {r['dim']:>5} {r['rerank'] or '-':>8} {r['threshold']:>6.2f} {r['memory_mb']:>10.2f} "
+              f"{r['bytes_per_vector']:>9.0f} {r['build_s']:>9.2f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} "
+              f"{r[f'recall@{k}']:>10.3f} {r['records']:>8.1f}")
+
+
+def main(argv: Optional[List[str]] = None) -> bool:
+    parser = argparse.ArgumentParser(prog="bench_search", description="Офлайн-бенчмарк конфигураций поиска FAISS")
+    parser.add_argument("--cv", help="cv.json (по умолчанию из relevant_text_path, иначе синтетический корпус)")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="синтетический корпус из N записей")
+    parser.add_argument("--queries", help="запросы с разметкой (JSON)")
+    parser.add_argument("--n-queries", type=int, default=100, help="сколько запросов генерировать")
+    parser.add_argument("--save-queries", help="сохранить сгенерированные запросы (JSON)")
+    parser.add_argument("--configs", help="конфигурации (JSON-список), по умолчанию DEFAULT_CONFIGS")
+    parser.add_argument("--embedder", default="hash", help="hash, model или модуль:функция")
+    parser.add_argument("--k", type=int, default=SEARCH_RECORDS_PER_QUERY, help="записей в выдаче на запрос")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="сохранить отчёт (JSON)")
+    parser.add_argument("--min-recall", type=float, help="порог recall@k для CI")
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        records, source = synthetic_records(args.synthetic, args.seed), "синтетический корпус"
+    else:
+        path = args.cv or os.path.join(relevant_text_path, "cv.json")
+        if os.path.exists(path):
+            records, source = load_records(path), path
+        else:
+            records, source = synthetic_records(seed=args.seed), "синтетический корпус"
+    print(f"[BENCH] Записей: {len(records)} ({source}), эмбеддер: {args.embedder}")
+
+    if args.configs:
+        with open(args.configs, encoding="utf-8") as f:
+            configs = json.load(f)
+    else:
+        configs = DEFAULT_CONFIGS
+    embed = load_embedder(args.embedder)
+
+    with tempfile.TemporaryDirectory(prefix="bench_search_") as workdir:
+        meta = build_corpus(records, os.path.join(workdir, "meta"))
+        if args.queries:
+            with open(args.queries, encoding="utf-8") as f:
+                queries = json.load(f)
+        else:
+            queries = generate_queries(meta, args.n_queries, args.seed, max_relevant=args.k)
+            if args.save_queries:
+                with open(args.save_queries, "w", encoding="utf-8") as f:
+                    json.dump(queries, f, ensure_ascii=False, indent=1)
+        if not queries:
+            print("[BENCH] Нет запросов для оценки.")
+            return False
+
+        ids = np.arange(meta.n_chunks, dtype="int64")
+        vecs = embed_in_batches(embed, meta.all_chunks())
+        query_vecs = embed_in_batches(embed, [q["query"] for q in queries])
+
+        rows = []
+        for config in configs:
+            row = run_config(config, meta, vecs, ids, queries, query_vecs, args.k)
+            if row is not None:
+                rows.append(row)
+        print_report(rows, meta.n_records, len(ids), vecs.shape[1], len(queries), args.k)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"source": source, "embedder": args.embedder, "k": args.k, "n_queries": len(queries),
+                       "rows": rows}, f, ensure_ascii=False, indent=1)
+
+    if args.min_recall is not None:
+        failed = [r["name"] for r in rows if r[f"recall@{args.k}"] < args.min_recall]
+        if failed:
+            print(f"[BENCH] recall@{args.k} ниже {args.min_recall}: {', '.join(failed)}")
+            return False
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
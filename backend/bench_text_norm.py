@@ -0,0 +1,148 @@
+"""
+Микро-бенчмарк нормализации текста: прежние функции нарезки (re без компиляции,
+поиск стоп-слов по списку) против backend.text_norm и пула процессов.
+
+Запуск: bin/bench_text_norm [путь к cv.json] — без аргумента берётся cv.json
+из relevant_text_path, при его отсутствии — синтетический корпус.
+"""
+import json
+import os
+import random
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List
+
+from backend import text_norm
+from utils.ij_remover import ENGLISH_INTERJECTIONS_AND_CONJUNCTIONS, RUSSIAN_INTERJECTIONS_AND_CONJUNCTIONS
+
+
+# --- прежняя реализация (create_FAISS / utils.ij_remover до text_norm), эталон для сравнения ---
+
+def legacy_remove_interjections(strings):
+    inter = RUSSIAN_INTERJECTIONS_AND_CONJUNCTIONS + ENGLISH_INTERJECTIONS_AND_CONJUNCTIONS
+    s2 = []
+    for string in strings:
+        for s in string.split():
+            s_t = re.sub(r'[,.]', '', s)
+            if len(s_t) < 2:
+                continue
+            if s_t not in inter:
+                s2.append(s)
+    return s2
+
+
+def legacy_split_author_chunks(text: str) -> List[str]:
+    tokens = text.split()
+    return legacy_remove_interjections([' '.join(tokens[i:i + 1]) for i in range(len(tokens))]) + \
+        [' '.join(tokens[i:i + 2]) for i in range(len(tokens) - 1)]
+
+
+def legacy_clean_formatting(text: str) -> str:
+    if not text:
+        return text
+    patterns = [r'\*\*(.*?)\*\*', r'__(.*?)__', r'\*(.*?)\*', r'_(.*?)_', r'~~(.*?)~~', r'`(.*?)`', r'```(.*?)```']
+    for pattern in patterns:
+        text = re.sub(pattern, r'\1', text, flags=re.DOTALL)
+    single_patterns = [r'^(\*\*|\*|__|_|~~|`)(.*)$', r'^(.*?)(\*\*|\*|__|_|~~|`)$']
+    for pattern in single_patterns:
+        match = re.match(pattern, text.strip())
+        if match:
+            if pattern.startswith('^(\\*\\*'):
+                text = match.group(2).strip()
+            else:
+                text = match.group(1).strip()
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def legacy_split_content_chunks(text: str) -> List[str]:
+    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
+    sentences = [s.strip() for s in sentences if s.strip()]
+    tokens = text.split()
+    return (
+            sentences +
+            legacy_remove_interjections([' '.join(tokens[i:i + 1]) for i in range(len(tokens))]) +
+            [' '.join(tokens[i:i + 2]) for i in range(len(tokens) - 1)] +
+            [' '.join(tokens[i:i + 3]) for i in range(len(tokens) - 2)]
+    )
+
+
+def legacy_record_chunks(rec: Dict) -> List[str]:
+    a_chunks = legacy_split_author_chunks(f"{rec['author']}")
+    c_chunks = legacy_split_content_chunks(f"{rec['content']}")
+    d_chunks = []
+    if 'c_translated' in rec and rec['c_translated']:
+        d_chunks = legacy_split_content_chunks(f"{rec['c_translated']}")
+    cleaned = (legacy_clean_formatting(ch) for ch in a_chunks + c_chunks + d_chunks)
+    return [ch for ch in cleaned if ch]
+
+
+# --- корпус ---
+
+def load_records(path: str) -> List[Dict]:
+    from backend.create_FAISS import flatten_json
+    with open(path, encoding="utf-8") as f:
+        return flatten_json(json.load(f))
+
+
+def synthetic_records(n: int = 300, seed: int = 0) -> List[Dict]:
+    rnd = random.Random(seed)
+    words = ("Python", "разработчик", "**опыт**", "и", "backend", "`SQL`", "_Django_", "в", "команде", "ML,",
+             "senior", "что", "Kubernetes.", "~~junior~~", "проекты!", "data", "так", "лет", "Go", "__Rust__")
+    sentence = lambda: " ".join(rnd.choice(words) for _ in range(rnd.randint(5, 15))) + rnd.choice(".!?")
+    return [{
+        "telegram_id": i,
+        "author": f"@user{i} **Имя** Фамилия",
+        "content": " ".join(sentence() for _ in range(rnd.randint(5, 30))),
+        "c_translated": " ".join(sentence() for _ in range(rnd.randint(0, 10))),
+    } for i in range(n)]
+
+
+def timed(fn: Callable, *args) -> float:
+    started = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - started
+
+
+def main(path: str = None):
+    if path is None:
+        from configs.cfg import relevant_text_path
+        candidate = os.path.join(relevant_text_path, "cv.json")
+        path = candidate if os.path.exists(candidate) else None
+    records = load_records(path) if path else synthetic_records()
+    print(f"[BENCH] Записей: {len(records)} ({path or 'синтетический корпус'})")
+
+    # результат обязан совпадать с прежним один в один, иначе id чанков в индексе разъедутся
+    legacy = [legacy_record_chunks(rec) for rec in records]
+    fast = [text_norm.record_chunks(rec) for rec in records]
+    mismatched = sum(a != b for a, b in zip(legacy, fast))
+    print(f"[BENCH] Чанков: {sum(map(len, fast))}, расхождений с прежней реализацией: {mismatched}")
+
+    chunks = [ch for rec in records for ch in text_norm.split_content_chunks(f"{rec['content']}")]
+    t_legacy_clean = timed(lambda: [legacy_clean_formatting(ch) for ch in chunks])
+    t_fast_clean = timed(lambda: [text_norm.clean_formatting(ch) for ch in chunks])
+    t_legacy_ij = timed(legacy_remove_interjections, chunks)
+    t_fast_ij = timed(text_norm.remove_interjections, chunks)
+    t_legacy = timed(lambda: [legacy_record_chunks(rec) for rec in records])
+    t_fast = timed(lambda: [text_norm.record_chunks(rec) for rec in records])
+
+    workers = os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(text_norm.record_chunks, records[:workers]))  # прогрев процессов
+        chunksize = max(1, len(records) // (4 * workers))
+        t_pool = timed(lambda: list(pool.map(text_norm.record_chunks, records, chunksize=chunksize)))
+
+    rows = [
+        ("clean_formatting", t_legacy_clean, t_fast_clean),
+        ("remove_interjections", t_legacy_ij, t_fast_ij),
+        ("record_chunks", t_legacy, t_fast),
+        (f"record_chunks, пул {workers} процессов", t_legacy, t_pool),
+    ]
+    for name, before, after in rows:
+        print(f"[BENCH] {name:<36} было {before:8.3f}с  стало {after:8.3f}с  x{before / max(after, 1e-9):.1f}")
+    return mismatched == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main(sys.argv[1] if len(sys.argv) > 1 else None) else 1)
@@ -0,0 +1,237 @@
+import json
+import os
+import threading
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from configs.cfg import BM25_K1, BM25_B
+from backend.meta_store import MetaStore, _load_array, _save_array
+from backend.text_norm import lexical_tokens, record_lexical_text
+
+
+class BM25Index:
+    """
+    Лексический индекс BM25 по записям MetaStore (файлы bm25.* в каталоге MetaStore).
+
+    Файлы:
+        bm25.info.json    — число документов и термов (пишется последним, точка коммита)
+        bm25.terms.txt    — термы по одному на строку, id терма = номер строки
+        bm25.term.off.npy — int64 смещения posting-списков термов, n_terms + 1
+        bm25.doc.npy      — int32 индексы записей MetaStore (терм -> записи, CSR)
+        bm25.tf.npy       — float32 частота терма в записи
+        bm25.len.npy      — int32 длина записи в токенах
+
+    Документ = строка MetaStore, поэтому удалённые и заменённые версии записей
+    отсекаются маской records.alive, а idf и средняя длина считаются по живым записям
+    при первом запросе. Запрос оценивается одним разреженным умножением (np.bincount по
+    posting-спискам его термов) и argpartition для top-k.
+    """
+
+    INFO = "bm25.info.json"
+
+    def __init__(self, path: str, alive: np.ndarray, k1: float = BM25_K1, b: float = BM25_B):
+        self.path = path
+        with open(self._file(self.INFO), "r", encoding="utf-8") as f:
+            info = json.load(f)
+        self.n_docs = info["n_docs"]
+        self.n_terms = info["n_terms"]
+        self._terms_bytes = info["terms_bytes"]
+        self.offsets = np.asarray(_load_array(self._file("bm25.term.off.npy")))
+        self.docs = _load_array(self._file("bm25.doc.npy"))
+        self.tfs = _load_array(self._file("bm25.tf.npy"))
+        self.k1 = k1
+        self.b = b
+        self._alive_src = alive
+        self._lock = threading.Lock()
+        self._term_ids = None
+        self._stats = None
+
+    @property
+    def term_ids(self) -> Dict[str, int]:
+        # словарь термов и статистика BM25 строятся при первом запросе, а не при старте сервера
+        if self._term_ids is None:
+            with self._lock:
+                if self._term_ids is None:
+                    with open(self._file("bm25.terms.txt"), "rb") as f:
+                        terms = f.read(self._terms_bytes).decode("utf-8").split("\n")[:self.n_terms]
+                    self._term_ids = {term: i for i, term in enumerate(terms)}
+        return self._term_ids
+
+    def _load_stats(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(alive, idf, norm); считаются один раз."""
+        if self._stats is None:
+            with self._lock:
+                if self._stats is None:
+                    doc_len = np.asarray(_load_array(self._file("bm25.len.npy")), dtype="float32")
+                    alive = np.zeros(self.n_docs, dtype=bool)
+                    src = self._alive_src
+                    alive[:min(len(src), self.n_docs)] = np.asarray(src[:self.n_docs], dtype=bool)
+                    n_live = int(alive.sum())
+                    avgdl = float(doc_len[alive].mean()) if n_live else 1.0
+                    # df только по живым записям: удалённые версии остаются в posting-списках
+                    posting_terms = np.repeat(np.arange(self.n_terms), np.diff(self.offsets))
+                    df = np.bincount(posting_terms[alive[np.asarray(self.docs)]], minlength=self.n_terms)
+                    idf = np.log1p((n_live - df + 0.5) / (df + 0.5)).astype("float32")
+                    norm = (self.k1 * (1 - self.b + self.b * doc_len / max(avgdl, 1e-6))).astype("float32")
+                    self._stats = alive, idf, norm
+        return self._stats
+
+    @property
+    def alive(self) -> np.ndarray:
+        return self._load_stats()[0]
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        return os.path.exists(os.path.join(path, cls.INFO))
+
+    def lookup(self, tokens: List[str]) -> List[int]:
+        """id известных индексу термов (без повторов)."""
+        return list(dict.fromkeys(self.term_ids[t] for t in tokens if t in self.term_ids))
+
+    def postings(self, term_id: int) -> np.ndarray:
+        """Записи, в которых встречается терм (вместе с удалёнными версиями)."""
+        return self.docs[self.offsets[term_id]:self.offsets[term_id + 1]]
+
+    def match_all(self, token_groups: List[List[str]]) -> np.ndarray:
+        """
+        Живые записи, где из каждой группы встречается хотя бы один терм
+        (группа — слово запроса и его эквиваленты). Только posting-списки, без BM25.
+        """
+        docs = None
+        for group in token_groups:
+            term_ids = self.lookup(group)
+            if not term_ids:
+                return np.zeros(0, dtype="int64")
+            found = np.unique(np.concatenate([self.postings(t) for t in term_ids]))
+            docs = found if docs is None else np.intersect1d(docs, found, assume_unique=True)
+        if docs is None:
+            return np.zeros(0, dtype="int64")
+        return docs[self.alive[docs]].astype("int64")
+
+    def search(self, tokens: List[str], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """top-k живых записей по BM25: (индексы записей, score) по убыванию score."""
+        term_ids = self.lookup(tokens)
+        if not term_ids:
+            return np.zeros(0, dtype="int64"), np.zeros(0, dtype="float32")
+        alive, idf_all, norm = self._load_stats()
+        docs = np.concatenate([self.postings(t) for t in term_ids])
+        tfs = np.concatenate([self.tfs[self.offsets[t]:self.offsets[t + 1]] for t in term_ids])
+        idf = np.repeat(idf_all[term_ids], [self.offsets[t + 1] - self.offsets[t] for t in term_ids])
+        weights = idf * tfs * (self.k1 + 1) / (tfs + norm[docs])
+        scores = np.bincount(docs, weights, minlength=self.n_docs).astype("float32")
+        scores[~alive] = 0
+        found = np.flatnonzero(scores)
+        if len(found) > k:
+            found = found[np.argpartition(-scores[found], k - 1)[:k]]
+        found = found[np.argsort(-scores[found], kind="stable")]
+        return found, scores[found]
+
+
+class BM25IndexBuilder:
+    """
+    Дополняет BM25Index новыми записями MetaStore. Термы только дописываются
+    в bm25.terms.txt, CSR-массивы пересобираются целиком (новые пары терм-запись
+    вливаются сортировкой numpy) и заменяются через os.replace.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if BM25Index.exists(path):
+            with open(os.path.join(path, BM25Index.INFO), "r", encoding="utf-8") as f:
+                info = json.load(f)
+            with open(os.path.join(path, "bm25.terms.txt"), "rb") as f:
+                terms = f.read(info["terms_bytes"]).decode("utf-8").split("\n")[:info["n_terms"]]
+            self.terms_bytes = info["terms_bytes"]
+            self.offsets = np.asarray(_load_array(os.path.join(path, "bm25.term.off.npy")))
+            self.docs = np.asarray(_load_array(os.path.join(path, "bm25.doc.npy")))
+            self.tfs = np.asarray(_load_array(os.path.join(path, "bm25.tf.npy")))
+            self.doc_len = np.asarray(_load_array(os.path.join(path, "bm25.len.npy"))).tolist()
+        else:
+            terms, self.terms_bytes = [], 0
+            self.offsets = np.zeros(1, dtype="int64")
+            self.docs = np.zeros(0, dtype="int32")
+            self.tfs = np.zeros(0, dtype="float32")
+            self.doc_len = []
+        self.term_ids: Dict[str, int] = {term: i for i, term in enumerate(terms)}
+        self._new_terms: List[str] = []
+        self._new_postings: List[Tuple[int, int, int]] = []  # (терм, запись, tf)
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.doc_len)
+
+    def add(self, rec_idx: int, text: str):
+        """Добавляет запись; записи добавляются подряд, начиная с n_docs."""
+        if rec_idx != self.n_docs:
+            raise ValueError(f"BM25: ожидалась запись {self.n_docs}, получена {rec_idx}")
+        tokens = lexical_tokens(text)
+        for term, tf in Counter(tokens).items():
+            tid = self.term_ids.get(term)
+            if tid is None:
+                tid = self.term_ids[term] = len(self.term_ids)
+                self._new_terms.append(term)
+            self._new_postings.append((tid, rec_idx, tf))
+        self.doc_len.append(len(tokens))
+
+    def flush(self):
+        n_terms = len(self.term_ids)
+        old_terms = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+        new = np.array(self._new_postings, dtype="int64").reshape(-1, 3)
+        terms = np.concatenate([old_terms, new[:, 0]])
+        # стабильная сортировка сохраняет порядок записей внутри терма: новые записи идут после старых
+        order = np.argsort(terms, kind="stable")
+        docs = np.concatenate([self.docs, new[:, 1]]).astype("int32")[order]
+        tfs = np.concatenate([self.tfs, new[:, 2]]).astype("float32")[order]
+        offsets = np.zeros(n_terms + 1, dtype="int64")
+        np.cumsum(np.bincount(terms, minlength=n_terms), out=offsets[1:])
+
+        terms_path = os.path.join(self.path, "bm25.terms.txt")
+        blob = "".join(f"{term}\n" for term in self._new_terms).encode("utf-8")
+        with open(terms_path, "ab") as f:
+            # хвост от прерванной записи обрезаем по закоммиченному размеру
+            f.truncate(self.terms_bytes)
+            f.write(blob)
+        self.terms_bytes += len(blob)
+
+        _save_array(os.path.join(self.path, "bm25.term.off.npy"), offsets)
+        _save_array(os.path.join(self.path, "bm25.doc.npy"), docs)
+        _save_array(os.path.join(self.path, "bm25.tf.npy"), tfs)
+        _save_array(os.path.join(self.path, "bm25.len.npy"), np.asarray(self.doc_len, dtype="int32"))
+
+        info_path = os.path.join(self.path, BM25Index.INFO)
+        with open(f"{info_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"n_docs": self.n_docs, "n_terms": n_terms, "terms_bytes": self.terms_bytes}, f)
+        os.replace(f"{info_path}.tmp", info_path)
+
+        self.offsets, self.docs, self.tfs = offsets, docs, tfs
+        self._new_terms, self._new_postings = [], []
+
+
+def sync_lexical_index(meta_path: str, batch_size: int = 5000) -> int:
+    """
+    Догоняет BM25-индекс до MetaStore: индексирует записи, добавленные после
+    последней синхронизации (записи MetaStore только дописываются). Возвращает
+    число добавленных записей.
+    """
+    store = MetaStore(meta_path)
+    builder = BM25IndexBuilder(meta_path)
+    if builder.n_docs > store.n_records:
+        # MetaStore пересоздан (например, после смены EMBEDDING_REDUCTION) — индекс строится заново
+        for name in os.listdir(meta_path):
+            if name.startswith("bm25."):
+                os.remove(os.path.join(meta_path, name))
+        builder = BM25IndexBuilder(meta_path)
+
+    start = builder.n_docs
+    for first in range(start, store.n_records, batch_size):
+        for rec_idx in range(first, min(first + batch_size, store.n_records)):
+            builder.add(rec_idx, record_lexical_text(store.record(rec_idx)))
+        builder.flush()
+    if not BM25Index.exists(meta_path):
+        builder.flush()
+    return store.n_records - start
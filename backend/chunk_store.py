@@ -0,0 +1,139 @@
+import json
+import os
+from typing import List, Optional
+
+import numpy as np
+
+
+class ChunkVectorStore:
+    """
+    Векторы чанков по записям в CSR-раскладке (каталог вместо pickled chunk.npy).
+
+    Файлы:
+        info.json     — dim, dtype, число строк и сегментов (пишется последним)
+        vectors.bin   — одна непрерывная матрица векторов (float32 или float16)
+        rows.cid.bin  — int64 id чанка (= id вектора в FAISS) для каждой строки
+        seg.tid.bin   — int64 telegram_id сегмента
+        seg.end.bin   — int64 конец сегмента в строках (начало = конец предыдущего)
+
+    Все файлы только дописываются, поэтому обновление стоит O(новых данных).
+    Если у telegram_id несколько сегментов, актуален последний. Чтение — через
+    np.memmap и только при первом обращении.
+    """
+
+    INFO = "info.json"
+
+    def __init__(self, path: str, dim: Optional[int] = None, dtype: str = "float32"):
+        self.path = path
+        info_path = os.path.join(path, self.INFO)
+        if os.path.exists(info_path):
+            with open(info_path, "r", encoding="utf-8") as f:
+                info = json.load(f)
+        else:
+            info = {"dim": dim, "dtype": dtype, "n_rows": 0, "n_segments": 0}
+        self.dim = info["dim"]
+        self.dtype = np.dtype(info["dtype"])
+        self.n_rows = info["n_rows"]
+        self.n_segments = info["n_segments"]
+        self._vectors = self._chunk_ids = None
+        self._segments = None
+        self._row_of = None
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        return os.path.exists(os.path.join(path, cls.INFO))
+
+    def _map(self, name: str, dtype, rows: int, shape=None):
+        if rows == 0:
+            return np.zeros(shape or (0,), dtype=dtype)
+        return np.memmap(self._file(name), dtype=dtype, mode="r", shape=shape or (rows,))
+
+    @property
+    def vectors(self) -> np.ndarray:
+        if self._vectors is None:
+            self._vectors = self._map("vectors.bin", self.dtype, self.n_rows, (self.n_rows, self.dim))
+        return self._vectors
+
+    @property
+    def chunk_ids(self) -> np.ndarray:
+        if self._chunk_ids is None:
+            self._chunk_ids = self._map("rows.cid.bin", "int64", self.n_rows)
+        return self._chunk_ids
+
+    def rows_of(self, chunk_ids: np.ndarray) -> np.ndarray:
+        """
+        Строки vectors.bin для id чанков (-1, если вектора нет). Чанк, общий для нескольких
+        записей, хранится в нескольких строках с одинаковым вектором — берётся любая.
+        """
+        if self._row_of is None:
+            cids = np.asarray(self.chunk_ids)
+            row_of = np.full(int(cids.max(initial=-1)) + 1, -1, dtype="int64")
+            row_of[cids] = np.arange(self.n_rows)
+            self._row_of = row_of
+        ids = np.asarray(chunk_ids, dtype="int64")
+        known = (ids >= 0) & (ids < len(self._row_of))
+        rows = np.full(ids.shape, -1, dtype="int64")
+        rows[known] = self._row_of[ids[known]]
+        return rows
+
+    def _segment_index(self) -> dict:
+        if self._segments is None:
+            tids = self._map("seg.tid.bin", "int64", self.n_segments)
+            ends = self._map("seg.end.bin", "int64", self.n_segments)
+            starts = np.concatenate([[0], ends[:-1]]) if self.n_segments else ends
+            self._segments = {int(t): (int(s), int(e)) for t, s, e in zip(tids, starts, ends)}
+        return self._segments
+
+    def get(self, telegram_id: int) -> np.ndarray:
+        """Векторы чанков записи (пустая матрица, если записи нет)."""
+        start, end = self._segment_index().get(int(telegram_id), (0, 0))
+        return self.vectors[start:end]
+
+    def append(self, telegram_ids: List[int], groups: List[np.ndarray], chunk_ids: List[List[int]]):
+        """Дописывает по сегменту на запись: groups[i] — векторы, chunk_ids[i] — их id чанков."""
+        if not telegram_ids:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        if self.dim is None:
+            self.dim = int(groups[0].shape[1])
+
+        ends = self.n_rows + np.cumsum([len(g) for g in groups], dtype="int64")
+        rows = [np.asarray(g, dtype=self.dtype).reshape(-1, self.dim) for g in groups]
+
+        # Хвост от прерванной записи обрезаем до закоммиченных размеров из info.json
+        itemsize = self.dim * self.dtype.itemsize
+        for name, size, data in (
+                ("vectors.bin", self.n_rows * itemsize, np.concatenate(rows)),
+                ("rows.cid.bin", self.n_rows * 8, np.fromiter((c for ids in chunk_ids for c in ids), dtype="int64")),
+                ("seg.tid.bin", self.n_segments * 8, np.asarray(telegram_ids, dtype="int64")),
+                ("seg.end.bin", self.n_segments * 8, ends),
+        ):
+            with open(self._file(name), "ab") as f:
+                f.truncate(size)
+                data.tofile(f)
+
+        self.n_rows = int(ends[-1])
+        self.n_segments += len(telegram_ids)
+        self._commit()
+
+    def rollback(self, n_rows: int, n_segments: int) -> bool:
+        """
+        Откатывает хранилище к n_rows строк и n_segments сегментов (состояние, закоммиченное
+        вместе с MetaStore): хвост файлов обрежет следующий append. False, если откатывать нечего.
+        """
+        if self.n_rows <= n_rows and self.n_segments <= n_segments:
+            return False
+        self.n_rows, self.n_segments = min(self.n_rows, n_rows), min(self.n_segments, n_segments)
+        self._commit()
+        return True
+
+    def _commit(self):
+        info_path = self._file(self.INFO)
+        with open(f"{info_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "dtype": self.dtype.name, "n_rows": self.n_rows,
+                       "n_segments": self.n_segments}, f)
+        os.replace(f"{info_path}.tmp", info_path)
+        self._vectors = self._chunk_ids = self._segments = self._row_of = None
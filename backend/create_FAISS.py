@@ -1,26 +1,37 @@
-import json
+import multiprocessing
 import os
-import re
+import shutil
 import time
-from typing import Dict, List
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import faiss
 import numpy as np
-import openai
 import torch
-from sentence_transformers import SentenceTransformer
 
-from configs.cfg import N_LIST, EMBEDDING_MODE, embedding_model, embedding_dim, index_path, metadata_path, chunk_path, \
-    relevant_text_path
-from utils.ij_remover import remove_interjections
+from configs.cfg import EMBEDDING_MODE, embedding_model, embedding_dim, relevant_text_path, emb_cache_path, \
+    reducer_path, chunk_vectors_dtype, index_batch_size, index_checkpoint_batches, index_chunking_workers
+from backend.bm25_index import sync_lexical_index
+from backend.chunk_store import ChunkVectorStore
+from backend.dim_reduction import EmbeddingReducer
+from backend.embedding_cache import EmbeddingCache
+from backend.faiss_index import build_index, choose_index_type, choose_nlist, describe, index_ids, new_index, \
+    rebuild_reason, remove_ids
+from backend.index_publish import publish_shard
+from backend.meta_store import MetaStore, MetaStoreBuilder
+from backend.openai_embedder import embed_texts
+from backend.shards import group_topics, select_shards, shard_paths
+from backend.st_encoder import SentenceEncoder
+from backend.text_norm import record_chunks
+from utils.json_stream import iter_json_arrays, json_keys
 
 model = None
 
 
 def init_resources():
     """
-    Инициализирует модель SentenceTransformer и настраивает FAISS для многопоточности.
-    Использует 'mps' на Mac, если доступно, иначе 'cpu'.
+    Инициализирует кодировщик sentence_transformers и настраивает FAISS для многопоточности.
+    Использует 'mps' на Mac, если доступно, иначе 'cpu' (с пулом процессов для эмбеддинга).
     """
     global model
 
@@ -28,194 +39,405 @@ def init_resources():
     if device == "cpu":
         faiss.omp_set_num_threads(os.cpu_count())
 
-    model = SentenceTransformer(embedding_model, device=device)
+    model = SentenceEncoder(embedding_model, device=device)
 
 
-def get_openai_embeddings(texts: list[str], emb_model: str = embedding_model, batch_size: int = 1000) -> np.ndarray:
-    embeddings = []
-    total = len(texts)
-    for i in range(0, total, batch_size):
-        batch = texts[i:i + batch_size]
-        print(f"[OpenAI] Обработка батча {i}–{i + len(batch)} из {total}")
-        try:
-            response = openai.Embedding.create(input=batch, model=emb_model)
-            batch_embeddings = [item["embedding"] for item in sorted(response["data"], key=lambda x: x["index"])]
-            embeddings.extend(batch_embeddings)
-        except Exception as e:
-            print(f"[OpenAI] Ошибка на батче {i}–{i + len(batch)}: {e}")
-            embeddings.extend([[0.0] * embedding_dim] * len(batch))
-            time.sleep(1)
-    return np.array(embeddings, dtype="float32")
-
-
-def flatten_json(json_data: Dict) -> List[Dict]:
-    return [
-        {
-            "telegram_id": item["downloaded_text"][0],
-            "date": item["downloaded_text"][1],
-            "content": item["downloaded_text"][2],
-            "author": item["downloaded_text"][3],
-            "media_path": item["downloaded_media"]["path"],
-            "c_translated": item["c_translated"]
-        }
-        for items in json_data.values() for item in items
-        if item["downloaded_text"][2]
-    ]
-
-
-def split_author_chunks(text: str) -> List[str]:
-    tokens = text.split()
-    return remove_interjections([' '.join(tokens[i:i + 1]) for i in range(len(tokens))]) + \
-        [' '.join(tokens[i:i + 2]) for i in range(len(tokens) - 1)]
-
-
-def clean_formatting(text: str) -> str:
+def get_openai_embeddings(texts: list[str], emb_model: str = embedding_model) -> np.ndarray:
     """
-    Удаляет markdown-форматирование из текста.
-    Убирает парные и одиночные теги: **, *, __, _, ~~, ``, и т.д.
+    Эмбеддинги через асинхронный клиент (параллельно, батчи по токенам, повторы на 429).
+    Строки, которые не удалось получить, остаются нулевыми — commit_batch не кладёт
+    их в индекс и повторяет при следующем запуске.
     """
-    if not text:
-        return text
-
-    # Удаляем парные теги (жирный, курсив, зачеркнутый, код)
-    patterns = [
-        r'\*\*(.*?)\*\*',  # **bold**
-        r'__(.*?)__',  # __bold__
-        r'\*(.*?)\*',  # *italic*
-        r'_(.*?)_',  # _italic_
-        r'~~(.*?)~~',  # ~~strikethrough~~
-        r'`(.*?)`',  # `code`
-        r'```(.*?)```',  # ```code block```
-    ]
-
-    for pattern in patterns:
-        text = re.sub(pattern, r'\1', text, flags=re.DOTALL)
-
-    # Удаляем одиночные форматирующие символы в начале и конце
-    single_patterns = [
-        r'^(\*\*|\*|__|_|~~|`)(.*)$',  # начинающиеся с форматирования
-        r'^(.*?)(\*\*|\*|__|_|~~|`)$',  # заканчивающиеся форматированием
-    ]
-
-    for pattern in single_patterns:
-        match = re.match(pattern, text.strip())
-        if match:
-            if pattern.startswith('^(\\*\\*'):  # начинающиеся
-                text = match.group(2).strip()
-            else:  # заканчивающиеся
-                text = match.group(1).strip()
-
-    # Удаляем множественные пробелы
-    text = re.sub(r'\s+', ' ', text).strip()
-
-    return text
-
-
-def split_content_chunks(text: str) -> List[str]:
-    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
-    sentences = [s.strip() for s in sentences if s.strip()]
-    tokens = text.split()
-    return (
-            sentences +
-            remove_interjections([' '.join(tokens[i:i + 1]) for i in range(len(tokens))]) +
-            [' '.join(tokens[i:i + 2]) for i in range(len(tokens) - 1)] +
-            [' '.join(tokens[i:i + 3]) for i in range(len(tokens) - 2)]
-    )
-
-
-def prepare_index(dim: int) -> faiss.IndexIVFFlat:
-    quantizer = faiss.IndexFlatIP(dim)
-    return faiss.IndexIVFFlat(quantizer, dim, N_LIST, faiss.METRIC_INNER_PRODUCT)
-
-
-def save_chunk_vectors(path: str, new_data: List[np.ndarray]):
-    if os.path.exists(path):
-        existing = np.load(path, allow_pickle=True)
-        updated = np.concatenate([existing, np.array(new_data, dtype=object)])
-    else:
-        updated = np.array(new_data, dtype=object)
-    np.save(path, updated)
-
-
-def process_index(index_path: str, meta_path: str, vectors_path: str, records: List[Dict]):
-    if os.path.exists(index_path) and os.path.exists(meta_path):
-        with open(meta_path, "r", encoding="utf-8") as f:
-            existing_meta = json.load(f)
-        known_ids = {entry["telegram_id"] for entry in existing_meta}
-        records = [r for r in records if r["telegram_id"] not in known_ids]
-        if not records:
-            print(f"[FAISS] Новых записей нет.")
-            return
-        index = faiss.read_index(index_path)
-    else:
-        index = None
-        existing_meta = []
-
-    all_chunks, chunk_meta = [], []
-    for rec in records:
-        a_chunks = split_author_chunks(f"{rec['author']}")
-        c_chunks = split_content_chunks(f"{rec['content']}")
-        # no split_engcontent_chunks(), same function
-        d_chunks = []
-        if 'c_translated' in rec and rec['c_translated']:
-            d_chunks = split_content_chunks(f"{rec['c_translated']}")
-        else:
-            print("No translation")
-        chunks = a_chunks + c_chunks + d_chunks
-        for ch in chunks:
-            cleaned_chunk = clean_formatting(ch)
-            if cleaned_chunk:  # добавляем только непустые чанки
-                all_chunks.append(cleaned_chunk)
-                chunk_meta.append({**rec, "chunk": cleaned_chunk})
+    embs, failed = embed_texts(texts, emb_model=emb_model)
+    if failed:
+        print(f"[OpenAI] Не удалось получить {len(failed)} эмбеддингов из {len(texts)}.")
+    return embs
 
-    print(f"[FAISS] Эмбеддинг {len(all_chunks)} чанков.")
 
-    with open(meta_path, "w", encoding="utf-8") as f:
-        json.dump(existing_meta + chunk_meta, f, ensure_ascii=False, indent=2)
-
-    embs = None
+def embed_chunks(texts: List[str]) -> np.ndarray:
+    """Считает эмбеддинги чанков выбранным в конфиге способом (без кэша)."""
     if EMBEDDING_MODE == "sentence_transformers":
-        init_resources()
-        embs = model.encode(all_chunks, batch_size=32, show_progress_bar=True, normalize_embeddings=True)
+        if model is None:
+            init_resources()
+        return model.encode(texts)
+    if EMBEDDING_MODE == "openai":
+        return get_openai_embeddings(texts)
+    raise ValueError("ОШИБКА ПОЛУЧЕНИЯ ЕБМЕДДИНГОВ")
+
+
+def cv_record(item: Dict) -> Optional[Dict]:
+    """Запись индекса из элемента cv.json (None — у сообщения нет текста)."""
+    if not item["downloaded_text"][2]:
+        return None
+    return {
+        "telegram_id": item["downloaded_text"][0],
+        "date": item["downloaded_text"][1],
+        "content": item["downloaded_text"][2],
+        "author": item["downloaded_text"][3],
+        "media_path": item["downloaded_media"]["path"],
+        "c_translated": item["c_translated"]
+    }
+
+
+def iter_records(json_data: Dict, topics: Optional[Iterable[str]] = None) -> Iterator[Dict]:
+    """Записи cv.json (только из topics, если они заданы)."""
+    for topic in (json_data if topics is None else topics):
+        for item in json_data.get(topic, []):
+            rec = cv_record(item)
+            if rec is not None:
+                yield rec
+
+
+def iter_cv_records(path: str, topics: Optional[Iterable[str]] = None) -> Iterator[Dict]:
+    """Записи файла cv.json (только из topics, если они заданы), потоково — без загрузки файла целиком."""
+    for _, item in iter_json_arrays(path, topics):
+        rec = cv_record(item)
+        if rec is not None:
+            yield rec
+
+
+def flatten_json(json_data: Dict) -> List[Dict]:
+    return list(iter_records(json_data))
+
+
+def iter_batches(items: Iterable, size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def chunking_pool() -> Optional[Executor]:
+    """Пул процессов для нарезки записей на чанки (None — нарезка в текущем процессе)."""
+    workers = index_chunking_workers or os.cpu_count() or 1
+    if workers <= 1:
+        return None
+    # spawn: воркерам нужен только лёгкий backend.text_norm, а fork процесса с потоками torch небезопасен
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def prepare_batch(records: List[Dict], retry_chunks: List[str] = (),
+                  pool: Optional[Executor] = None) -> Tuple[List[Dict], List[List[str]], List[str]]:
+    """Нарезает батч записей на чанки; возвращает (записи, чанки по записям, уникальные тексты для эмбеддинга)."""
+    if pool is not None and len(records) > 1:
+        chunksize = max(1, len(records) // (4 * pool._max_workers))
+        rec_chunks = list(pool.map(record_chunks, records, chunksize=chunksize))
     else:
-        if EMBEDDING_MODE == "openai":
-            embs = get_openai_embeddings(all_chunks)
-        else:
-            raise ValueError("ОШИБКА ПОЛУЧЕНИЯ ЕБМЕДДИНГОВ")
+        rec_chunks = [record_chunks(rec) for rec in records]
+    texts = list(dict.fromkeys([ch for chunks in rec_chunks for ch in chunks] + list(retry_chunks)))
+    return records, rec_chunks, texts
 
-    if index is None:
-        index = prepare_index(embedding_dim)
-        print(f"[FAISS] Тренировка индекса.")
-        index.train(embs)
 
-    index.add(embs)
-    faiss.write_index(index, index_path)
+def write_index(index: faiss.Index, path: str):
+    tmp = f"{path}.tmp"
+    faiss.write_index(index, tmp)
+    os.replace(tmp, path)
 
-    # with open(meta_path, "w", encoding="utf-8") as f:
-    #    json.dump(existing_meta + chunk_meta, f, ensure_ascii=False, indent=2)
 
-    grouped, temp_vecs, current_id = [], [], None
-    for meta, vec in zip(chunk_meta, embs):
-        tid = meta["telegram_id"]
-        if tid != current_id:
-            if temp_vecs:
-                grouped.append(np.array(temp_vecs))
-            temp_vecs = []
-            current_id = tid
-        temp_vecs.append(vec)
-    if temp_vecs:
-        grouped.append(np.array(temp_vecs))
+def commit_batch(index: Optional[faiss.Index], meta: MetaStoreBuilder, store: ChunkVectorStore,
+                 batch: Tuple[List[Dict], List[List[str]], List[str]], embs: np.ndarray,
+                 retry_ids: List[int], index_path: str, deleted_rows: List[int] = (),
+                 save_index: bool = True) -> faiss.Index:
+    """
+    Регистрирует записи и чанки батча в MetaStore, добавляет новые векторы в индекс
+    и сохраняет чекпоинт. Прежние версии изменённых записей и deleted_rows снимаются
+    с posting-списков; векторы чанков, у которых не осталось записей, удаляются из
+    индекса по id. Порядок записи: векторы чанков, индекс (если save_index), затем
+    MetaStore — его info.json является точкой коммита батча и хранит размер chunk/,
+    до которого process_index откатывает векторы чанков после сбоя. Индекс, не
+    сохранённый с батчем, process_index дополняет при следующем запуске (resume_index).
+    """
+    records, rec_chunks, texts = batch
+    pos = {text: i for i, text in enumerate(texts)}
+    # нулевой вектор = эмбеддинг не получен: в индекс не кладём, запоминаем для повтора
+    ok = np.any(embs, axis=1)
+
+    orphaned = set()
+    for row in deleted_rows:
+        orphaned.update(meta.remove_record(row))
+
+    first_new_id = meta.n_chunks
+    n_replaced = 0
+    rec_chunk_ids, rec_chunk_pos, needs_vector = [], [], []
+    for rec, chunks in zip(records, rec_chunks):
+        old_row = meta.live_row(rec["telegram_id"])
+        if old_row is not None:
+            orphaned.update(meta.remove_record(old_row))
+            n_replaced += 1
+        rec_idx = meta.add_record(rec)
+        ids, positions = [], []
+        for ch in chunks:
+            cid, needs = meta.add_chunk_ref(ch, rec_idx)
+            if cid < 0:
+                continue
+            # чанк, осиротевший в этом же батче, ещё не удалён из индекса — вектор у него есть
+            if needs and cid not in orphaned:
+                needs_vector.append(cid)
+            if ok[pos[ch]]:
+                ids.append(cid)
+                positions.append(pos[ch])
+        rec_chunk_ids.append(ids)
+        rec_chunk_pos.append(positions)
+
+    to_index = [cid for cid in dict.fromkeys(needs_vector + retry_ids) if meta.has_records(cid)]
+    orphaned = {cid for cid in orphaned if not meta.has_records(cid)}
+    to_index_pos = [pos[meta.chunk(cid)] for cid in to_index]
+    new_ids = np.array([cid for cid, p in zip(to_index, to_index_pos) if ok[p]], dtype="int64")
+    failed_ids = [cid for cid, p in zip(to_index, to_index_pos) if not ok[p]]
+    dropped = set(retry_ids) | orphaned
+    meta.failed_chunks = [cid for cid in meta.failed_chunks if cid not in dropped] + failed_ids
+    new_embs = embs[[p for p in to_index_pos if ok[p]]] if len(new_ids) else embs[:0]
 
-    save_chunk_vectors(vectors_path, grouped)
-    print(f"[FAISS] Обработано {len(records)} записей, {len(all_chunks)} чанков.")
+    if index is None:
+        # новый индекс копится плоским, тип из INDEX_TYPE подбирается и обучается на всём корпусе в apply_index_policy
+        index = new_index(embs.shape[1])
+
+    # чанки без записей убираем; старые id, которые добавляются снова, тоже удаляем заранее,
+    # чтобы повтор батча после сбоя не оставил в индексе дубликатов (HNSW удалять не умеет —
+    # его устаревшие векторы отсекаются при поиске и вычищаются перестройкой в apply_index_policy)
+    to_remove = orphaned | {int(cid) for cid in new_ids if cid < first_new_id}
+    if to_remove and remove_ids(index, faiss.IDSelectorBatch(np.fromiter(to_remove, dtype="int64"))) is None:
+        # вектор чанка, снова попавшего в запись (например, после отката правки), в HNSW
+        # остался — второй раз его не добавляем, иначе id повторится и версию не опубликовать
+        fresh = ~np.isin(new_ids, index_ids(index))
+        new_ids, new_embs = new_ids[fresh], new_embs[fresh]
+    if len(new_ids):
+        index.add_with_ids(new_embs, new_ids)
+
+    deleted_tids = [meta.telegram_ids[row] for row in deleted_rows]
+    store.append([rec["telegram_id"] for rec in records] + deleted_tids,
+                 [embs[positions] for positions in rec_chunk_pos] +
+                 [embs[:0]] * len(deleted_tids),
+                 rec_chunk_ids + [[]] * len(deleted_tids))
+    if save_index:
+        write_index(index, index_path)
+    meta.chunk_rows, meta.chunk_segments = store.n_rows, store.n_segments
+    meta.flush()
+
+    if failed_ids:
+        print(f"[FAISS] {len(failed_ids)} чанков без эмбеддинга, будут повторены при следующем запуске.")
+    print(f"[FAISS] Чекпоинт: +{len(records) - n_replaced} новых, {n_replaced} изменённых, "
+          f"{len(deleted_tids)} удалённых записей; +{len(new_ids)}/-{len(orphaned)} векторов "
+          f"(всего {meta.n_live} записей, {index.ntotal} векторов).")
+    return index
+
+
+def live_chunk_ids(meta: MetaStoreBuilder) -> np.ndarray:
+    """id чанков, чьи векторы должны быть в индексе: есть записи и эмбеддинг получен."""
+    ids = meta.live_chunks()
+    return ids[~np.isin(ids, np.asarray(meta.failed_chunks, dtype="int64"))]
+
+
+def rebuild_index(meta: MetaStoreBuilder, embed: Callable[[List[str]], np.ndarray], index_path: str) -> faiss.Index:
+    """Строит индекс заново по всем актуальным чанкам; embed берёт векторы из кэша эмбеддингов."""
+    ids = live_chunk_ids(meta)
+    kind = choose_index_type(len(ids))
+    vecs = embed([meta.chunk(cid) for cid in ids])
+    started = time.time()
+    index = build_index(vecs, ids, kind, choose_nlist(len(ids)) if kind.startswith("IVF") else 0)
+    write_index(index, index_path)
+    print(f"[FAISS/POLICY] Индекс перестроен ({describe(index)}, {index.ntotal} векторов) за {time.time() - started:.1f}с.")
+    return index
+
+
+def apply_index_policy(index: faiss.Index, meta: MetaStoreBuilder, embed: Callable[[List[str]], np.ndarray],
+                       index_path: str) -> faiss.Index:
+    """
+    Проверяет, подходят ли тип (INDEX_TYPE) и разбиение индекса текущему размеру корпуса,
+    и при необходимости перестраивает его заново из кэша эмбеддингов. Решение логируется.
+    """
+    reason = rebuild_reason(index, len(live_chunk_ids(meta)))
+    if reason is None:
+        print(f"[FAISS/POLICY] Индекс ({describe(index)}, {index.ntotal} векторов) перестраивать не нужно.")
+        return index
 
+    print(f"[FAISS/POLICY] Перестройка индекса: {reason}.")
+    return rebuild_index(meta, embed, index_path)
 
-def build_or_update_index():
-    with open(os.path.join(relevant_text_path, "cv.json"), encoding="utf-8") as f:
-        data = json.load(f)
 
-    print("\n[FAISS] Извлечение записей...")
-    records = flatten_json(data)
-    print(f"[FAISS] Найдено {len(records)} записей.")
+def resume_index(index: Optional[faiss.Index], meta: MetaStoreBuilder, embed: Callable[[List[str]], np.ndarray],
+                 index_path: str, dim: int) -> Optional[faiss.Index]:
+    """
+    Приводит индекс с последнего сохранения к закоммиченному MetaStore: индекс пишется
+    раз в index_checkpoint_batches батчей, а MetaStore — каждый батч. Векторы чанков
+    без записей и незакоммиченного хвоста удаляются, недостающие векторы актуальных
+    чанков добавляются из кэша эмбеддингов. Индекс записывается, если что-то изменилось.
+    """
+    if not MetaStore.exists(meta.path):
+        return index
+    if index is None:
+        index = new_index(dim)
+    present, live = index_ids(index), live_chunk_ids(meta)
+    extra = present[~np.isin(present, live)]
+    missing = live[~np.isin(live, present)]
+    removed = remove_ids(index, faiss.IDSelectorBatch(extra)) if len(extra) else 0
+    if removed is None:
+        if extra.max() >= meta.n_chunks:
+            # HNSW: векторы незакоммиченного хвоста не удалить, а их id достанутся новым чанкам
+            print(f"[FAISS] Индекс содержит незакоммиченный батч, перестройка из кэша.")
+            return rebuild_index(meta, embed, index_path)
+        # устаревшие векторы HNSW отсекаются при поиске и вычищаются перестройкой в apply_index_policy
+        removed = 0
+    if not removed and not len(missing):
+        return index
+
+    if len(missing):
+        index.add_with_ids(embed([meta.chunk(cid) for cid in missing]), missing)
+    print(f"[FAISS] Индекс дополнен до последнего коммита: +{len(missing)}/-{removed} векторов.")
+    write_index(index, index_path)
+    return index
+
+
+def process_index(index_path: str, meta_path: str, vectors_path: str, records: Iterable[Dict],
+                  batch_size: int = index_batch_size, prune_missing: bool = True,
+                  reducer_dir: str = reducer_path):
+    """
+    Потоковое построение или дополнение индекса: записи -> чанки -> эмбеддинг батча ->
+    добавление в индекс -> чекпоинт. В памяти одновременно не больше двух батчей:
+    эмбеддинг батча N+1 идёт в отдельном потоке, пока батч N добавляется в индекс
+    и сохраняется. MetaStore коммитится каждый батч, а индекс целиком записывается
+    раз в index_checkpoint_batches батчей и в конце прогона. После сбоя повторный
+    запуск продолжает с последнего закоммиченного батча: неизменённые записи
+    пропускаются, векторы незакоммиченного хвоста удаляются из индекса, а векторы,
+    закоммиченные после последнего сохранения индекса, добавляются из кэша эмбеддингов.
+
+    Записи сравниваются по telegram_id и отпечатку содержимого: изменённые CV заменяют
+    свою прежнюю версию, а при prune_missing записи, которых больше нет во входных
+    данных, удаляются из индекса.
+
+    Каждый уникальный текст чанка эмбеддится и попадает в индекс один раз; MetaStore
+    хранит записи, тексты чанков (id вектора = id чанка) и posting-списки.
+
+    При EMBEDDING_REDUCTION векторы уменьшаются перед индексом и chunk/ (PCA обучается
+    на первом батче). Если режим в конфиге не совпадает с тем, с которым построен индекс,
+    индекс строится заново — полные эмбеддинги берутся из кэша.
+    """
+    reducer, built = EmbeddingReducer.configured(reducer_dir), EmbeddingReducer.load(reducer_dir)
+    if not reducer.same_as(built) and (os.path.exists(index_path) or MetaStore.exists(meta_path)):
+        print(f"[FAISS] Индекс построен с другим EMBEDDING_REDUCTION, индекс строится заново.")
+        for path in (meta_path, vectors_path, reducer_dir):
+            shutil.rmtree(path, ignore_errors=True)
+        if os.path.exists(index_path):
+            os.remove(index_path)
+    elif reducer.same_as(built) and built.is_trained:
+        reducer = built
+    if reducer.is_trained:
+        reducer.save()
+
+    meta = MetaStoreBuilder(meta_path)
+    store = ChunkVectorStore(vectors_path, reducer.out_dim, chunk_vectors_dtype)
+    # chunk/ коммитится раньше MetaStore: после сбоя между ними его строки ссылались бы на незакоммиченные чанки
+    if meta.chunk_rows is not None and store.rollback(meta.chunk_rows, meta.chunk_segments):
+        print(f"[FAISS] Откат векторов чанков незакоммиченного батча.")
+    cache = EmbeddingCache(emb_cache_path, embedding_model, embedding_dim)
+
+    def embed(texts: List[str]) -> np.ndarray:
+        vecs = cache.get_or_embed(texts, embed_chunks)
+        if not reducer.is_trained:
+            reducer.fit(vecs)
+            reducer.save()
+            print(f"[FAISS] PCA {reducer.in_dim} -> {reducer.out_dim} обучен на {len(texts)} векторах.")
+        return reducer.transform(vecs)
+
+    index = faiss.read_index(index_path) if os.path.exists(index_path) and MetaStore.exists(meta_path) else None
+    index = resume_index(index, meta, embed, index_path, reducer.out_dim)
+
+    # записи, встреченные во входных данных, отмечаются по индексу актуальной версии
+    seen_rows = np.zeros(meta.n_records, dtype="bool")
+
+    def changed_records():
+        for rec in records:
+            row = meta.live_row(rec["telegram_id"])
+            if row is not None and row < len(seen_rows):
+                seen_rows[row] = True
+            if not meta.is_unchanged(rec):
+                yield rec
+
+    retry_ids = list(meta.failed_chunks)
+    if retry_ids:
+        print(f"[FAISS] Повторный эмбеддинг {len(retry_ids)} чанков после ошибок.")
+
+    def jobs(chunker: Optional[Executor]):
+        first = True
+        for batch in iter_batches(changed_records(), batch_size):
+            yield prepare_batch(batch, [meta.chunk(cid) for cid in retry_ids] if first else (), chunker), \
+                retry_ids if first else []
+            first = False
+        if first and retry_ids:
+            yield prepare_batch([], [meta.chunk(cid) for cid in retry_ids]), retry_ids
+
+    n_batches = n_unsaved = 0
+
+    def commit(index: Optional[faiss.Index], batch, embs: np.ndarray, batch_retry: List[int],
+               deleted_rows: List[int] = ()) -> faiss.Index:
+        # индекс целиком пишется раз в index_checkpoint_batches батчей, а не на каждом коммите
+        nonlocal n_unsaved
+        n_unsaved += 1
+        save = n_unsaved >= index_checkpoint_batches
+        index = commit_batch(index, meta, store, batch, embs, batch_retry, index_path, deleted_rows, save_index=save)
+        if save:
+            n_unsaved = 0
+        return index
+
+    chunker = chunking_pool()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pending = None
+        for batch, batch_retry in jobs(chunker):
+            future = pool.submit(embed, batch[2])
+            if pending is not None:
+                index = commit(index, pending[0], pending[2].result(), pending[1])
+            pending = (batch, batch_retry, future)
+            n_batches += 1
+        if pending is not None:
+            index = commit(index, pending[0], pending[2].result(), pending[1])
+    if chunker is not None:
+        chunker.shutdown()
+
+    # записи, которых нет во входных данных: были актуальны до прогона, не встретились и не заменены
+    alive = np.frombuffer(bytes(meta.alive), dtype="bool")[:len(seen_rows)]
+    gone_rows = np.flatnonzero(alive & ~seen_rows).tolist() if prune_missing else []
+    if gone_rows and index is not None:
+        index = commit(index, ([], [], []), np.zeros((0, reducer.out_dim), dtype="float32"), [], gone_rows)
+        n_batches += 1
+
+    # posting-списки для поиска собираются из журнала пар MetaStore один раз за прогон
+    if n_batches or not meta.is_compacted:
+        meta.flush(compact=True)
+    meta.close()
+    if not n_batches:
+        print(f"[FAISS] Изменений нет.")
+        return
+    policy_index = apply_index_policy(index, meta, embed, index_path)
+    if policy_index is index and n_unsaved:
+        write_index(index, index_path)
+    index = policy_index
+    print(f"[FAISS] Кэш эмбеддингов: попаданий {cache.hits}, промахов {cache.misses}.")
+    print(f"[FAISS] Обработано батчей: {n_batches}, записей в индексе: {meta.n_live}, "
+          f"векторов: {index.ntotal}.")
+
+
+def build_or_update_index(shards: Optional[List[str]] = None):
+    """
+    Строит или обновляет индекс. При INDEX_SHARDING у каждого шарда (группы топиков
+    cv.json) свой индекс и метаданные; shards ограничивает обновление частью шардов,
+    остальные не затрагиваются.
 
-    process_index(index_path, metadata_path, chunk_path, records)
+    Лексический BM25-индекс шарда догоняет MetaStore новыми записями, после чего
+    шард публикуется новой версией (backend.index_publish), которую сервер
+    подхватывает без перезапуска.
+    """
+    cv_path = os.path.join(relevant_text_path, "cv.json")
+    groups = group_topics(json_keys(cv_path))
+    for name in select_shards(shards, groups):
+        index_file, meta_dir, chunk_dir, reducer_dir = shard_paths(name)
+        print(f"\n[FAISS] Извлечение записей шарда {name} (топики: {', '.join(groups[name])})...")
+        process_index(index_file, meta_dir, chunk_dir, iter_cv_records(cv_path, groups[name]),
+                      reducer_dir=reducer_dir)
+        added = sync_lexical_index(meta_dir) if MetaStore.exists(meta_dir) else 0
+        if added:
+            print(f"[BM25] Шард {name}: +{added} записей в лексическом индексе.")
+        publish_shard(name)
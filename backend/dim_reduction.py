@@ -0,0 +1,101 @@
+import json
+import os
+from typing import Optional
+
+import faiss
+import numpy as np
+
+from configs.cfg import EMBEDDING_REDUCTION, EMBEDDING_REDUCED_DIM, embedding_dim
+
+REDUCTION_MODES = ("", "truncate", "pca")
+
+
+def normalize_rows(vecs: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    return vecs / np.maximum(norms, 1e-12)
+
+
+class EmbeddingReducer:
+    """
+    Уменьшение размерности эмбеддингов перед индексом (каталог reducer/ рядом с индексом).
+
+    Файлы:
+        info.json — режим, входная и выходная размерность
+        pca.bin   — обученная faiss.PCAMatrix (только для режима "pca")
+
+    "truncate" оставляет первые out_dim координат и перенормирует вектор (Matryoshka),
+    "pca" проецирует на главные компоненты корпуса. Кэш эмбеддингов хранит полные
+    векторы, поэтому смена режима пересобирает индекс без новых запросов к модели.
+    Нулевые векторы (эмбеддинг не получен) остаются нулевыми.
+    """
+
+    INFO = "info.json"
+
+    def __init__(self, path: str, mode: str = "", in_dim: int = embedding_dim, out_dim: Optional[int] = None):
+        if mode not in REDUCTION_MODES:
+            raise ValueError(f"Неизвестный EMBEDDING_REDUCTION: {mode}")
+        self.path = path
+        self.mode = mode
+        self.in_dim = in_dim
+        self.out_dim = out_dim if mode and out_dim else in_dim
+        if mode and self.out_dim > in_dim:
+            raise ValueError(f"EMBEDDING_REDUCED_DIM {self.out_dim} больше размерности модели {in_dim}")
+        self.pca = None
+
+    @classmethod
+    def configured(cls, path: str) -> "EmbeddingReducer":
+        """Преобразование, заданное в конфиге (PCA ещё не обучен)."""
+        return cls(path, EMBEDDING_REDUCTION, embedding_dim, EMBEDDING_REDUCED_DIM)
+
+    @classmethod
+    def load(cls, path: str) -> "EmbeddingReducer":
+        """Преобразование, с которым построен индекс; без reducer/ — тождественное."""
+        info_path = os.path.join(path, cls.INFO)
+        if not os.path.exists(info_path):
+            return cls(path)
+        with open(info_path, "r", encoding="utf-8") as f:
+            info = json.load(f)
+        reducer = cls(path, info["mode"], info["in_dim"], info["out_dim"])
+        if reducer.mode == "pca":
+            reducer.pca = faiss.read_VectorTransform(os.path.join(path, "pca.bin"))
+        return reducer
+
+    def same_as(self, other: "EmbeddingReducer") -> bool:
+        return (self.mode, self.in_dim, self.out_dim) == (other.mode, other.in_dim, other.out_dim)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.mode != "pca" or self.pca is not None
+
+    def fit(self, vecs: np.ndarray):
+        """Обучает PCA на векторах корпуса (ненулевых); для других режимов ничего не делает."""
+        if self.mode == "pca":
+            sample = np.ascontiguousarray(vecs[np.any(vecs, axis=1)], dtype="float32")
+            if len(sample) < self.out_dim:
+                raise ValueError(f"Для PCA до {self.out_dim} измерений нужно хотя бы {self.out_dim} векторов, "
+                                 f"получено {len(sample)}: увеличьте index_batch_size или используйте truncate")
+            pca = faiss.PCAMatrix(self.in_dim, self.out_dim)
+            pca.train(sample)
+            self.pca = pca
+
+    def save(self):
+        os.makedirs(self.path, exist_ok=True)
+        if self.pca is not None:
+            faiss.write_VectorTransform(self.pca, os.path.join(self.path, "pca.bin"))
+        info_path = os.path.join(self.path, self.INFO)
+        with open(f"{info_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"mode": self.mode, "in_dim": self.in_dim, "out_dim": self.out_dim}, f)
+        os.replace(f"{info_path}.tmp", info_path)
+
+    def transform(self, vecs: np.ndarray) -> np.ndarray:
+        vecs = np.asarray(vecs, dtype="float32")
+        if not self.mode:
+            return vecs
+        ok = np.any(vecs, axis=1)
+        if self.mode == "truncate":
+            out = vecs[:, :self.out_dim]
+        else:
+            out = self.pca.apply(np.ascontiguousarray(vecs))
+        out = normalize_rows(out)
+        out[~ok] = 0
+        return np.ascontiguousarray(out, dtype="float32")
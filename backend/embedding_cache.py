@@ -0,0 +1,164 @@
+import hashlib
+import os
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from utils.sqlite_lru import SqliteLRU
+
+KEY_SIZE = 16
+
+
+class EmbeddingCache:
+    """
+    Контентно-адресуемый кэш эмбеддингов на диске.
+
+    Ключ — хэш (модель эмбеддингов, текст чанка). Векторы лежат одной
+    непрерывной float32-матрицей в ``vectors.f32`` (читается через np.memmap),
+    ключи — компактной таблицей 16-байтовых хэшей в ``keys.bin``.
+    Обе таблицы только дописываются, поэтому обновление стоит O(новых данных).
+    """
+
+    def __init__(self, path: str, model_name: str, dim: int):
+        self.path = path
+        self.model_name = model_name
+        self.dim = dim
+        self.keys_path = os.path.join(path, "keys.bin")
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(path, exist_ok=True)
+        self._rows = {}
+        self._count = 0
+        self._mmap = None
+        self._load()
+
+    def _load(self):
+        keys = b""
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, "rb") as f:
+                keys = f.read()
+        n_keys = len(keys) // KEY_SIZE
+        n_vecs = os.path.getsize(self.vectors_path) // (self.dim * 4) if os.path.exists(self.vectors_path) else 0
+
+        # Векторы пишутся раньше ключей: после сбоя хвост без пары отбрасываем
+        n = min(n_keys, n_vecs)
+        if n != n_keys or n != n_vecs:
+            with open(self.keys_path, "ab") as f:
+                f.truncate(n * KEY_SIZE)
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(n * self.dim * 4)
+
+        self._rows = {keys[i * KEY_SIZE:(i + 1) * KEY_SIZE]: i for i in range(n)}
+        self._count = n
+
+    def _vectors(self) -> np.ndarray:
+        if self._mmap is None or self._mmap.shape[0] != self._count:
+            if self._count == 0:
+                return np.zeros((0, self.dim), dtype="float32")
+            self._mmap = np.memmap(self.vectors_path, dtype="float32", mode="r", shape=(self._count, self.dim))
+        return self._mmap
+
+    def key(self, text: str) -> bytes:
+        return hashlib.blake2b(f"{self.model_name}\0{text}".encode("utf-8"), digest_size=KEY_SIZE).digest()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, texts: List[str], vecs: np.ndarray):
+        """Дописывает новые векторы в кэш. Нулевые векторы (ошибки эмбеддинга) не кэшируются."""
+        vecs = np.asarray(vecs, dtype="float32")
+        keys, rows = [], []
+        for text, vec in zip(texts, vecs):
+            key = self.key(text)
+            if key in self._rows or not np.any(vec):
+                continue
+            self._rows[key] = self._count + len(keys)
+            keys.append(key)
+            rows.append(vec)
+        if not keys:
+            return
+
+        with open(self.vectors_path, "ab") as f:
+            np.stack(rows).astype("float32").tofile(f)
+        with open(self.keys_path, "ab") as f:
+            f.write(b"".join(keys))
+        self._count += len(keys)
+
+    def get_or_embed(self, texts: List[str], embed_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Возвращает эмбеддинги для texts, вызывая embed_fn только для текстов,
+        которых нет в кэше (каждый уникальный текст — один раз).
+        """
+        out = np.zeros((len(texts), self.dim), dtype="float32")
+        cached = self._vectors()
+        missing = {}
+        for i, text in enumerate(texts):
+            row = self._rows.get(self.key(text))
+            if row is None:
+                missing.setdefault(text, []).append(i)
+            else:
+                out[i] = cached[row]
+
+        self.misses += len(missing)
+        self.hits += len(texts) - sum(len(pos) for pos in missing.values())
+
+        if missing:
+            miss_texts = list(missing)
+            miss_vecs = np.asarray(embed_fn(miss_texts), dtype="float32")
+            for text, vec in zip(miss_texts, miss_vecs):
+                out[missing[text]] = vec
+            self.add(miss_texts, miss_vecs)
+
+        return out
+
+
+class QueryEmbeddingCache:
+    """
+    Кэш эмбеддингов поисковых запросов (SQLite, LRU на max_items запросов).
+
+    Запросы повторяются («Python», «маркетолог», «CTO»), поэтому вектор запроса
+    сохраняется между перезапусками сервера. Ключ — модель эмбеддингов и точный
+    текст запроса, значение — полный float32-вектор (до EMBEDDING_REDUCTION:
+    у шардов могут быть разные reducer).
+    """
+
+    def __init__(self, path: str, model_name: str, dim: int, max_items: int = 10000):
+        self.model_name = model_name
+        self.dim = dim
+        self.store = SqliteLRU(path, max_items)
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        return f"{self.model_name}\0{text}"
+
+    def lookup(self, texts: List[str]) -> Tuple[np.ndarray, Dict[str, List[int]]]:
+        """Векторы найденных в кэше текстов и позиции промахов (текст -> индексы в texts)."""
+        out = np.zeros((len(texts), self.dim), dtype="float32")
+        found = self.store.get_many(self.key(text) for text in texts)
+        missing: Dict[str, List[int]] = {}
+        for i, text in enumerate(texts):
+            value = found.get(self.key(text))
+            if value is None:
+                missing.setdefault(text, []).append(i)
+            else:
+                out[i] = np.frombuffer(value, dtype="float32")
+        self.misses += len(missing)
+        self.hits += len(texts) - sum(len(pos) for pos in missing.values())
+        return out, missing
+
+    def fill(self, out: np.ndarray, missing: Dict[str, List[int]], miss_vecs: np.ndarray) -> np.ndarray:
+        """Раскладывает векторы промахов (в порядке missing) по out и сохраняет их в кэш."""
+        miss_vecs = np.asarray(miss_vecs, dtype="float32")
+        for positions, vec in zip(missing.values(), miss_vecs):
+            out[positions] = vec
+        # нулевые векторы (ошибки эмбеддинга) не кэшируются
+        self.store.put_many([(self.key(text), vec.tobytes()) for text, vec in zip(missing, miss_vecs) if np.any(vec)])
+        return out
+
+    def get_or_embed(self, texts: List[str], embed_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Как EmbeddingCache.get_or_embed: embed_fn вызывается один раз, только для промахов."""
+        out, missing = self.lookup(texts)
+        return self.fill(out, missing, embed_fn(list(missing))) if missing else out
@@ -0,0 +1,204 @@
+import math
+from typing import Optional
+
+import faiss
+import numpy as np
+
+from configs.cfg import (
+    N_LIST,
+    N_PROBE,
+    IVF_AUTO_NLIST,
+    FLAT_INDEX_MAX_VECTORS,
+    IVF_IMBALANCE_THRESHOLD,
+    INDEX_TYPE,
+    HNSW_M,
+    HNSW_EF_CONSTRUCTION,
+    HNSW_EF_SEARCH,
+    PQ_M,
+    PQ_NBITS,
+    INDEX_STALE_FRACTION,
+    INDEX_MMAP,
+)
+
+MIN_POINTS_PER_LIST = 39  # меньше FAISS считает обучение k-means недостаточным
+
+INDEX_TYPES = ("FLAT", "IVF_FLAT", "IVF_SQ8", "IVF_PQ", "HNSW")
+
+_IVF_CLASSES = (
+    (faiss.IndexIVFFlat, "IVF_FLAT"),
+    (faiss.IndexIVFScalarQuantizer, "IVF_SQ8"),
+    (faiss.IndexIVFPQ, "IVF_PQ"),
+)
+
+
+def choose_nlist(n_vectors: int, force: bool = False) -> int:
+    """
+    Число списков IVF по размеру корпуса (~4·sqrt(N)), 0 — плоский индекс.
+    force — подобрать nlist и для корпуса, который ищется плоским индексом
+    (подбор параметров и бенчмарки строят IVF на небольших выборках).
+    """
+    if n_vectors <= FLAT_INDEX_MAX_VECTORS and not force:
+        return 0
+    if not IVF_AUTO_NLIST:
+        return N_LIST
+    nlist = int(4 * math.sqrt(n_vectors))
+    return max(1, min(nlist, n_vectors // MIN_POINTS_PER_LIST))
+
+
+def choose_index_type(n_vectors: int, index_type: Optional[str] = None) -> str:
+    """Тип индекса из конфига; небольшой корпус всегда ищется точным плоским индексом."""
+    index_type = index_type or INDEX_TYPE
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Неизвестный INDEX_TYPE: {index_type}")
+    return "FLAT" if n_vectors <= FLAT_INDEX_MAX_VECTORS else index_type
+
+
+def pq_m(dim: int) -> int:
+    """Число подвекторов PQ: из конфига или dim/16, округлённое до делителя dim."""
+    m = PQ_M or max(1, dim // 16)
+    while dim % m:
+        m -= 1
+    return m
+
+
+def index_nlist(index: faiss.Index) -> int:
+    ivf = faiss.try_extract_index_ivf(index)
+    return ivf.nlist if ivf is not None else 0
+
+
+def index_type(index: faiss.Index) -> str:
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf = faiss.downcast_index(ivf)
+        for cls, name in _IVF_CLASSES:
+            if isinstance(ivf, cls):
+                return name
+        return type(ivf).__name__
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+    return "HNSW" if isinstance(inner, faiss.IndexHNSW) else "FLAT"
+
+
+def describe(index: faiss.Index) -> str:
+    kind = index_type(index)
+    nlist = index_nlist(index)
+    return f"{kind}, {nlist} списков" if nlist else kind
+
+
+def new_index(dim: int, index_type: str = "FLAT", nlist: int = 0) -> faiss.Index:
+    """
+    Пустой индекс с внешними id (id вектора = id чанка).
+    FLAT и HNSW оборачиваются в IndexIDMap2, IVF-индексы хранят id сами.
+    """
+    if index_type == "FLAT":
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+    if index_type == "HNSW":
+        hnsw = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        hnsw.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        return faiss.IndexIDMap2(hnsw)
+
+    quantizer = faiss.IndexFlatIP(dim)
+    if index_type == "IVF_FLAT":
+        return faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+    if index_type == "IVF_SQ8":
+        return faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, faiss.ScalarQuantizer.QT_8bit,
+                                             faiss.METRIC_INNER_PRODUCT)
+    if index_type == "IVF_PQ":
+        return faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m(dim), PQ_NBITS, faiss.METRIC_INNER_PRODUCT)
+    raise ValueError(f"Неизвестный INDEX_TYPE: {index_type}")
+
+
+def build_index(vecs: np.ndarray, ids: np.ndarray, index_type: str = "FLAT", nlist: int = 0) -> faiss.Index:
+    index = new_index(vecs.shape[1], index_type, nlist)
+    if not index.is_trained:
+        index.train(vecs)
+    index.add_with_ids(vecs, ids)
+    return index
+
+
+def remove_ids(index: faiss.Index, selector: faiss.IDSelector) -> Optional[int]:
+    """
+    Удаляет векторы по id. Возвращает число удалённых или None, если тип индекса
+    удаление не поддерживает (HNSW): такие векторы остаются в индексе устаревшими,
+    поиск их отбрасывает по пустым posting-спискам, а rebuild_reason перестраивает индекс.
+    """
+    try:
+        return index.remove_ids(selector)
+    except RuntimeError:
+        return None
+
+
+def rebuild_reason(index: faiss.Index, n_live: Optional[int] = None) -> Optional[str]:
+    """
+    Решает, пора ли перестроить индекс под текущий размер корпуса и INDEX_TYPE.
+    n_live — число актуальных векторов (по умолчанию index.ntotal).
+    Возвращает причину (для лога) или None, если индекс в порядке.
+    """
+    n = index.ntotal if n_live is None else n_live
+    current_type, target_type = index_type(index), choose_index_type(n)
+
+    if current_type != target_type:
+        if current_type == "FLAT":
+            return f"корпус вырос до {n} векторов, переход с плоского индекса на {target_type}"
+        if target_type == "FLAT":
+            return f"корпус уменьшился до {n} векторов, переход на плоский индекс"
+        return f"тип индекса {current_type}, в конфиге {target_type}"
+
+    stale = index.ntotal - n
+    if stale > max(1, INDEX_STALE_FRACTION * n):
+        return f"{stale} устаревших векторов из {index.ntotal}"
+
+    if faiss.try_extract_index_ivf(index) is None:
+        return None
+
+    current, target = index_nlist(index), choose_nlist(n)
+    if target != current and (not IVF_AUTO_NLIST or abs(math.log2(target / current)) >= 1):
+        return f"nlist {current} не соответствует {n} векторам (нужно {target})"
+
+    imbalance = faiss.extract_index_ivf(index).invlists.imbalance_factor()
+    if imbalance > IVF_IMBALANCE_THRESHOLD:
+        return f"перекос длин списков IVF {imbalance:.2f} > {IVF_IMBALANCE_THRESHOLD}, перетренировка центроидов"
+    return None
+
+
+def open_index(path: str, mmap: bool = INDEX_MMAP) -> faiss.Index:
+    """
+    Индекс для поиска (только чтение). При mmap коды векторов не копируются в память
+    процесса, а отображаются из файла: сервер стартует без чтения всего индекса, а
+    несколько процессов на одной машине делят одни страницы page cache. Если сборка
+    FAISS или тип индекса так не умеют, индекс читается обычным образом.
+    """
+    if mmap:
+        # IO_FLAG_MMAP_IFC (FAISS >= 1.9) отображает коды и плоских индексов, IO_FLAG_MMAP — только списки IVF
+        flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+        try:
+            return faiss.read_index(path, flag | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            pass
+    return faiss.read_index(path)
+
+
+def apply_search_params(index: faiss.Index, nprobe: int = N_PROBE, ef_search: int = HNSW_EF_SEARCH):
+    """Параметры поиска под тип индекса: nprobe для IVF, efSearch для HNSW."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = nprobe
+        return
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+    if isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = ef_search
+
+
+def index_ids(index: faiss.Index) -> np.ndarray:
+    """Все id векторов индекса (у HNSW — вместе с устаревшими)."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is None:
+        return faiss.vector_to_array(index.id_map)
+    invlists = ivf.invlists
+    parts = [faiss.rev_swig_ptr(invlists.get_ids(i), invlists.list_size(i)).copy()
+             for i in range(ivf.nlist) if invlists.list_size(i)]
+    return np.concatenate(parts) if parts else np.zeros(0, dtype="int64")
+
+
+def index_bytes(index: faiss.Index) -> int:
+    """Размер индекса в сериализованном виде — приблизительно его объём в памяти."""
+    return int(faiss.serialize_index(index).nbytes)
@@ -0,0 +1,273 @@
+"""
+Публикация индекса версиями.
+
+create_FAISS обновляет рабочие файлы шарда (index.index, meta/, chunk/, reducer/)
+на месте, а сервер читает только опубликованные версии:
+
+    published/
+        CURRENT                    — имя текущей версии (заменяется атомарно)
+        versions/<версия>/
+            index.index, meta/, chunk/, reducer/
+            manifest.json          — размеры, число векторов и чанков, состояние исходников
+
+Версия собирается в каталоге <версия>.tmp, проверяется на согласованность индекса
+с метаданными, переименовывается и только после этого публикуется заменой CURRENT.
+Сбой на любом шаге оставляет текущую версию нетронутой.
+
+Файлы версии — жёсткие ссылки на рабочие: info.json и post.csr.bin MetaStore
+перезаписываются через os.replace (новый inode), а остальные файлы MetaStore и векторы
+только дописываются и обрезаются не короче закоммиченного размера (версия читает их
+в пределах своего info.json), поэтому версия не меняется при следующих обновлениях. Где ссылки невозможны, файлы копируются.
+"""
+
+import json
+import os
+import shutil
+import time
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from configs.cfg import INDEX_KEEP_VERSIONS
+from backend.bm25_index import BM25Index
+from backend.chunk_store import ChunkVectorStore
+from backend.dim_reduction import EmbeddingReducer
+from backend.faiss_index import describe, index_ids, index_type
+from backend.meta_store import MetaStore
+from backend.shards import shard_paths
+
+PUBLISHED = "published"
+VERSIONS = "versions"
+CURRENT = "CURRENT"
+MANIFEST = "manifest.json"
+
+
+def published_root(name: str) -> str:
+    return os.path.join(os.path.dirname(shard_paths(name)[0]), PUBLISHED)
+
+
+def version_dir(name: str, version: str) -> str:
+    return os.path.join(published_root(name), VERSIONS, version)
+
+
+def version_paths(base: str) -> Tuple[str, str, str, str]:
+    """Пути версии в том же порядке, что и shard_paths: (индекс, MetaStore, векторы чанков, reducer)."""
+    return (os.path.join(base, "index.index"), os.path.join(base, "meta"), os.path.join(base, "chunk"),
+            os.path.join(base, "reducer"))
+
+
+def current_version(name: str) -> Optional[str]:
+    try:
+        with open(os.path.join(published_root(name), CURRENT), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def resolve_shard(name: str) -> Tuple[Optional[str], Tuple[str, str, str, str]]:
+    """
+    (версия, пути) для чтения шарда. Пока шард ни разу не публиковался,
+    возвращаются рабочие пути и версия None.
+    """
+    version = current_version(name)
+    if version is None:
+        return None, shard_paths(name)
+    return version, version_paths(version_dir(name, version))
+
+
+def read_manifest(base: str) -> Dict:
+    with open(os.path.join(base, MANIFEST), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _read_text(path: str) -> Optional[str]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def source_state(paths: Tuple[str, str, str, str]) -> Dict:
+    """Состояние рабочих файлов: если оно не изменилось, новую версию публиковать незачем."""
+    index_file, meta_dir, chunk_dir, reducer_dir = paths
+    st = os.stat(index_file)
+    return {
+        "index": [st.st_size, st.st_mtime_ns],
+        "meta": _read_text(os.path.join(meta_dir, MetaStore.INFO)),
+        "chunk": _read_text(os.path.join(chunk_dir, ChunkVectorStore.INFO)),
+        "reducer": _read_text(os.path.join(reducer_dir, EmbeddingReducer.INFO)),
+        "lexical": _read_text(os.path.join(meta_dir, BM25Index.INFO)),
+    }
+
+
+def _link_or_copy(src: str, dst: str):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _snapshot_dir(src: str, dst: str):
+    """Переносит в версию закоммиченные файлы каталога (без незавершённых *.tmp)."""
+    os.makedirs(dst, exist_ok=True)
+    if not os.path.isdir(src):
+        return
+    for file in os.listdir(src):
+        if ".tmp" not in file:
+            _link_or_copy(os.path.join(src, file), os.path.join(dst, file))
+
+
+def _file_sizes(base: str) -> Dict[str, int]:
+    sizes = {}
+    for root, _, files in os.walk(base):
+        for file in files:
+            if file != MANIFEST:
+                path = os.path.join(root, file)
+                sizes[os.path.relpath(path, base)] = os.path.getsize(path)
+    return sizes
+
+
+def verify_version(base: str) -> Dict:
+    """
+    Проверяет, что индекс версии согласован с её метаданными, и возвращает сводку для
+    manifest.json. ValueError, если:
+        - размерность индекса не совпадает с reducer/ или chunk/;
+        - в индексе есть id вне MetaStore или повторяющиеся id;
+        - у актуального чанка нет вектора (или, кроме HNSW, в индексе есть лишние векторы);
+        - posting-списки или chunk/ ссылаются за пределы MetaStore;
+        - BM25-индекс (если есть) покрывает не все записи MetaStore.
+    """
+    index_file, meta_dir, chunk_dir, reducer_dir = version_paths(base)
+    index = faiss.read_index(index_file)
+    meta = MetaStore(meta_dir)
+    store = ChunkVectorStore(chunk_dir)
+    reducer = EmbeddingReducer.load(reducer_dir)
+
+    if index.d != reducer.out_dim:
+        raise ValueError(f"размерность индекса {index.d}, reducer даёт {reducer.out_dim}")
+    if store.n_rows and store.dim != index.d:
+        raise ValueError(f"размерность индекса {index.d}, векторов чанков {store.dim}")
+
+    ids = index_ids(index)
+    if len(ids) != index.ntotal:
+        raise ValueError(f"в индексе {index.ntotal} векторов, но {len(ids)} id")
+    if len(ids) and (ids.min() < 0 or ids.max() >= meta.n_chunks):
+        raise ValueError(f"id векторов вне диапазона чанков MetaStore (0..{meta.n_chunks - 1})")
+    if len(np.unique(ids)) != len(ids):
+        raise ValueError("в индексе есть повторяющиеся id")
+
+    post_offsets = np.asarray(meta.post_offsets)
+    post_records = np.asarray(meta.post_records)
+    if len(post_offsets) != meta.n_chunks + 1:
+        raise ValueError(f"posting-списков {len(post_offsets) - 1}, чанков {meta.n_chunks}")
+    if post_records.size and post_records.max() >= meta.n_records:
+        raise ValueError(f"posting-списки ссылаются за пределы {meta.n_records} записей")
+    chunk_ids = np.asarray(store.chunk_ids)
+    if chunk_ids.size and chunk_ids.max() >= meta.n_chunks:
+        raise ValueError(f"векторы чанков ссылаются за пределы {meta.n_chunks} чанков")
+
+    if BM25Index.exists(meta_dir):
+        with open(os.path.join(meta_dir, BM25Index.INFO), "r", encoding="utf-8") as f:
+            n_lexical = json.load(f)["n_docs"]
+        if n_lexical != meta.n_records:
+            raise ValueError(f"в BM25-индексе {n_lexical} записей, в MetaStore {meta.n_records}")
+
+    live = np.flatnonzero(np.diff(post_offsets) > 0)
+    live = np.setdiff1d(live, np.asarray(meta.failed_chunks, dtype="int64"))
+    missing = np.setdiff1d(live, ids)
+    if len(missing):
+        raise ValueError(f"у {len(missing)} актуальных чанков нет вектора в индексе")
+    stale = len(ids) - len(live)
+    if stale and index_type(index) != "HNSW":
+        raise ValueError(f"в индексе {stale} векторов чанков без записей")
+
+    return {
+        "index": describe(index),
+        "dim": int(index.d),
+        "ntotal": int(index.ntotal),
+        "n_records": meta.n_records,
+        "n_live_records": int(np.count_nonzero(meta.alive)),
+        "n_chunks": meta.n_chunks,
+        "n_live_chunks": int(len(live)),
+        "n_stale_vectors": int(stale),
+        "n_chunk_rows": store.n_rows,
+        "reduction": reducer.mode,
+    }
+
+
+def _versions(name: str) -> List[str]:
+    path = os.path.join(published_root(name), VERSIONS)
+    return sorted(v for v in os.listdir(path) if not v.endswith(".tmp")) if os.path.isdir(path) else []
+
+
+def _remove_old_versions(name: str, current: str, keep: int = INDEX_KEEP_VERSIONS):
+    # прежние версии остаются на диске: сервер может ещё дочитывать их до перезагрузки
+    old = [v for v in _versions(name) if v != current]
+    for version in old[:max(0, len(old) - keep)]:
+        shutil.rmtree(version_dir(name, version), ignore_errors=True)
+
+
+def publish_shard(name: str) -> Optional[str]:
+    """
+    Публикует текущее рабочее состояние шарда новой версией и возвращает её имя.
+    Если состояние не менялось с прошлой публикации, возвращает текущую версию.
+    """
+    paths = shard_paths(name)
+    if not os.path.exists(paths[0]) or not MetaStore.exists(paths[1]):
+        print(f"[PUBLISH] Шард {name}: индекс ещё не построен, публиковать нечего.")
+        return None
+
+    source = source_state(paths)
+    current = current_version(name)
+    if current is not None:
+        try:
+            if read_manifest(version_dir(name, current)).get("source") == source:
+                print(f"[PUBLISH] Шард {name}: версия {current} актуальна.")
+                return current
+        except (OSError, ValueError):
+            pass
+
+    root = published_root(name)
+    versions_path = os.path.join(root, VERSIONS)
+    os.makedirs(versions_path, exist_ok=True)
+    # недостроенные версии прерванных публикаций
+    for leftover in os.listdir(versions_path):
+        if leftover.endswith(".tmp"):
+            shutil.rmtree(os.path.join(versions_path, leftover), ignore_errors=True)
+
+    version = time.strftime("%Y%m%d-%H%M%S") + f"-{time.time_ns() % 1_000_000_000:09d}"
+    tmp = os.path.join(versions_path, f"{version}.tmp")
+    index_file, meta_dir, chunk_dir, reducer_dir = version_paths(tmp)
+    os.makedirs(tmp)
+    _link_or_copy(paths[0], index_file)
+    _snapshot_dir(paths[1], meta_dir)
+    _snapshot_dir(paths[2], chunk_dir)
+    # reducer/pca.bin перезаписывается на месте, поэтому копируется
+    if os.path.isdir(paths[3]):
+        shutil.copytree(paths[3], reducer_dir, ignore=shutil.ignore_patterns("*.tmp"))
+
+    try:
+        summary = verify_version(tmp)
+    except ValueError as e:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise ValueError(f"Шард {name}: версия не опубликована, индекс не согласован с метаданными: {e}") from e
+
+    manifest = {"version": version, "shard": name, "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                **summary, "files": _file_sizes(tmp), "source": source}
+    with open(os.path.join(tmp, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.rename(tmp, version_dir(name, version))
+
+    pointer = os.path.join(root, CURRENT)
+    with open(f"{pointer}.tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f"{pointer}.tmp", pointer)
+
+    _remove_old_versions(name, version)
+    print(f"[PUBLISH] Шард {name}: опубликована версия {version} ({summary['index']}, "
+          f"{summary['ntotal']} векторов, {summary['n_live_records']} записей).")
+    return version
@@ -0,0 +1,527 @@
+import hashlib
+import json
+import mmap
+import os
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+FORMAT = 2
+
+
+def _load_array(path: str, mmap_mode: str = "r") -> np.ndarray:
+    try:
+        return np.load(path, mmap_mode=mmap_mode)
+    except ValueError:
+        # пустые массивы не отображаются в память
+        return np.load(path)
+
+
+def _save_array(path: str, arr: np.ndarray):
+    tmp = f"{path}.tmp.npy"
+    np.save(tmp, arr)
+    os.replace(tmp, path)
+
+
+def record_fingerprint(rec: Dict) -> int:
+    """Отпечаток содержимого записи: по нему инкрементальное обновление находит изменённые CV."""
+    data = json.dumps(rec, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little", signed=True)
+
+
+def text_hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+
+def _map_file(path: str):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return b""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _column(path: str, dtype: str, count: int, width: int = 0) -> np.ndarray:
+    """Первые count элементов файла-столбца (хвост от незакоммиченной записи не читается)."""
+    shape = (count, width) if width else (count,)
+    if count == 0:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+
+def build_postings(pairs: np.ndarray, alive: np.ndarray, n_chunks: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Posting-списки (CSR: смещения и индексы записей) из журнала пар (чанк, запись):
+    пары удалённых записей отбрасываются, внутри чанка записи идут в порядке добавления.
+    """
+    pairs = np.asarray(pairs)
+    cids, recs = pairs[:, 0], pairs[:, 1]
+    keep = alive[recs]
+    cids, recs = cids[keep], recs[keep]
+    order = np.argsort(cids, kind="stable")
+    offsets = np.zeros(n_chunks + 1, dtype="int64")
+    np.cumsum(np.bincount(cids, minlength=n_chunks), out=offsets[1:])
+    return offsets, recs[order].astype("int32")
+
+
+class MetaStore:
+    """
+    Компактное колоночное хранилище метаданных индекса (каталог вместо metadata.json).
+
+    Файлы:
+        info.json        — число записей, чанков, пар и удалённых записей, id чанков
+                           без эмбеддинга, размер chunk/ на момент коммита (пишется
+                           последним и служит точкой коммита)
+        records.jsonl    — по одной записи (JSON) на строку
+        records.off.bin  — int64 смещения строк records.jsonl, n_records + 1
+        records.tid.bin  — int64 telegram_id записей
+        records.hash.bin — int64 отпечаток содержимого записи
+        records.dead.bin — int64 индексы удалённых и заменённых версий записей
+        chunks.txt       — тексты чанков подряд (utf-8), id чанка = id вектора в FAISS
+        chunks.off.bin   — int64 смещения текстов, n_chunks + 1
+        chunks.hash.bin  — int64 хэш текста чанка (поиск чанка по тексту при индексации)
+        post.pair.bin    — int32 пары (id чанка, запись) в порядке добавления записей
+        post.csr.bin     — posting-списки живых записей (CSR), собранные из post.pair.bin
+                           в конце прогона индексации: заголовок (пар, удалённых, чанков),
+                           int64 смещения (n_chunks + 1) и int32 индексы записей
+
+    Все файлы, кроме info.json и post.csr.bin, только дописываются, поэтому коммит
+    батча стоит O(новых данных). Массивы открываются через mmap, записи декодируются
+    по запросу. Удалённые и отредактированные записи не стираются, а попадают
+    в records.dead и выпадают из posting-списков, поэтому поиск их больше не находит.
+    Если post.csr.bin отстаёт от info.json (прогон прервался), posting-списки
+    собираются из post.pair.bin при чтении.
+
+    Каталоги старого формата (массивы .npy, без "format" в info.json) читаются как
+    прежде; MetaStoreBuilder переводит их в новый формат при первом обновлении.
+    """
+
+    INFO = "info.json"
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(self._file(self.INFO), "r", encoding="utf-8") as f:
+            info = json.load(f)
+        self.format = info.get("format", 1)
+        self.n_records = info["n_records"]
+        self.n_chunks = info["n_chunks"]
+        self.n_pairs = info.get("n_pairs", 0)
+        self.n_dead = info.get("n_dead", 0)
+        self.csr = info.get("csr")
+        self.failed_chunks = info.get("failed_chunks", [])
+        # размер ChunkVectorStore, закоммиченный вместе с этим состоянием (None — хранилище старого формата)
+        self.chunk_rows = info.get("chunk_rows")
+        self.chunk_segments = info.get("chunk_segments")
+
+        self._records = _map_file(self._file("records.jsonl"))
+        self._chunks = _map_file(self._file("chunks.txt"))
+        self._alive = self._postings = None
+        if self.format == 1:
+            self.record_offsets = _load_array(self._file("records.off.npy"))
+            self.telegram_ids = _load_array(self._file("records.tid.npy"))
+            self.hashes = _load_array(self._file("records.hash.npy"))
+            self.chunk_offsets = _load_array(self._file("chunks.off.npy"))
+            self._alive = _load_array(self._file("records.alive.npy"))
+            self._postings = (_load_array(self._file("post.off.npy")), _load_array(self._file("post.rec.npy")))
+        else:
+            self.record_offsets = _column(self._file("records.off.bin"), "int64", self.n_records + 1)
+            self.telegram_ids = _column(self._file("records.tid.bin"), "int64", self.n_records)
+            self.hashes = _column(self._file("records.hash.bin"), "int64", self.n_records)
+            self.chunk_offsets = _column(self._file("chunks.off.bin"), "int64", self.n_chunks + 1)
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        return os.path.exists(os.path.join(path, cls.INFO))
+
+    @property
+    def alive(self) -> np.ndarray:
+        """bool по записям: False для удалённых и заменённых версий."""
+        if self._alive is None:
+            alive = np.ones(self.n_records, dtype="bool")
+            alive[_column(self._file("records.dead.bin"), "int64", self.n_dead)] = False
+            self._alive = alive
+        return self._alive
+
+    def _load_postings(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._postings is None:
+            header = (self.n_pairs, self.n_dead, self.n_chunks)
+            path = self._file("post.csr.bin")
+            if self.csr == list(header) and os.path.exists(path) and \
+                    np.fromfile(path, dtype="int64", count=3).tolist() == list(header):
+                offsets = np.memmap(path, dtype="int64", mode="r", offset=24, shape=(self.n_chunks + 1,))
+                n_post = int(offsets[-1])
+                records = _column(path, "int32", 0) if n_post == 0 else \
+                    np.memmap(path, dtype="int32", mode="r", offset=24 + 8 * (self.n_chunks + 1), shape=(n_post,))
+                self._postings = (offsets, records)
+            else:
+                pairs = _column(self._file("post.pair.bin"), "int32", self.n_pairs, 2)
+                self._postings = build_postings(pairs, self.alive, self.n_chunks)
+        return self._postings
+
+    @property
+    def post_offsets(self) -> np.ndarray:
+        return self._load_postings()[0]
+
+    @property
+    def post_records(self) -> np.ndarray:
+        return self._load_postings()[1]
+
+    def record(self, rec_idx: int) -> Dict:
+        start, end = self.record_offsets[rec_idx], self.record_offsets[rec_idx + 1]
+        return json.loads(self._records[start:end])
+
+    def chunk(self, chunk_id: int) -> str:
+        start, end = self.chunk_offsets[chunk_id], self.chunk_offsets[chunk_id + 1]
+        return self._chunks[start:end].decode("utf-8")
+
+    def postings(self, chunk_id: int) -> np.ndarray:
+        offsets, records = self._load_postings()
+        return records[offsets[chunk_id]:offsets[chunk_id + 1]]
+
+    def all_chunks(self) -> List[str]:
+        offsets = self.chunk_offsets
+        blob = self._chunks[:]
+        return [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(self.n_chunks)]
+
+
+class IntIndex:
+    """
+    Отображение int64 -> int64 на миллионы ключей без словаря Python на каждый ключ:
+    отсортированные массивы numpy плюс небольшой словарь последних изменений, который
+    вливается в массивы, когда вырастает до четверти их размера.
+    """
+
+    MIN_MERGE = 1 << 16
+
+    def __init__(self, keys: Optional[np.ndarray] = None, values: Optional[np.ndarray] = None):
+        keys = np.zeros(0, dtype="int64") if keys is None else np.asarray(keys, dtype="int64")
+        values = np.zeros(0, dtype="int64") if values is None else np.asarray(values, dtype="int64")
+        order = np.argsort(keys, kind="stable")
+        self._keys, self._values = keys[order], values[order]
+        self._recent: Dict[int, Optional[int]] = {}  # None — ключ удалён
+
+    def get(self, key: int) -> Optional[int]:
+        if key in self._recent:
+            return self._recent[key]
+        i = int(np.searchsorted(self._keys, key))
+        if i < len(self._keys) and self._keys[i] == key:
+            return int(self._values[i])
+        return None
+
+    def __setitem__(self, key: int, value: int):
+        self._recent[key] = value
+        self._maybe_merge()
+
+    def pop(self, key: int):
+        self._recent[key] = None
+        self._maybe_merge()
+
+    def _maybe_merge(self):
+        if len(self._recent) < max(self.MIN_MERGE, len(self._keys) // 4):
+            return
+        changed = np.fromiter(self._recent.keys(), dtype="int64", count=len(self._recent))
+        keep = ~np.isin(self._keys, changed)
+        added = [(k, v) for k, v in self._recent.items() if v is not None]
+        keys = np.concatenate([self._keys[keep], np.array([k for k, _ in added], dtype="int64")])
+        values = np.concatenate([self._values[keep], np.array([v for _, v in added], dtype="int64")])
+        order = np.argsort(keys, kind="stable")
+        self._keys, self._values = keys[order], values[order]
+        self._recent = {}
+
+
+class MetaStoreBuilder:
+    """
+    Дополняет MetaStore новыми записями и чанками.
+
+    Все файлы только дописываются (flush коммитит батч за O(новых данных)), а в памяти
+    держатся лишь числовые столбцы: смещения, telegram_id, отпечатки, число живых
+    записей у каждого чанка и индексы по telegram_id и хэшу текста чанка. Тексты
+    записей и чанков читаются с диска по запросу. posting-списки для поиска
+    собираются из журнала пар один раз — flush(compact=True) в конце прогона.
+
+    Чанк, у которого не осталось записей, остаётся в chunks.txt; если он снова
+    встретится, получит тот же id.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+        store = MetaStore(path) if MetaStore.exists(path) else None
+        if store is not None and store.format == 1:
+            self._migrate(store)
+            store = MetaStore(path)
+
+        if store is not None:
+            self.record_offsets = array("q", np.asarray(store.record_offsets).tobytes())
+            self.telegram_ids = array("q", np.asarray(store.telegram_ids).tobytes())
+            self.hashes = array("q", np.asarray(store.hashes).tobytes())
+            self.alive = bytearray(store.alive.tobytes())
+            self.chunk_offsets = array("q", np.asarray(store.chunk_offsets).tobytes())
+            chunk_hashes = _column(self._file("chunks.hash.bin"), "int64", store.n_chunks)
+            pairs = _column(self._file("post.pair.bin"), "int32", store.n_pairs, 2)
+            self.failed_chunks = list(store.failed_chunks)
+            self.chunk_rows, self.chunk_segments = store.chunk_rows, store.chunk_segments
+            self.n_pairs, self.n_dead = store.n_pairs, store.n_dead
+        else:
+            self.record_offsets, self.telegram_ids, self.hashes = array("q", [0]), array("q"), array("q")
+            self.alive = bytearray()
+            self.chunk_offsets = array("q", [0])
+            chunk_hashes = np.zeros(0, dtype="int64")
+            pairs = np.zeros((0, 2), dtype="int32")
+            self.failed_chunks = []
+            self.chunk_rows = self.chunk_segments = 0
+            self.n_pairs = self.n_dead = 0
+
+        alive = np.frombuffer(bytes(self.alive), dtype="bool")
+        # пары записи идут подряд: начало пар каждой записи и число живых записей у каждого чанка
+        self.pair_starts = array("q", np.searchsorted(pairs[:, 1], np.arange(self.n_records)).astype("int64").tobytes())
+        live_pairs = pairs[alive[pairs[:, 1]]] if len(pairs) else pairs
+        self.refs = array("i", np.bincount(live_pairs[:, 0], minlength=self.n_chunks).astype("int32").tobytes())
+
+        live = np.flatnonzero(alive)
+        self.live_rows = IntIndex(np.asarray(self.telegram_ids, dtype="int64")[live], live)
+        self.chunk_index = IntIndex(chunk_hashes, np.arange(len(chunk_hashes)))
+        self.n_live = len(live)
+
+        self._committed = (self.n_records, self.n_chunks, self.n_pairs, self.n_dead) if store is not None else None
+        self._new_records: List[bytes] = []
+        self._new_chunks: List[bytes] = []
+        self._new_chunk_hashes: List[int] = []
+        self._new_pairs = array("i")
+        self._new_dead: List[int] = []
+        self._record_chunks: Dict[int, None] = {}
+        self._fds: Dict[str, int] = {}
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @property
+    def n_records(self) -> int:
+        return len(self.telegram_ids)
+
+    @property
+    def n_chunks(self) -> int:
+        return len(self.chunk_offsets) - 1
+
+    def _read(self, name: str, start: int, end: int) -> bytes:
+        fd = self._fds.get(name)
+        if fd is None:
+            fd = self._fds[name] = os.open(self._file(name), os.O_RDONLY)
+        return os.pread(fd, end - start, start)
+
+    def live_row(self, telegram_id: int) -> Optional[int]:
+        """Индекс актуальной версии записи с этим telegram_id (None — записи нет)."""
+        return self.live_rows.get(telegram_id)
+
+    def is_unchanged(self, rec: Dict) -> bool:
+        row = self.live_row(rec["telegram_id"])
+        return row is not None and self.hashes[row] == record_fingerprint(rec)
+
+    def record(self, rec_idx: int) -> Dict:
+        committed = self._committed[0] if self._committed else 0
+        if rec_idx >= committed:
+            return json.loads(self._new_records[rec_idx - committed])
+        return json.loads(self._read("records.jsonl", self.record_offsets[rec_idx], self.record_offsets[rec_idx + 1]))
+
+    def chunk(self, chunk_id: int) -> str:
+        committed = self._committed[1] if self._committed else 0
+        if chunk_id >= committed:
+            return self._new_chunks[chunk_id - committed].decode("utf-8")
+        return self._read("chunks.txt", self.chunk_offsets[chunk_id], self.chunk_offsets[chunk_id + 1]).decode("utf-8")
+
+    def has_records(self, chunk_id: int) -> bool:
+        return self.refs[chunk_id] > 0
+
+    def live_chunks(self) -> np.ndarray:
+        """id чанков, у которых есть живые записи."""
+        return np.flatnonzero(np.frombuffer(self.refs, dtype="int32") > 0)
+
+    def add_record(self, rec: Dict) -> int:
+        line = (json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8")
+        self._new_records.append(line)
+        self.record_offsets.append(self.record_offsets[-1] + len(line))
+        self.telegram_ids.append(rec["telegram_id"])
+        self.hashes.append(record_fingerprint(rec))
+        self.alive.append(1)
+        self.pair_starts.append(self.n_pairs)
+        self.live_rows[rec["telegram_id"]] = self.n_records - 1
+        self.n_live += 1
+        self._record_chunks = {}
+        return self.n_records - 1
+
+    def _record_pairs(self, rec_idx: int) -> np.ndarray:
+        start = self.pair_starts[rec_idx]
+        end = self.pair_starts[rec_idx + 1] if rec_idx + 1 < self.n_records else self.n_pairs
+        committed = self._committed[2] if self._committed else 0
+        if start >= committed:
+            return np.asarray(self._new_pairs[2 * (start - committed):2 * (end - committed)], dtype="int32")[0::2]
+        data = self._read("post.pair.bin", 8 * start, 8 * end)
+        return np.frombuffer(data, dtype="int32")[0::2]
+
+    def remove_record(self, rec_idx: int) -> List[int]:
+        """
+        Помечает запись удалённой и убирает её из posting-списков её чанков.
+        Возвращает id чанков, у которых не осталось записей (их векторы надо удалить из индекса).
+        """
+        if not self.alive[rec_idx]:
+            return []
+        self.alive[rec_idx] = 0
+        self._new_dead.append(rec_idx)
+        self.n_live -= 1
+        if self.live_rows.get(self.telegram_ids[rec_idx]) == rec_idx:
+            self.live_rows.pop(self.telegram_ids[rec_idx])
+        orphaned = []
+        for cid in self._record_pairs(rec_idx).tolist():
+            self.refs[cid] -= 1
+            if not self.refs[cid]:
+                orphaned.append(cid)
+        return orphaned
+
+    def add_chunk_ref(self, text: str, rec_idx: int) -> Tuple[int, bool]:
+        """
+        Привязывает чанк к последней добавленной записи. Возвращает (id чанка, True если
+        чанку нужен вектор в индексе — он новый или у него не было записей). Повторная
+        привязка к той же записи даёт id = -1.
+        """
+        if rec_idx != self.n_records - 1:
+            raise ValueError("чанки привязываются только к последней добавленной записи")
+        h = text_hash(text)
+        cid = self.chunk_index.get(h)
+        if cid is not None and self.chunk(cid) != text:
+            # коллизия 64-битного хэша: чанк получает новый id, но в индекс по хэшу не попадает
+            cid, h = None, None
+        if cid is None:
+            data = text.encode("utf-8")
+            cid = self.n_chunks
+            if h is not None:
+                self.chunk_index[h] = cid
+            self._new_chunks.append(data)
+            self._new_chunk_hashes.append(text_hash(text))
+            self.chunk_offsets.append(self.chunk_offsets[-1] + len(data))
+            self.refs.append(0)
+        if cid in self._record_chunks:
+            return -1, False
+        self._record_chunks[cid] = None
+        needs_vector = not self.refs[cid]
+        self.refs[cid] += 1
+        self._new_pairs.extend((cid, rec_idx))
+        self.n_pairs += 1
+        return cid, needs_vector
+
+    def flush(self, compact: bool = False):
+        """
+        Коммитит батч: дописывает новые данные в файлы и перезаписывает info.json.
+        compact — заодно собрать post.csr.bin, чтобы читателям не собирать posting-списки
+        из журнала пар (делается в конце прогона).
+        """
+        n_records, n_chunks, n_pairs, n_dead = self._committed or (0, 0, 0, 0)
+        fresh = self._committed is None
+        self._append("records.jsonl", self.record_offsets[n_records],
+                     b"".join(self._new_records))
+        self._append("chunks.txt", self.chunk_offsets[n_chunks], b"".join(self._new_chunks))
+        # у столбцов смещений есть ведущий 0: в новом каталоге пишем его вместе с первым батчем
+        self._append("records.off.bin", 0 if fresh else 8 * (n_records + 1),
+                     np.asarray(self.record_offsets[0 if fresh else n_records + 1:], dtype="int64").tobytes())
+        self._append("records.tid.bin", 8 * n_records, np.asarray(self.telegram_ids[n_records:], dtype="int64").tobytes())
+        self._append("records.hash.bin", 8 * n_records, np.asarray(self.hashes[n_records:], dtype="int64").tobytes())
+        self._append("records.dead.bin", 8 * n_dead, np.asarray(self._new_dead, dtype="int64").tobytes())
+        self._append("chunks.off.bin", 0 if fresh else 8 * (n_chunks + 1),
+                     np.asarray(self.chunk_offsets[0 if fresh else n_chunks + 1:], dtype="int64").tobytes())
+        self._append("chunks.hash.bin", 8 * n_chunks, np.asarray(self._new_chunk_hashes, dtype="int64").tobytes())
+        self._append("post.pair.bin", 8 * n_pairs, self._new_pairs.tobytes())
+
+        self.n_dead += len(self._new_dead)
+        self._new_records, self._new_chunks, self._new_chunk_hashes = [], [], []
+        self._new_pairs, self._new_dead = array("i"), []
+        self._committed = (self.n_records, self.n_chunks, self.n_pairs, self.n_dead)
+
+        info = self._info()
+        if compact:
+            self._write_postings()
+            info["csr"] = [self.n_pairs, self.n_dead, self.n_chunks]
+        else:
+            info["csr"] = self._csr_state()
+        self._write_info(info)
+
+    @property
+    def is_compacted(self) -> bool:
+        """post.csr.bin соответствует закоммиченному состоянию (или хранилище ещё не создано)."""
+        return self._committed is None or self._csr_state() == [self.n_pairs, self.n_dead, self.n_chunks]
+
+    def _info(self) -> Dict:
+        return {"format": FORMAT, "n_records": self.n_records, "n_live_records": self.n_live,
+                "n_chunks": self.n_chunks, "n_pairs": self.n_pairs, "n_dead": self.n_dead,
+                "failed_chunks": self.failed_chunks,
+                "chunk_rows": self.chunk_rows, "chunk_segments": self.chunk_segments}
+
+    def _csr_state(self) -> Optional[List[int]]:
+        # post.csr.bin прошлого прогона остаётся в силе, пока заголовок совпадает с info.json
+        if not MetaStore.exists(self.path):
+            return None
+        with open(self._file(MetaStore.INFO), "r", encoding="utf-8") as f:
+            return json.load(f).get("csr")
+
+    def _write_info(self, info: Dict):
+        info_path = self._file(MetaStore.INFO)
+        with open(f"{info_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(info, f)
+        os.replace(f"{info_path}.tmp", info_path)
+
+    def _write_postings(self):
+        pairs = _column(self._file("post.pair.bin"), "int32", self.n_pairs, 2)
+        offsets, records = build_postings(pairs, np.frombuffer(bytes(self.alive), dtype="bool"), self.n_chunks)
+        path = self._file("post.csr.bin")
+        with open(f"{path}.tmp", "wb") as f:
+            np.asarray([self.n_pairs, self.n_dead, self.n_chunks], dtype="int64").tofile(f)
+            offsets.tofile(f)
+            records.tofile(f)
+        os.replace(f"{path}.tmp", path)
+
+    def _append(self, name: str, committed: int, data: bytes):
+        # хвост от прерванной записи обрезаем по закоммиченному размеру
+        with open(self._file(name), "ab") as f:
+            f.truncate(committed)
+            f.write(data)
+
+    def close(self):
+        for fd in self._fds.values():
+            os.close(fd)
+        self._fds = {}
+
+    def _migrate(self, store: MetaStore):
+        """Переводит каталог старого формата (.npy) в append-only столбцы."""
+        offsets, records = (np.asarray(a) for a in store._postings)
+        cids = np.repeat(np.arange(store.n_chunks, dtype="int32"), np.diff(offsets[:store.n_chunks + 1]))
+        keep = records < store.n_records
+        cids, records = cids[keep], records[keep].astype("int32")
+        order = np.argsort(records, kind="stable")
+        pairs = np.stack([cids[order], records[order]], axis=1)
+        dead = np.flatnonzero(~np.asarray(store.alive[:store.n_records], dtype="bool"))
+        hashes = np.fromiter((text_hash(store.chunk(i)) for i in range(store.n_chunks)), dtype="int64",
+                             count=store.n_chunks)
+        columns = {
+            "records.off.bin": np.asarray(store.record_offsets[:store.n_records + 1], dtype="int64"),
+            "records.tid.bin": np.asarray(store.telegram_ids[:store.n_records], dtype="int64"),
+            "records.hash.bin": np.asarray(store.hashes[:store.n_records], dtype="int64"),
+            "records.dead.bin": dead.astype("int64"),
+            "chunks.off.bin": np.asarray(store.chunk_offsets[:store.n_chunks + 1], dtype="int64"),
+            "chunks.hash.bin": hashes,
+            "post.pair.bin": pairs.astype("int32"),
+        }
+        for name, data in columns.items():
+            with open(self._file(name), "wb") as f:
+                data.tofile(f)
+        self._write_info({"format": FORMAT, "n_records": store.n_records,
+                          "n_live_records": store.n_records - len(dead), "n_chunks": store.n_chunks,
+                          "n_pairs": len(pairs), "n_dead": len(dead), "csr": None,
+                          "failed_chunks": store.failed_chunks,
+                          "chunk_rows": store.chunk_rows, "chunk_segments": store.chunk_segments})
+        for name in ("records.off.npy", "records.tid.npy", "records.hash.npy", "records.alive.npy",
+                     "chunks.off.npy", "post.off.npy", "post.rec.npy"):
+            if os.path.exists(self._file(name)):
+                os.remove(self._file(name))
+        print(f"[META] {self.path}: метаданные переведены в формат {FORMAT}.")
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+import numpy as np
+import openai
+
+from configs.cfg import (
+    embedding_model,
+    embedding_dim,
+    openai_embedding_concurrency,
+    openai_embedding_max_batch_tokens,
+    openai_embedding_max_batch_items,
+    openai_embedding_max_retries,
+)
+from utils.logger import setup_logger
+
+logger = setup_logger("openai")
+
+RETRYABLE_ERRORS = (
+    openai.error.RateLimitError,
+    openai.error.APIError,
+    openai.error.APIConnectionError,
+    openai.error.ServiceUnavailableError,
+    openai.error.Timeout,
+    asyncio.TimeoutError,
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка числа токенов (кириллица дороже латиницы, поэтому считаем по байтам utf-8)."""
+    return max(1, len(text.encode("utf-8")) // 3)
+
+
+def pack_batches(texts: List[str], max_tokens: int = openai_embedding_max_batch_tokens,
+                 max_items: int = openai_embedding_max_batch_items) -> List[List[int]]:
+    """Упаковывает индексы текстов в батчи по оценке токенов, а не по числу элементов."""
+    batches, current, current_tokens = [], [], 0
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    # на 429 сервер сам подсказывает, сколько ждать
+    headers = getattr(error, "headers", None) or {}
+    retry_after = headers.get("retry-after") or headers.get("Retry-After")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return min(60.0, 2 ** attempt) + random.uniform(0, 1)
+
+
+async def _embed_batch(batch: List[str], semaphore: asyncio.Semaphore, emb_model: str,
+                       max_retries: int) -> np.ndarray:
+    for attempt in range(max_retries + 1):
+        async with semaphore:
+            try:
+                response = await openai.Embedding.acreate(input=batch, model=emb_model)
+                data = sorted(response["data"], key=lambda x: x["index"])
+                return np.array([item["embedding"] for item in data], dtype="float32")
+            except RETRYABLE_ERRORS as e:
+                if attempt == max_retries:
+                    raise
+                delay = _retry_delay(e, attempt)
+                logger.warning(f"[OpenAI] {type(e).__name__}, повтор {attempt + 1}/{max_retries} через {delay:.1f}с")
+        await asyncio.sleep(delay)
+
+
+async def aembed_texts(texts: List[str], emb_model: str = embedding_model,
+                       concurrency: int = openai_embedding_concurrency,
+                       max_retries: int = openai_embedding_max_retries,
+                       verbose: bool = True) -> Tuple[np.ndarray, List[int]]:
+    """
+    Параллельно эмбеддит тексты через OpenAI. Батч с некорректным текстом делится
+    пополам, пока виноватый текст не найдётся; ошибки ключа API, прав доступа и другие
+    неповторяемые ошибки прерывают весь прогон сразу.
+
+    Прогресс по батчам пишется в лог на уровне INFO; verbose=False (запросы сервера)
+    опускает его до DEBUG, чтобы каждый промах кэша не попадал в stdout.
+
+    Returns:
+        Tuple[np.ndarray, List[int]]: матрица эмбеддингов и индексы текстов, которые
+        не удалось получить (их строки нулевые и не должны попадать в индекс).
+    """
+    out = np.zeros((len(texts), embedding_dim), dtype="float32")
+    failed: List[int] = []
+    if not texts:
+        return out, failed
+
+    batches = pack_batches(texts)
+    semaphore = asyncio.Semaphore(concurrency)
+    progress_level = logging.INFO if verbose else logging.DEBUG
+    done = 0
+
+    async def run(idx: List[int], count: bool = True):
+        nonlocal done
+        try:
+            vecs = await _embed_batch([texts[i] for i in idx], semaphore, emb_model, max_retries)
+            out[idx] = vecs
+        except RETRYABLE_ERRORS as e:
+            logger.error(f"[OpenAI] Батч из {len(idx)} текстов не получен: {e}")
+            failed.extend(idx)
+        except openai.error.InvalidRequestError as e:
+            # ошибка содержимого запроса (например, слишком длинный текст): делим батч, чтобы найти
+            # виноватые тексты; остальные ошибки (ключ, права доступа) пробрасываются и прерывают прогон
+            if len(idx) == 1:
+                logger.error(f"[OpenAI] Текст {idx[0]} не получен: {e}")
+                failed.extend(idx)
+            else:
+                half = len(idx) // 2
+                await asyncio.gather(run(idx[:half], count=False), run(idx[half:], count=False))
+        if not count:
+            return
+        done += 1
+        if done % 10 == 0 or done == len(batches):
+            logger.log(progress_level, f"[OpenAI] Готово батчей {done}/{len(batches)}")
+
+    tasks = [asyncio.ensure_future(run(idx)) for idx in batches]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # при неустранимой ошибке не отправляем оставшиеся батчи
+        for task in tasks:
+            task.cancel()
+        raise
+    return out, sorted(failed)
+
+
+def embed_texts(texts: List[str], **kwargs) -> Tuple[np.ndarray, List[int]]:
+    """
+    Синхронная обёртка над aembed_texts для скриптов индексации. Если в потоке уже
+    работает event loop (bin/create_FAISS запускает сборку из asyncio.run), клиент
+    выполняется в собственном loop отдельного потока.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(aembed_texts(texts, **kwargs))
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="openai-embed") as pool:
+        return pool.submit(lambda: asyncio.run(aembed_texts(texts, **kwargs))).result()
@@ -0,0 +1,69 @@
+"""
+Отчёт для выбора EMBEDDING_REDUCTION / EMBEDDING_REDUCED_DIM: как меняются recall@k,
+память и задержка поиска при уменьшении размерности векторов.
+
+Запуск: bin/reduction_report [число запросов] [k] [шард]
+
+Полные векторы берутся из кэша эмбеддингов; эталон — точный поиск по полным
+векторам. Для каждой размерности строится точный плоский индекс, так что
+в recall видна только потеря от уменьшения размерности.
+"""
+import sys
+from typing import Dict, List
+
+import numpy as np
+
+from backend.dim_reduction import EmbeddingReducer
+from backend.faiss_index import build_index
+from backend.shards import MAIN_SHARD
+from backend.tune_index import load_corpus_vectors, recall_at_k, search_latencies, split_queries
+
+DIM_GRID = (64, 128, 256, 384, 512, 768, 1024, 1536, 2048)
+
+
+def reduction_rows(vecs: np.ndarray, ids: np.ndarray, queries: np.ndarray, k: int = 30) -> List[Dict]:
+    in_dim = vecs.shape[1]
+    full = build_index(vecs, ids, "FLAT")
+    truth, full_latencies = search_latencies(full, queries, k)
+    rows = [{"mode": "full", "dim": in_dim, "bytes_per_vector": in_dim * 4, "ratio": 1.0,
+             "p50_ms": float(np.percentile(full_latencies, 50)), f"recall@{k}": 1.0}]
+
+    for mode in ("truncate", "pca"):
+        for dim in (d for d in DIM_GRID if d < in_dim):
+            reducer = EmbeddingReducer("", mode, in_dim, dim)
+            try:
+                reducer.fit(vecs)
+            except ValueError as e:
+                print(f"[REDUCE] {mode} {dim} пропущен: {e}")
+                continue
+            index = build_index(reducer.transform(vecs), ids, "FLAT")
+            found, latencies = search_latencies(index, reducer.transform(queries), k)
+            rows.append({
+                "mode": mode,
+                "dim": dim,
+                "bytes_per_vector": dim * 4,
+                "ratio": in_dim / dim,
+                "p50_ms": float(np.percentile(latencies, 50)),
+                f"recall@{k}": recall_at_k(found, truth),
+            })
+    return rows
+
+
+def print_report(rows: List[Dict], n: int, n_queries: int, k: int):
+    print(f"\n[REDUCE] {n} векторов, {n_queries} запросов, k={k}")
+    print(f"{'режим':<9} {'dim':>5} {'Б/вектор':>9} {'сжатие':>7} {'p50 мс':>8} {f'recall@{k}':>10}")
+    for r in rows:
+        print(f"{r['mode']:<9} {r['dim']:>5} {r['bytes_per_vector']:>9} {r['ratio']:>6.1f}x "
+              f"{r['p50_ms']:>8.2f} {r[f'recall@{k}']:>10.3f}")
+
+
+def main(n_queries: int = 200, k: int = 30, shard: str = MAIN_SHARD):
+    vecs, ids = load_corpus_vectors(reduce=False, shard=shard)
+    base, base_ids, queries = split_queries(vecs, ids, n_queries)
+    rows = reduction_rows(base, base_ids, queries, k)
+    print_report(rows, len(base_ids), len(queries), k)
+    return rows
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]), *sys.argv[3:4])
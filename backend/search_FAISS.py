@@ -1,68 +1,222 @@
-import json
+import asyncio
 import os
 import re
-from typing import Any, Tuple, List
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Optional, Tuple, List
 
 import faiss
 import numpy as np
-import openai
 import torch
-from sentence_transformers import SentenceTransformer
 
 from utils.logger import setup_logger
 from configs.cfg import (
-    index_path,
-    metadata_path,
-    chunk_path,
     embedding_model,
     embedding_dim,
     threshold,
-    N_PROBE,
+    SEARCH_MODE,
+    HYBRID_LEXICAL_K,
+    RRF_K,
+    ABBR_FAST_PATH,
+    FAST_PATH_MAX_TOKENS,
+    FAST_PATH_MAX_TOKEN_LEN,
+    FAST_PATH_MAX_RESULTS,
     EMBEDDING_MODE,
     POST_PROCESSING_FLAG,
     PRE_PROCESSING_LLM_FLAG,
     PRE_PROCESSING_SIMPLE_FLAG,
+    SEARCH_SHARD_THREADS,
+    query_cache_path,
+    query_cache_size,
+    SEARCH_ENCODE_WORKERS,
+    SEARCH_INDEX_WORKERS,
+    SEARCH_STAGE_MAX_PENDING,
+    SEARCH_BATCH_MAX_WAIT_MS,
+    SEARCH_BATCH_MAX_SIZE,
+    RECORD_AGGREGATION,
+    RERANK_OVERFETCH,
+    SEARCH_RECORDS_PER_QUERY,
+    SEARCH_MAX_K,
 )
 
 import backend.subprocessing_LLM
 import backend.subprocessing_nltk
+from backend.bm25_index import BM25Index
+from backend.chunk_store import ChunkVectorStore
+from backend.dim_reduction import EmbeddingReducer
+from backend.embedding_cache import QueryEmbeddingCache
+from backend.faiss_index import apply_search_params, describe, index_type, open_index
+from backend.index_publish import current_version, read_manifest, resolve_shard
+from backend.meta_store import MetaStore
+from backend.openai_embedder import aembed_texts
 from backend.q_preprocess import query_preprocess_faiss
+from backend.search_stages import QueryBatcher, SearchStage
+from backend.shards import available_shards, select_shards
+from backend.st_encoder import SentenceEncoder
+from backend.text_norm import SENTENCE_SPLIT, STOPWORDS, lexical_tokens
+from utils.abbr_f import abbr1, trans1
 
 logger = setup_logger("faiss")
 
-model = index = metadata = chunk_vectors = None
+model = shard_pool = query_cache = None
+# стадии поиска вне event loop сервера: кодирование запросов и поиск по индексу
+encode_stage = search_stage = None
+# объединяет запросы одновременных вызовов в общий батч кодирования и поиска
+batcher = None
+shards: Dict[str, "SearchShard"] = {}
+
+# аббревиатуры (utils.abbr_f) в виде токенов лексического индекса и их межалфавитные эквиваленты (ИИ <-> AI)
+ABBREVIATIONS = frozenset(tokens[0] for tokens in map(lexical_tokens, list(abbr1) + list(trans1) + list(trans1.values()))
+                          if len(tokens) == 1)
+
+
+def _equivalents(pairs: Dict[str, str]) -> Dict[str, List[str]]:
+    equivalents: Dict[str, List[str]] = {}
+    for src, dst in pairs.items():
+        (src,), (dst,) = lexical_tokens(src), lexical_tokens(dst)
+        equivalents.setdefault(src, []).append(dst)
+        equivalents.setdefault(dst, []).append(src)
+    return equivalents
+
+
+EQUIVALENTS = _equivalents(trans1)
+
+
+class SearchShard:
+    """Индекс, метаданные, векторы чанков, reducer и BM25-индекс опубликованной версии шарда."""
+
+    def __init__(self, name: str):
+        self.version, (index_file, meta_dir, chunk_dir, reducer_dir) = resolve_shard(name)
+        self.name = name
+        # векторы индекса отображаются из файла версии, а не копируются в память процесса
+        self.index = open_index(index_file)
+        # nprobe для IVF, efSearch для HNSW
+        apply_search_params(self.index)
+        self.metadata = MetaStore(meta_dir)
+        # запросы приводятся к той же размерности, что и векторы индекса
+        self.reducer = EmbeddingReducer.load(reducer_dir)
+        # векторы чанков отображаются в память только при первом обращении
+        self.chunk_vectors = ChunkVectorStore(chunk_dir)
+        # словарь термов и статистика BM25 считаются при первом лексическом запросе
+        self.lexical = BM25Index(meta_dir, self.metadata.alive) if BM25Index.exists(meta_dir) else None
+        # score сжатых индексов приближённые — кандидаты пересчитываются по точным векторам чанков
+        self.rescore = (RERANK_OVERFETCH > 1 and index_type(self.index) in ("IVF_SQ8", "IVF_PQ")
+                        and self.chunk_vectors.n_rows > 0)
+        if self.version is not None:
+            manifest = read_manifest(os.path.dirname(index_file))
+            if (manifest["ntotal"], manifest["n_chunks"]) != (self.index.ntotal, self.metadata.n_chunks):
+                raise ValueError(f"Шард {name}, версия {self.version}: файлы не совпадают с manifest.json")
+
+    def search(self, vecs: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        vecs = self.reducer.transform(vecs)
+        if not self.rescore:
+            return self.index.search(vecs, k)
+        scores, ids = self.index.search(vecs, k * RERANK_OVERFETCH)
+        return rescore(self.chunk_vectors.vectors, self.chunk_vectors.rows_of(ids), vecs, scores, ids, k)
 
 
 def init_resources() -> None:
-    """Однократно загружает модель и FAISS‑индекс."""
-    global model, index, metadata, chunk_vectors
+    """Однократно загружает модель, кэш эмбеддингов запросов и FAISS‑индексы всех шардов."""
+    global model, query_cache, encode_stage, search_stage, batcher
 
     if EMBEDDING_MODE == "sentence_transformers":
         device = "mps" if torch.backends.mps.is_available() else "cpu"
         if device == "cpu":
             faiss.omp_set_num_threads(os.cpu_count())
         logger.info(f"[INIT] device: {device}")
-        model = SentenceTransformer(embedding_model, device=device)
+        # запросы кодируются в процессе сервера, без пула
+        model = SentenceEncoder(embedding_model, device=device, workers=1)
 
-    index = faiss.read_index(index_path)
-    index.nprobe = N_PROBE
+    if query_cache_size:
+        query_cache = QueryEmbeddingCache(query_cache_path, embedding_model, embedding_dim, query_cache_size)
+        logger.info(f"[INIT] query cache: {len(query_cache.store)} запросов")
 
-    with open(metadata_path, "r", encoding="utf-8") as f:
-        metadata = json.load(f)
+    started = time.perf_counter()
+    reload_if_changed()
+    if not shards:
+        raise FileNotFoundError("Индекс FAISS не найден, сначала запустите create_FAISS")
+    logger.info(f"[INIT] шарды загружены за {time.perf_counter() - started:.2f} с")
 
-    chunk_vectors = np.load(chunk_path, allow_pickle=True)
+    encode_stage = SearchStage("encode", SEARCH_ENCODE_WORKERS, SEARCH_STAGE_MAX_PENDING)
+    search_stage = SearchStage("search", SEARCH_INDEX_WORKERS, SEARCH_STAGE_MAX_PENDING)
+    if SEARCH_BATCH_MAX_WAIT_MS:
+        batcher = QueryBatcher(search_batch, SEARCH_BATCH_MAX_WAIT_MS / 1000, SEARCH_BATCH_MAX_SIZE)
 
 
-def get_openai_embeddings(texts: List[str], embed_model: str = embedding_model) -> np.ndarray:
-    if not texts:
-        return np.zeros((0, embedding_dim), dtype="float32")
-    try:
-        response = openai.Embedding.create(input=texts, model=embed_model)
-        data = sorted(response.data, key=lambda x: x.index)
-        return np.array([d.embedding for d in data], dtype="float32")
-    except Exception as e:
-        logger.error(f"[OpenAI] Ошибка эмбеддинга батча: {e}")
-        return np.zeros((len(texts), embedding_dim), dtype="float32")
+def stage_stats() -> Dict[str, Dict[str, int]]:
+    """Глубина очередей стадий поиска (ждут места, в очереди пула, выполняются, выполнено) и батчера."""
+    stats = {stage.name: stage.stats() for stage in (encode_stage, search_stage) if stage is not None}
+    if batcher is not None:
+        stats["batcher"] = batcher.stats()
+    return stats
+
+
+def reload_if_changed() -> bool:
+    """
+    Загружает шарды, у которых опубликована новая версия (или которые появились),
+    и одной заменой словаря shards переключает поиск на них. Запросы, начатые раньше,
+    дорабатывают на прежних версиях. Если новая версия не загрузилась, исключение
+    пробрасывается, а поиск продолжает работать на старых. Возвращает True, если
+    набор шардов изменился.
+    """
+    global shards, shard_pool
+
+    names = available_shards()
+    changed = [name for name in names if name not in shards or current_version(name) != shards[name].version]
+    if not changed and len(names) == len(shards):
+        return False
+
+    loaded = {name: shards[name] if name not in changed else SearchShard(name) for name in names}
+    for name in changed:
+        shard = loaded[name]
+        if shard.version is None:
+            logger.warning(f"[INDEX] shard {name} не опубликован, читаются рабочие файлы create_FAISS")
+        logger.info(f"[INDEX] shard {name}, версия {shard.version}: {describe(shard.index)}, "
+                    f"{shard.index.ntotal} векторов" + (f", точный пересчёт x{RERANK_OVERFETCH}" if shard.rescore else ""))
+
+    # поиск по шардам идёт параллельно: FAISS отпускает GIL на время search
+    if len(loaded) > 1 and shard_pool is None:
+        shard_pool = ThreadPoolExecutor(max_workers=SEARCH_SHARD_THREADS or len(loaded))
+    shards = loaded
+    return True
+
+
+def index_version() -> Tuple[Tuple[str, Optional[str]], ...]:
+    """Версии загруженных шардов: меняется при каждой подмене индекса в reload_if_changed."""
+    loaded = shards
+    return tuple(sorted((name, shard.version) for name, shard in loaded.items()))
+
+
+def encode_queries(queries: List[str]) -> np.ndarray:
+    """Эмбеддинги запросов моделью sentence_transformers: из кэша, а промахи — одним батчем."""
+    if query_cache is None:
+        return model.encode(queries)
+    return query_cache.get_or_embed(queries, model.encode)
+
+
+async def aget_openai_embeddings(texts: List[str]) -> np.ndarray:
+    vecs, failed = await aembed_texts(texts, verbose=False)
+    if failed:
+        logger.error(f"[OpenAI] Не получено {len(failed)} эмбеддингов запросов из {len(texts)}")
+    return vecs
+
+
+async def aembed_queries(queries: List[str]) -> np.ndarray:
+    """
+    Эмбеддинги запросов, не блокируя event loop: модель sentence_transformers
+    работает в стадии encode, OpenAI вызывается асинхронным клиентом.
+    """
+    if EMBEDDING_MODE == "sentence_transformers":
+        return await encode_stage.run(encode_queries, queries)
+    if EMBEDDING_MODE != "openai":
+        raise ValueError("Неизвестный EMBEDDING_MODE")
+    if query_cache is None:
+        return await aget_openai_embeddings(queries)
+    out, missing = await encode_stage.run(query_cache.lookup, queries)
+    if missing:
+        vecs = await aget_openai_embeddings(list(missing))
+        out = await encode_stage.run(query_cache.fill, out, missing, vecs)
+    return out
 
 
 def split_query_by_lang(query: str) -> Tuple[str, str]:
@@ -72,46 +226,351 @@ def split_query_by_lang(query: str) -> Tuple[str, str]:
     return " ".join(ru), " ".join(en)
 
 
-def vector_search_batch(queries: List[str], k: int = 30) -> List[Tuple[dict, str, str]]:
+def merge_top_k(results: List[Tuple[np.ndarray, np.ndarray]], k: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Сливает top-k нескольких шардов в общий top-k: (scores, ids, номер шарда) формы (nq, k)."""
+    if len(results) == 1:
+        scores, ids = results[0]
+        return scores, ids, np.zeros(ids.shape, dtype="int64")
+    scores = np.concatenate([r[0] for r in results], axis=1)
+    ids = np.concatenate([r[1] for r in results], axis=1)
+    owner = np.concatenate([np.full(r[1].shape, i, dtype="int64") for i, r in enumerate(results)], axis=1)
+    # у пустых мест (id = -1) FAISS возвращает -inf или огромное число — отправляем их в конец
+    scores = np.where(ids < 0, -np.inf, scores)
+    order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+    return (np.take_along_axis(scores, order, axis=1), np.take_along_axis(ids, order, axis=1),
+            np.take_along_axis(owner, order, axis=1))
+
+
+def rescore(vectors: np.ndarray, rows: np.ndarray, vecs: np.ndarray, scores: np.ndarray, ids: np.ndarray,
+            k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Точный score кандидатов из сжатого индекса: векторы кандидатов (строки rows матрицы
+    vectors, обычно memmap chunk/) умножаются на свои запросы одним батчевым matmul,
+    и top-k выбирается заново. Кандидат без сохранённого вектора остаётся с приближённым score.
+    """
+    found = rows >= 0
+    cand = np.zeros(ids.shape + (vecs.shape[1],), dtype="float32")
+    cand[found] = vectors[rows[found]]
+    exact = np.matmul(cand, vecs[:, :, None].astype("float32"))[:, :, 0]
+    exact = np.where(found, exact, scores)
+    exact[ids < 0] = -np.inf
+    order = np.argsort(-exact, axis=1, kind="stable")[:, :k]
+    return np.take_along_axis(exact, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+
+async def avector_search_batch(queries: List[str], k: int = 30,
+                               shard_names: Optional[Iterable[str]] = None) -> List[Tuple[dict, str, str]]:
     """
     Возвращает список кортежей (результат, highlight, источник-запрос), чтобы позже приоритизировать user_query.
+    Поиск идёт параллельно по шардам shard_names (по умолчанию по всем), top-k сливаются.
+    Кодирование и поиск идут в своих стадиях, а не в event loop, а запросы одновременных
+    вызовов объединяются батчером.
     """
     if not queries:
         return []
+    if batcher is not None:
+        return await batcher.submit(queries, k, shard_names)
+    return await search_batch(queries, k, shard_names)
 
-    if EMBEDDING_MODE == "sentence_transformers":
-        vecs = model.encode(queries, normalize_embeddings=True)
-    elif EMBEDDING_MODE == "openai":
-        vecs = get_openai_embeddings(queries)
+
+async def search_batch(queries: List[str], k: int = 30,
+                       shard_names: Optional[Iterable[str]] = None) -> List[Tuple[dict, str, str]]:
+    """Один батч запросов: одно кодирование и один index.search на шард."""
+    vecs = await aembed_queries(queries)
+    return await search_stage.run(search_vectors, queries, vecs, k, shard_names)
+
+
+def expand_postings(offsets: np.ndarray, recs: np.ndarray, chunk_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Раскрывает чанки в записи по posting-спискам MetaStore (CSR): для каждой пары
+    (чанк, запись) — номер чанка во входном массиве и индекс записи.
+    """
+    starts = np.asarray(offsets[chunk_ids], dtype="int64")
+    lens = np.asarray(offsets[chunk_ids + 1], dtype="int64") - starts
+    src = np.repeat(np.arange(len(chunk_ids)), lens)
+    pos = np.repeat(starts - np.cumsum(lens) + lens, lens) + np.arange(int(lens.sum()))
+    return src, np.asarray(recs[pos], dtype="int64")
+
+
+def aggregate_records(q: np.ndarray, key: np.ndarray, score: np.ndarray, chunk: np.ndarray,
+                      mode: str = "max") -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Сводит попадания (запрос, запись, score чанка, id чанка) к одной строке на пару
+    (запрос, запись): score — максимум или сумма по чанкам записи, чанк — лучший из них.
+    Результат отсортирован по запросу, затем по score по убыванию.
+    """
+    if not len(q):
+        return q, key, score, chunk
+    # внутри группы (запрос, запись) первым оказывается лучший чанк
+    order = np.lexsort((-score, key, q))
+    q, key, score, chunk = q[order], key[order], score[order], chunk[order]
+    first = np.ones(len(q), dtype=bool)
+    first[1:] = (q[1:] != q[:-1]) | (key[1:] != key[:-1])
+    starts = np.flatnonzero(first)
+    agg = np.add.reduceat(score, starts) if mode == "sum" else score[starts]
+    q, key, chunk = q[starts], key[starts], chunk[starts]
+    order = np.lexsort((-agg, q))
+    return q[order], key[order], agg[order], chunk[order]
+
+
+def search_shards(selected: List[SearchShard], vecs: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    if len(selected) == 1:
+        results = [selected[0].search(vecs, k)]
     else:
-        raise ValueError("Неизвестный EMBEDDING_MODE")
+        results = list(shard_pool.map(lambda shard: shard.search(vecs, k), selected))
+    return merge_top_k(results, k)
 
-    scores, indices = index.search(vecs, k)
 
+def search_records(selected: List[SearchShard], vecs: np.ndarray, k: int = 30,
+                   n_records: int = SEARCH_RECORDS_PER_QUERY, max_k: int = SEARCH_MAX_K,
+                   mode: str = RECORD_AGGREGATION,
+                   min_score: float = threshold) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Поиск на уровне записей: score чанков сводится по записям (aggregate_records), и для
+    запросов, у которых набралось меньше n_records различных записей выше min_score (threshold),
+    k удваивается (не больше max_k). Расширять k незачем, если k-й чанк уже ниже
+    порога или индекс исчерпан. Возвращает не больше n_records строк на запрос:
+    (номер запроса, запись = номер шарда << 32 | индекс записи, score, id лучшего чанка).
+    """
+    parts = []
+    rows = np.arange(len(vecs))
+    k = min(k, max_k)
+    while len(rows):
+        scores, ids, owners = search_shards(selected, vecs[rows], k)
+        hit = (ids >= 0) & (scores >= min_score)
+        q_hit, col = np.nonzero(hit)
+        q_parts, key_parts, score_parts, chunk_parts = [], [], [], []
+        for owner, shard in enumerate(selected):
+            mine = owners[q_hit, col] == owner
+            chunk_ids = ids[q_hit[mine], col[mine]]
+            src, recs = expand_postings(shard.metadata.post_offsets, shard.metadata.post_records, chunk_ids)
+            q_parts.append(q_hit[mine][src])
+            key_parts.append((owner << 32) | recs)
+            score_parts.append(scores[q_hit[mine], col[mine]][src])
+            chunk_parts.append(chunk_ids[src])
+        q, key, agg, chunk = aggregate_records(np.concatenate(q_parts), np.concatenate(key_parts),
+                                               np.concatenate(score_parts).astype("float32"),
+                                               np.concatenate(chunk_parts), mode)
+
+        found = np.bincount(q, minlength=len(rows))
+        exhausted = (ids[:, -1] < 0) | (scores[:, -1] < min_score)
+        done = (found >= n_records) | exhausted | (k >= max_k)
+        keep = done[q]
+        parts.append((rows[q[keep]], key[keep], agg[keep], chunk[keep]))
+        rows = rows[~done]
+        k = min(2 * k, max_k)
+
+    if not parts:
+        empty = np.zeros(0, dtype="int64")
+        return empty, empty, np.zeros(0, dtype="float32"), empty
+    q, key, agg, chunk = (np.concatenate(arrays) for arrays in zip(*parts))
+    order = np.lexsort((-agg, q))
+    q, key, agg, chunk = q[order], key[order], agg[order], chunk[order]
+    # место записи в выдаче своего запроса
+    first = np.flatnonzero(np.r_[True, q[1:] != q[:-1]]) if len(q) else np.zeros(0, dtype="int64")
+    rank = np.arange(len(q)) - np.repeat(first, np.diff(np.r_[first, len(q)]))
+    top = rank < n_records
+    return q[top], key[top], agg[top], chunk[top]
+
+
+def search_vectors(queries: List[str], vecs: np.ndarray, k: int = 30,
+                   shard_names: Optional[Iterable[str]] = None) -> List[Tuple[dict, str, str]]:
+    """
+    Поиск по готовым эмбеддингам запросов vecs и сборка результатов из метаданных шардов.
+    При RECORD_AGGREGATION на каждый запрос приходится по одной тройке на запись
+    (с лучшим чанком как highlight), иначе — по тройке на каждую пару (чанк, запись).
+    """
+    loaded = shards  # при горячей перезагрузке словарь заменяется целиком
+    selected = [loaded[name] for name in select_shards(shard_names, loaded)]
+    if not selected:
+        return []
+
+    if RECORD_AGGREGATION:
+        return hydrate_records(queries, selected, *search_records(selected, vecs, k))
+
+    scores, indices, owners = search_shards(selected, vecs, k)
+
+    records = {}  # записи декодируются из MetaStore по требованию, один раз на вызов
     triples = []  # (result_dict, highlight, query_text)
     for q_idx, query in enumerate(queries):
-        for idx, score in zip(indices[q_idx], scores[q_idx]):
+        for idx, score, owner in zip(indices[q_idx], scores[q_idx], owners[q_idx]):
             if idx == -1 or score < threshold:
                 continue
-            item = metadata[idx]
-            triples.append((
-                {
-                    "telegram_id": item["telegram_id"],
-                    "date": item["date"],
-                    "content": item["content"],
-                    "author": item["author"],
-                    "media_path": item["media_path"],
-                    "score": float(score),
-                },
-                item.get("chunk", ""),
-                query
-            ))
-
-    logger.info(f"[FAISS/BATCH] queries={len(queries)}, hits={len(triples)}")
+            metadata = selected[owner].metadata
+            chunk = metadata.chunk(idx)
+            # один вектор на уникальный чанк — раскрываем его во все записи, где он встречается
+            for rec_idx in metadata.postings(idx):
+                item = records.get((owner, rec_idx))
+                if item is None:
+                    item = records[(owner, rec_idx)] = metadata.record(rec_idx)
+                triples.append((
+                    {
+                        "telegram_id": item["telegram_id"],
+                        "date": item["date"],
+                        "content": item["content"],
+                        "author": item["author"],
+                        "media_path": item["media_path"],
+                        "score": float(score),
+                        "ref": (selected[owner].name, int(rec_idx)),
+                    },
+                    chunk,
+                    query
+                ))
+
+    logger.info(f"[FAISS/BATCH] queries={len(queries)}, shards={len(selected)}, hits={len(triples)}")
     return triples
 
 
-async def full_pipeline(user_query: str) -> Tuple[List[dict[str, Any]], List[str]]:
+def hydrate_records(queries: List[str], selected: List[SearchShard], q: np.ndarray, keys: np.ndarray,
+                    scores: np.ndarray, chunks: np.ndarray) -> List[Tuple[dict, str, str]]:
+    records = {}
+    triples = []
+    for q_idx, key, score, chunk_id in zip(q.tolist(), keys.tolist(), scores.tolist(), chunks.tolist()):
+        metadata = selected[key >> 32].metadata
+        item = records.get(key)
+        if item is None:
+            item = records[key] = metadata.record(key & 0xFFFFFFFF)
+        triples.append((
+            {
+                "telegram_id": item["telegram_id"],
+                "date": item["date"],
+                "content": item["content"],
+                "author": item["author"],
+                "media_path": item["media_path"],
+                "score": float(score),
+                "ref": (selected[key >> 32].name, key & 0xFFFFFFFF),
+            },
+            metadata.chunk(chunk_id),
+            queries[q_idx]
+        ))
+
+    logger.info(f"[FAISS/BATCH] queries={len(queries)}, shards={len(selected)}, records={len(triples)}")
+    return triples
+
+
+def load_records(refs: List[Tuple[str, int]]) -> List[dict]:
+    """
+    Записи по ссылкам "ref" (шард, индекс записи в MetaStore) из результатов поиска:
+    сервер хранит выдачу ссылками и читает тексты только для запрошенной страницы.
+    """
+    loaded = shards
+    return [loaded[name].metadata.record(rec_idx) for name, rec_idx in refs]
+
+
+def lexical_highlight(rec: dict, tokens: List[str]) -> str:
+    """Первое предложение записи (или автор), где встречается слово запроса."""
+    wanted = set(tokens)
+    for sentence in SENTENCE_SPLIT.split(rec["content"] or ""):
+        if wanted.intersection(lexical_tokens(sentence)):
+            return sentence.strip()
+    return rec["author"] if wanted.intersection(lexical_tokens(rec["author"] or "")) else ""
+
+
+def lexical_search(query: str, k: int = HYBRID_LEXICAL_K,
+                   shard_names: Optional[Iterable[str]] = None) -> List[Tuple[dict, str]]:
+    """top-k записей по BM25 во всех выбранных шардах: (результат, highlight) по убыванию score."""
+    loaded = shards
+    tokens = lexical_tokens(query)
+    hits = []
+    for name in select_shards(shard_names, loaded):
+        shard = loaded[name]
+        if shard.lexical is not None:
+            docs, scores = shard.lexical.search(tokens, k)
+            hits += [(float(score), shard, int(doc)) for doc, score in zip(docs, scores)]
+    results = lexical_results(hits, tokens, k)
+    logger.info(f"[BM25] '{query}': {len(results)} записей")
+    return results
+
+
+def lexical_results(hits: List[Tuple[float, SearchShard, int]], tokens: List[str], k: int) -> List[Tuple[dict, str]]:
+    """Лучшие k попаданий (score, шард, запись) всех шардов в виде (результат, highlight)."""
+    hits.sort(key=lambda hit: hit[0], reverse=True)
+    results = []
+    for score, shard, doc in hits[:k]:
+        item = shard.metadata.record(doc)
+        rec = {
+            "telegram_id": item["telegram_id"],
+            "date": item["date"],
+            "content": item["content"],
+            "author": item["author"],
+            "media_path": item["media_path"],
+            "score": score,
+            "ref": (shard.name, doc),
+        }
+        results.append((rec, lexical_highlight(rec, tokens)))
+    return results
+
+
+def exact_token_groups(query: str) -> Optional[List[List[str]]]:
+    """
+    Группы термов для быстрого пути, если запрос — одна-две аббревиатуры или короткие
+    точные токены (CTO, 1С, n8n, Go): слово запроса и его эквиваленты из trans1.
+    None — запрос идёт обычным путём.
+    """
+    tokens = list(dict.fromkeys(lexical_tokens(query)))
+    if not tokens or len(tokens) > FAST_PATH_MAX_TOKENS:
+        return None
+    for token in tokens:
+        exact = token in ABBREVIATIONS or len(token) <= FAST_PATH_MAX_TOKEN_LEN or any(c.isdigit() for c in token)
+        if not exact or token in STOPWORDS:
+            return None
+    return [[token] + EQUIVALENTS.get(token, []) for token in tokens]
+
+
+def exact_token_search(query: str, shard_names: Optional[Iterable[str]] = None,
+                       k: int = FAST_PATH_MAX_RESULTS) -> Optional[Tuple[List[dict], List[str]]]:
+    """
+    Быстрый путь для аббревиатур и точных токенов: записи, содержащие все слова запроса
+    (или их эквиваленты), берутся из posting-списков лексического индекса и ранжируются
+    по BM25. Ни LLM, ни эмбеддинги не нужны. None — если запрос не подходит, у шарда
+    нет лексического индекса или ничего не найдено (тогда работает обычный поиск).
+    """
+    groups = exact_token_groups(query)
+    if groups is None:
+        return None
+    loaded = shards
+    tokens = [term for group in groups for term in group]
+    hits = []
+    for name in select_shards(shard_names, loaded):
+        lexical = loaded[name].lexical
+        if lexical is None:
+            return None
+        docs = lexical.match_all(groups)
+        if not len(docs):
+            continue
+        ranked, scores = lexical.search(tokens, lexical.n_docs)
+        keep = np.isin(ranked, docs)
+        hits += [(float(score), loaded[name], int(doc)) for doc, score in zip(ranked[keep], scores[keep])]
+    if not hits:
+        return None
+    results = lexical_results(hits, tokens, k)
+    return [rec for rec, _ in results], [hl for _, hl in results]
+
+
+def rrf_fuse(rankings: List[List[Tuple[dict, str]]], k: int = RRF_K) -> Tuple[List[dict], List[str]]:
+    """
+    Reciprocal rank fusion: запись получает сумму 1 / (k + место) по всем выдачам.
+    Highlight берётся из первой выдачи, где запись встретилась; score заменяется на RRF.
+    """
+    fused: Dict[Any, float] = {}
+    first: Dict[Any, Tuple[dict, str]] = {}
+    for ranking in rankings:
+        for rank, (rec, hl) in enumerate(ranking):
+            tid = rec["telegram_id"]
+            fused[tid] = fused.get(tid, 0.0) + 1.0 / (k + rank + 1)
+            first.setdefault(tid, (rec, hl))
+    order = sorted(fused, key=fused.get, reverse=True)
+    return [dict(first[tid][0], score=fused[tid]) for tid in order], [first[tid][1] for tid in order]
+
+
+async def full_pipeline(user_query: str,
+                        shard_names: Optional[Iterable[str]] = None) -> Tuple[List[dict[str, Any]], List[str]]:
+    if ABBR_FAST_PATH:
+        fast = await search_stage.run(exact_token_search, user_query, shard_names)
+        if fast is not None:
+            logger.info(f"[FAISS/FAST_PATH] '{user_query}': {len(fast[0])} записей по точному совпадению токенов")
+            return fast
+
     query = user_query
     if PRE_PROCESSING_SIMPLE_FLAG:
         query = query_preprocess_faiss(query)
@@ -125,7 +584,12 @@ async def full_pipeline(user_query: str) -> Tuple[List[dict[str, Any]], List[str
     search_queries = [user_query, query] + tokens
     uniq_queries = list(dict.fromkeys(search_queries))
 
-    triples = vector_search_batch(uniq_queries)
+    if SEARCH_MODE == "HYBRID":
+        triples, lexical = await asyncio.gather(
+            avector_search_batch(uniq_queries, shard_names=shard_names),
+            search_stage.run(lexical_search, user_query, HYBRID_LEXICAL_K, shard_names))
+    else:
+        triples = await avector_search_batch(uniq_queries, shard_names=shard_names)
 
     top_results = []
     seen = set()
@@ -146,6 +610,8 @@ async def full_pipeline(user_query: str) -> Tuple[List[dict[str, Any]], List[str
 
     final_results = [r for r, _ in top_results + other_results]
     final_highlights = [h for _, h in top_results + other_results]
+    if SEARCH_MODE == "HYBRID":
+        final_results, final_highlights = rrf_fuse([top_results + other_results, lexical])
 
     logger.info(f"[PIPELINE] уникальных записей: {len(final_results)}")
     logger.info(f"\n[FAISS/FULL_PIPELINE] Релевантные хайлайты: {final_highlights}\n")
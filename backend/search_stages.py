@@ -0,0 +1,149 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class SearchStage:
+    """
+    Отдельный ограниченный пул потоков для одной стадии поиска (кодирование запросов,
+    поиск по FAISS), чтобы тяжёлые вычисления не блокировали event loop сервера.
+
+    torch и FAISS отпускают GIL, поэтому потоков достаточно. Одновременно в стадии
+    (в очереди пула и в работе) не больше max_pending задач, остальные вызовы ждут
+    своей очереди в event loop, не занимая потоков. Глубина очереди видна через stats().
+    """
+
+    def __init__(self, name: str, workers: int, max_pending: int):
+        self.name = name
+        self.workers = workers
+        self.max_pending = max(max_pending, workers)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"search-{name}")
+        self._slots = None
+        self._lock = threading.Lock()
+        self.waiting = 0   # ждут места в стадии
+        self.queued = 0    # в очереди пула
+        self.running = 0   # выполняются
+        self.done = 0
+
+    def _call(self, fn: Callable[..., T], *args) -> T:
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.done += 1
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        if self._slots is None:
+            # семафор создаётся в том event loop, в котором работает сервер
+            self._slots = asyncio.Semaphore(self.max_pending)
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            with self._lock:
+                self.queued += 1
+            return await asyncio.get_running_loop().run_in_executor(self._pool, self._call, fn, *args)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"workers": self.workers, "waiting": self.waiting, "queued": self.queued,
+                    "running": self.running, "done": self.done}
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+
+class QueryBatcher:
+    """
+    Микробатчинг запросов от одновременных вызовов поиска.
+
+    Запросы, пришедшие почти одновременно, объединяются: уникальные тексты всех
+    вызовов кодируются одним батчем и ищутся одним index.search, а результаты
+    раздаются вызывающим по тексту запроса. Если в работе нет ни одного батча,
+    собранное отправляется сразу (одиночный пользователь не ждёт); пока батч
+    выполняется, новые запросы копятся до max_wait секунд или max_size текстов.
+
+    run_batch(queries, k, shard_names) возвращает тройки (результат, highlight, запрос).
+    Вызовы с разными k или набором шардов попадают в разные батчи.
+    """
+
+    def __init__(self, run_batch: Callable[..., Awaitable[List[Tuple]]], max_wait: float, max_size: int):
+        self.run_batch = run_batch
+        self.max_wait = max_wait
+        self.max_size = max_size
+        self._pending: List[Tuple[List[str], int, Optional[Tuple[str, ...]], asyncio.Future]] = []
+        self._pending_texts = 0
+        self._flush_task: Optional[asyncio.Task] = None
+        # event loop держит задачи по слабым ссылкам: без этого набора батч могут собрать посреди работы
+        self._tasks: Set[asyncio.Task] = set()
+        self.in_flight = 0
+        self.batches = 0
+        self.calls = 0
+
+    async def submit(self, queries: List[str], k: int, shard_names: Optional[Iterable[str]] = None) -> List[Tuple]:
+        shard_key = tuple(sorted(shard_names)) if shard_names is not None else None
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((queries, k, shard_key, future))
+        self._pending_texts += len(queries)
+        if self._pending_texts >= self.max_size:
+            self._flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+        return await future
+
+    async def _flush_later(self):
+        # sleep(0) даёт добавиться запросам, пришедшим в той же итерации event loop
+        await asyncio.sleep(self.max_wait if self.in_flight else 0)
+        self._flush_task = None
+        self._flush()
+
+    def _flush(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        pending, self._pending, self._pending_texts = self._pending, [], 0
+        groups: Dict[Tuple, List] = {}
+        for queries, k, shard_key, future in pending:
+            groups.setdefault((k, shard_key), []).append((queries, future))
+        for (k, shard_key), calls in groups.items():
+            # батч считается выполняющимся сразу, чтобы следующие запросы уже копились
+            self.in_flight += 1
+            self.batches += 1
+            self.calls += len(calls)
+            task = asyncio.create_task(self._run(calls, k, shard_key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, calls: List[Tuple[List[str], asyncio.Future]], k: int, shard_key: Optional[Tuple[str, ...]]):
+        texts = list(dict.fromkeys(q for queries, _ in calls for q in queries))
+        try:
+            triples = await self.run_batch(texts, k, list(shard_key) if shard_key is not None else None)
+        except Exception as e:
+            for _, future in calls:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.in_flight -= 1
+
+        by_query: Dict[str, List[Tuple]] = {}
+        for triple in triples:
+            by_query.setdefault(triple[2], []).append(triple)
+        for queries, future in calls:
+            if not future.done():
+                future.set_result([t for q in dict.fromkeys(queries) for t in by_query.get(q, [])])
+
+    def stats(self) -> Dict[str, float]:
+        return {"pending": self._pending_texts, "in_flight": self.in_flight, "batches": self.batches,
+                "calls_per_batch": round(self.calls / self.batches, 2) if self.batches else 0.0}
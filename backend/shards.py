@@ -0,0 +1,51 @@
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from configs.cfg import INDEX_SHARDING, INDEX_SHARDS, shards_path, index_path, metadata_path, chunk_path, reducer_path
+
+# имя единственного шарда без INDEX_SHARDING (индекс лежит по старым путям)
+MAIN_SHARD = "main"
+
+_SHARD_NAMES = {str(topic): str(name) for topic, name in INDEX_SHARDS.items()}
+
+
+def shard_name(topic) -> str:
+    """Шард, в который попадают записи топика (ключа cv.json)."""
+    if not INDEX_SHARDING:
+        return MAIN_SHARD
+    return _SHARD_NAMES.get(str(topic), str(topic))
+
+
+def shard_paths(name: str) -> Tuple[str, str, str, str]:
+    """Пути шарда: (индекс, MetaStore, векторы чанков, reducer)."""
+    if not INDEX_SHARDING:
+        return index_path, metadata_path, chunk_path, reducer_path
+    base = os.path.join(shards_path, name)
+    return (os.path.join(base, "index.index"), os.path.join(base, "meta"), os.path.join(base, "chunk"),
+            os.path.join(base, "reducer"))
+
+
+def group_topics(topics: Iterable) -> Dict[str, List[str]]:
+    """Топики cv.json, сгруппированные по шардам."""
+    groups: Dict[str, List[str]] = {}
+    for topic in topics:
+        groups.setdefault(shard_name(topic), []).append(topic)
+    return groups
+
+
+def available_shards() -> List[str]:
+    """Шарды, для которых уже построен индекс."""
+    if not INDEX_SHARDING:
+        return [MAIN_SHARD] if os.path.exists(index_path) else []
+    if not os.path.isdir(shards_path):
+        return []
+    return sorted(name for name in os.listdir(shards_path) if os.path.exists(shard_paths(name)[0]))
+
+
+def select_shards(requested: Optional[Iterable[str]], known: Iterable[str]) -> List[str]:
+    """Пересечение запрошенных шардов с известными (None — все известные)."""
+    known = list(known)
+    if requested is None:
+        return known
+    requested = set(requested)
+    return [name for name in known if name in requested]
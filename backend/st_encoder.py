@@ -0,0 +1,119 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+
+from configs.cfg import (
+    sentence_transformers_backend,
+    sentence_transformers_model_file,
+    sentence_transformers_quantize_int8,
+    sentence_transformers_encode_workers,
+    sentence_transformers_max_batch_tokens,
+    sentence_transformers_max_batch_size,
+)
+
+# меньше этого числа текстов пул процессов не используется: запросы поиска кодируются на месте
+POOL_MIN_TEXTS = 512
+
+
+def load_model(model_name: str, device: str = "cpu") -> SentenceTransformer:
+    """SentenceTransformer с рантаймом из конфига (torch / onnx / openvino, опционально int8)."""
+    if sentence_transformers_backend == "torch":
+        model = SentenceTransformer(model_name, device=device)
+        if sentence_transformers_quantize_int8 and device == "cpu":
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+    model_kwargs = {"file_name": sentence_transformers_model_file} if sentence_transformers_model_file else None
+    return SentenceTransformer(model_name, device=device, backend=sentence_transformers_backend,
+                               model_kwargs=model_kwargs)
+
+
+def estimate_tokens(text: str, max_seq_length: int) -> int:
+    # грубая оценка по байтам utf-8 (+[CLS]/[SEP]); длиннее max_seq_length модель всё равно обрезает
+    return min(max_seq_length, len(text.encode("utf-8")) // 3 + 2)
+
+
+def length_buckets(texts: List[str], max_seq_length: int, max_tokens: int = sentence_transformers_max_batch_tokens,
+                   max_items: int = sentence_transformers_max_batch_size) -> List[List[int]]:
+    """
+    Индексы текстов, разбитые на батчи близкой длины: тексты сортируются по длине,
+    а батч растёт, пока (число текстов × самая длинная из них) не превысит max_tokens.
+    Короткие n-граммы идут большими батчами и не добиваются паддингом до длины предложений.
+    """
+    lengths = [estimate_tokens(t, max_seq_length) for t in texts]
+    order = sorted(range(len(texts)), key=lengths.__getitem__, reverse=True)
+    batches, current, longest = [], [], 0
+    for i in order:
+        longest_if_added = max(longest, lengths[i])
+        if current and ((len(current) + 1) * longest_if_added > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, longest_if_added = [], lengths[i]
+        current.append(i)
+        longest = longest_if_added
+    if current:
+        batches.append(current)
+    return batches
+
+
+_worker_model: Optional[SentenceTransformer] = None
+
+
+def _init_worker(model_name: str, threads: int):
+    global _worker_model
+    torch.set_num_threads(threads)
+    _worker_model = load_model(model_name, "cpu")
+
+
+def _encode_batch(texts: List[str]) -> np.ndarray:
+    return _worker_model.encode(texts, batch_size=len(texts), normalize_embeddings=True, convert_to_numpy=True)
+
+
+class SentenceEncoder:
+    """
+    Эмбеддинги sentence_transformers для индексации и поиска.
+
+    Тексты кодируются батчами близкой длины (length_buckets). На cpu большие
+    объёмы (индексация) раздаются пулу процессов, в каждом своя копия модели и
+    cpu_count / workers потоков torch; короткие списки (запросы поиска) кодируются
+    в текущем процессе без накладных расходов на пул.
+    """
+
+    def __init__(self, model_name: str, device: str = "cpu", workers: int = sentence_transformers_encode_workers):
+        self.model_name = model_name
+        self.device = device
+        self.model = load_model(model_name, device)
+        self.max_seq_length = self.model.max_seq_length or 512
+        self.workers = (workers or os.cpu_count() or 1) if device == "cpu" else 1
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=_init_worker, initargs=(self.model_name, threads))
+        return self._pool
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Нормированные эмбеддинги float32 в порядке texts."""
+        out = np.zeros((len(texts), self.model.get_sentence_embedding_dimension()), dtype="float32")
+        if not texts:
+            return out
+        batches = length_buckets(texts, self.max_seq_length)
+        groups = [[texts[i] for i in idx] for idx in batches]
+        if self.workers > 1 and len(texts) >= POOL_MIN_TEXTS:
+            results = self._get_pool().map(_encode_batch, groups)
+        else:
+            results = (self.model.encode(group, batch_size=len(group), normalize_embeddings=True,
+                                         convert_to_numpy=True) for group in groups)
+        for idx, vecs in zip(batches, results):
+            out[idx] = vecs
+        return out
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
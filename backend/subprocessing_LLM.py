@@ -1,53 +1,113 @@
 import asyncio
+import hashlib
 import json
 import re
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 
-from configs.cfg import preprocessing_model, postprocessing_model
+from configs.cfg import preprocessing_model, postprocessing_model, expansion_cache_path, expansion_cache_size
 from utils.openrouter_request import chat_completion_openrouter
+from utils.sqlite_lru import SqliteLRU
 
 from utils.logger import setup_logger
 
 logger = setup_logger("SUBLLM")
 
 
+PRE_PROCESSING_PROMPT = (
+    "Ты — ИИ-ассистент по расширению поисковых запросов по резюме.\n"
+    "Прими пользовательский запрос и преобразуй его в короткий список ключевых слов, имён, синонимов, связанных терминов и аббревиатур.\n"
+    "\n"
+    "🔹 Для каждого слова:\n"
+    "- Добавь синонимы, формы, сокращения, аббревиатуры, связанные профессии и технологии.\n"
+    "- Не включай слишком общие слова — **не используй**: 'специалист', 'эксперт', 'профессионал', 'работник'.\n"
+    "- Не добавляй абстрактные или универсальные слова, даже если они встречаются в описаниях профессий.\n"
+    "- Можно добавлять смежные профессии (например, для 'врач' — 'терапевт', 'хирург', 'педиатр'), но не общие категории.\n"
+    "- Если слово на русском — добавь его перевод на английский.\n"
+    "- Если слово на английском — добавь его перевод на русский.\n"
+    "\n"
+    "🔹 Если в запросе есть имя (например: Валера, Сергей, Alex, Ivan):\n"
+    "- Добавь его полную форму, уменьшительно-ласкательные формы, англоязычные варианты написания.\n"
+    "  Пример: Валера → Валерий, Валера, Valera, Valeriy, Valery\n"
+    "\n"
+    "🔹 Если в запросе есть возможность добавить аббревиатуру, то сделай это (например: маркетинг → SMM, СММ)\n"
+    "\n"
+    "📌 Верни **одну строку** — перечисли все ключевые слова и вариации через запятую, **без пояснений и лишнего текста**."
+)
+# версия промпта входит в ключ кэша расширений: после правки промпта старые расширения не используются
+PRE_PROCESSING_PROMPT_VERSION = hashlib.blake2b(PRE_PROCESSING_PROMPT.encode("utf-8"), digest_size=8).hexdigest()
+
+expansion_cache: Optional[SqliteLRU] = None
+_in_flight: Dict[str, asyncio.Future] = {}
+
+
+def expansion_key(user_query: str) -> str:
+    """Ключ кэша: модель, версия промпта и запрос без учёта регистра и лишних пробелов."""
+    return f"{preprocessing_model}\0{PRE_PROCESSING_PROMPT_VERSION}\0{' '.join(user_query.lower().split())}"
+
+
+def get_expansion_cache() -> Optional[SqliteLRU]:
+    global expansion_cache
+    if expansion_cache is None and expansion_cache_size:
+        expansion_cache = SqliteLRU(expansion_cache_path, expansion_cache_size)
+    return expansion_cache
+
+
+async def expand_query(user_query: str) -> str:
+    """Один запрос к LLM за расширением пользовательского запроса (без кэша)."""
+    response = await chat_completion_openrouter([
+        {"role": "system", "content": PRE_PROCESSING_PROMPT},
+        {"role": "user", "content": user_query},
+    ], model=preprocessing_model)
+
+    return response.strip()
+
+
+async def _cached_expansion(user_query: str, key: str) -> str:
+    cache = get_expansion_cache()
+    if cache is not None:
+        # SQLite синхронный: обращения к кэшу идут в потоке, чтобы не блокировать event loop
+        found = (await asyncio.to_thread(cache.get_many, [key])).get(key)
+        if found is not None:
+            logger.info(f"[LLM/PRE] расширение запроса '{user_query}' из кэша")
+            return found.decode("utf-8")
+
+    expansion = await expand_query(user_query)
+    if cache is not None and expansion:
+        # кэш пишется до того, как future завершится: пришедший после _forget найдёт расширение в кэше
+        await asyncio.to_thread(cache.put_many, [(key, expansion.encode("utf-8"))])
+    return expansion
+
+
+def _forget(key: str, future: asyncio.Future):
+    _in_flight.pop(key, None)
+    # ошибку получают ожидающие; если их не осталось, она не должна попасть в лог asyncio
+    if not future.cancelled():
+        future.exception()
+
+
 async def pre_proccessing(user_query: str) -> str:
     """
     Обогащает пользовательский запрос ключевыми словами, переводами и вариациями имён.
 
+    Расширения хранятся в кэше на диске (SQLite, LRU на expansion_cache_size запросов)
+    по ключу expansion_key, поэтому повторный запрос обходится без LLM. Одинаковые
+    запросы, пришедшие одновременно, ждут одну общую задачу — чтение кэша и, при
+    промахе, вызов LLM. Задача регистрируется до первого await, поэтому запрос не
+    может разминуться и с кэшем, и с задачей. Ошибки не кэшируются.
+
     Args:
         user_query (str): Исходный текст запроса пользователя.
 
     Returns:
         str: Обогащённый и переведённый запрос — строка с ключевыми словами и их формами.
     """
-    system_prompt = (
-        "Ты — ИИ-ассистент по расширению поисковых запросов по резюме.\n"
-        "Прими пользовательский запрос и преобразуй его в короткий список ключевых слов, имён, синонимов, связанных терминов и аббревиатур.\n"
-        "\n"
-        "🔹 Для каждого слова:\n"
-        "- Добавь синонимы, формы, сокращения, аббревиатуры, связанные профессии и технологии.\n"
-        "- Не включай слишком общие слова — **не используй**: 'специалист', 'эксперт', 'профессионал', 'работник'.\n"
-        "- Не добавляй абстрактные или универсальные слова, даже если они встречаются в описаниях профессий.\n"
-        "- Можно добавлять смежные профессии (например, для 'врач' — 'терапевт', 'хирург', 'педиатр'), но не общие категории.\n"
-        "- Если слово на русском — добавь его перевод на английский.\n"
-        "- Если слово на английском — добавь его перевод на русский.\n"
-        "\n"
-        "🔹 Если в запросе есть имя (например: Валера, Сергей, Alex, Ivan):\n"
-        "- Добавь его полную форму, уменьшительно-ласкательные формы, англоязычные варианты написания.\n"
-        "  Пример: Валера → Валерий, Валера, Valera, Valeriy, Valery\n"
-        "\n"
-        "🔹 Если в запросе есть возможность добавить аббревиатуру, то сделай это (например: маркетинг → SMM, СММ)\n"
-        "\n"
-        "📌 Верни **одну строку** — перечисли все ключевые слова и вариации через запятую, **без пояснений и лишнего текста**."
-    )
-
-    response = await chat_completion_openrouter([
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": user_query},
-    ], model=preprocessing_model)
-
-    return response.strip()
+    key = expansion_key(user_query)
+    future = _in_flight.get(key)
+    if future is None:
+        future = _in_flight[key] = asyncio.ensure_future(_cached_expansion(user_query, key))
+        future.add_done_callback(lambda done: _forget(key, done))
+    # отмена одного ожидающего не отменяет общий вызов для остальных
+    return await asyncio.shield(future)
 
 
 def chunk_list(lst, size):
@@ -1,7 +1,9 @@
-import re
+from functools import lru_cache
 from typing import List, Tuple, Dict
 from nltk.stem import SnowballStemmer
 
+from backend.text_norm import WORD_RE, is_cyrillic
+
 stemmer_en = SnowballStemmer("english")
 stemmer_ru = SnowballStemmer("russian")
 
@@ -11,12 +13,13 @@ def is_abbreviation(word: str) -> bool:
 
 
 def detect_language(word: str) -> str:
-    if re.search(r"[а-яА-Я]", word):
+    if is_cyrillic(word):
         return "russian"
     else:
         return "english"
 
 
+@lru_cache(maxsize=100000)
 def normalize_word(word: str) -> str:
     if is_abbreviation(word):
         return word.upper()
@@ -26,7 +29,7 @@ def normalize_word(word: str) -> str:
 
 
 def tokenize_and_normalize(text: str) -> List[str]:
-    words = re.findall(r"\b\w+\b", text)
+    words = WORD_RE.findall(text)
     return [normalize_word(w) for w in words]
 
 
@@ -45,7 +48,7 @@ async def post_proccessing(user_query: str, results: List[dict], highlights: Lis
     filtered_highlights = []
 
     for result, highlight in zip(results, highlights):
-        highlight_words = tokenize_and_normalize(f"{result['author']} . {result['content']} . {highlight}")
+        highlight_words = set(tokenize_and_normalize(f"{result['author']} . {result['content']} . {highlight}"))
 
         if any(qw in highlight_words for qw in query_words):
             filtered_results.append(result)
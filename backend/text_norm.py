@@ -0,0 +1,118 @@
+"""
+Общая нормализация текста для индексации и обработки запросов.
+
+Быстрые эквиваленты функций, которые раньше жили в create_FAISS и utils.ij_remover:
+регулярные выражения скомпилированы один раз, стоп-слова ищутся во frozenset,
+а текст без markdown-символов вообще не проходит через regex. Модуль не тянет
+тяжёлых зависимостей, поэтому его дёшево импортировать в процессах пула.
+"""
+import re
+from typing import Dict, List
+
+from utils.ij_remover import INTERJECTIONS
+
+STOPWORDS = INTERJECTIONS
+
+MARKDOWN_CHARS = frozenset("*_~`")
+
+# Парные теги (жирный, курсив, зачеркнутый, код) — порядок применения важен
+PAIRED_PATTERNS = [re.compile(p, re.DOTALL) for p in (
+    r'\*\*(.*?)\*\*',  # **bold**
+    r'__(.*?)__',  # __bold__
+    r'\*(.*?)\*',  # *italic*
+    r'_(.*?)_',  # _italic_
+    r'~~(.*?)~~',  # ~~strikethrough~~
+    r'`(.*?)`',  # `code`
+    r'```(.*?)```',  # ```code block```
+)]
+LEADING_MARKER = re.compile(r'^(\*\*|\*|__|_|~~|`)(.*)$')
+TRAILING_MARKER = re.compile(r'^(.*?)(\*\*|\*|__|_|~~|`)$')
+
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+PUNCT_STRIP = str.maketrans("", "", ",.")
+WORD_RE = re.compile(r"\b\w+\b")
+CYRILLIC_RE = re.compile(r"[а-яА-Я]")
+# токены лексического индекса: слова с цифрами и хвостами вроде c++ / c#
+LEXICAL_TOKEN_RE = re.compile(r"\w+[+#]*")
+
+
+def clean_formatting(text: str) -> str:
+    """
+    Удаляет markdown-форматирование из текста.
+    Убирает парные и одиночные теги: **, *, __, _, ~~, ``, и т.д.
+    """
+    if not text:
+        return text
+
+    if not MARKDOWN_CHARS.isdisjoint(text):
+        for pattern in PAIRED_PATTERNS:
+            text = pattern.sub(r'\1', text)
+
+        # Удаляем одиночные форматирующие символы в начале и конце
+        match = LEADING_MARKER.match(text.strip())
+        if match:
+            text = match.group(2).strip()
+        match = TRAILING_MARKER.match(text.strip())
+        if match:
+            text = match.group(1).strip()
+
+    # Удаляем множественные пробелы (str.split режет по тем же пробельным символам, что и \s)
+    return " ".join(text.split())
+
+
+def remove_interjections(strings: List[str]) -> List[str]:
+    """
+    Разбивает строки на слова и убирает междометия, союзы и слова короче двух символов.
+    """
+    words = []
+    for string in strings:
+        for s in string.split():
+            s_t = s.translate(PUNCT_STRIP)
+            if len(s_t) >= 2 and s_t not in STOPWORDS:
+                words.append(s)
+    return words
+
+
+def split_author_chunks(text: str) -> List[str]:
+    tokens = text.split()
+    return remove_interjections(tokens) + [' '.join(tokens[i:i + 2]) for i in range(len(tokens) - 1)]
+
+
+def split_content_chunks(text: str) -> List[str]:
+    sentences = [s.strip() for s in SENTENCE_SPLIT.split(text.strip()) if s.strip()]
+    tokens = text.split()
+    return (
+            sentences +
+            remove_interjections(tokens) +
+            [' '.join(tokens[i:i + 2]) for i in range(len(tokens) - 1)] +
+            [' '.join(tokens[i:i + 3]) for i in range(len(tokens) - 2)]
+    )
+
+
+def record_chunks(rec: Dict) -> List[str]:
+    """Нарезает запись на очищенные непустые чанки (автор, текст, перевод)."""
+    chunks = split_author_chunks(f"{rec['author']}") + split_content_chunks(f"{rec['content']}")
+    # no split_engcontent_chunks(), same function
+    if rec.get('c_translated'):
+        chunks += split_content_chunks(f"{rec['c_translated']}")
+    cleaned = (clean_formatting(ch) for ch in chunks)
+    return [ch for ch in cleaned if ch]  # добавляем только непустые чанки
+
+
+def is_cyrillic(word: str) -> bool:
+    return CYRILLIC_RE.search(word) is not None
+
+
+def normalize_query(text: str) -> str:
+    """Очищает запрос от markdown-разметки и лишних пробелов."""
+    return clean_formatting(text or "")
+
+
+def lexical_tokens(text: str) -> List[str]:
+    """Токены для лексического (BM25) поиска: нижний регистр, ё -> е, без стемминга."""
+    return LEXICAL_TOKEN_RE.findall((text or "").lower().replace("ё", "е"))
+
+
+def record_lexical_text(rec: Dict) -> str:
+    """Текст записи для лексического индекса: автор, содержание и перевод."""
+    return f"{rec['author']} {rec['content']} {rec.get('c_translated') or ''}"
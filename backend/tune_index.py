@@ -0,0 +1,125 @@
+"""
+Отчёт для выбора INDEX_TYPE: память, время построения, задержка запроса и recall@k
+каждого типа индекса FAISS на векторах нашего корпуса.
+
+Запуск: bin/tune_index [число запросов] [k] [шард]
+
+Векторы берутся из кэша эмбеддингов (после create_FAISS повторно ничего не
+считается). Запросы — случайные чанки корпуса, исключённые из индекса;
+эталон — точный поиск по плоскому индексу.
+"""
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import faiss
+import numpy as np
+
+from configs.cfg import embedding_model, embedding_dim, emb_cache_path, N_PROBE, HNSW_EF_SEARCH
+from backend.dim_reduction import EmbeddingReducer
+from backend.embedding_cache import EmbeddingCache
+from backend.faiss_index import apply_search_params, build_index, choose_nlist, index_bytes
+from backend.meta_store import MetaStore
+from backend.shards import MAIN_SHARD, shard_paths
+
+NPROBE_GRID = (4, 8, 16, 32, 64)
+EF_SEARCH_GRID = (16, 32, 64, 128, 256)
+
+
+def load_corpus_vectors(reduce: bool = True, shard: str = MAIN_SHARD) -> Tuple[np.ndarray, np.ndarray]:
+    """Векторы и id всех актуальных чанков шарда (при reduce — в размерности индекса)."""
+    from backend.create_FAISS import embed_chunks
+
+    _, meta_dir, _, reducer_dir = shard_paths(shard)
+    meta = MetaStore(meta_dir)
+    counts = np.diff(np.asarray(meta.post_offsets))
+    live = counts > 0
+    live[np.asarray(meta.failed_chunks, dtype="int64")] = False
+    ids = np.flatnonzero(live).astype("int64")
+    cache = EmbeddingCache(emb_cache_path, embedding_model, embedding_dim)
+    vecs = cache.get_or_embed([meta.chunk(int(cid)) for cid in ids], embed_chunks)
+    if reduce:
+        vecs = EmbeddingReducer.load(reducer_dir).transform(vecs)
+    return np.ascontiguousarray(vecs, dtype="float32"), ids
+
+
+def split_queries(vecs: np.ndarray, ids: np.ndarray, n_queries: int, seed: int = 0):
+    rnd = np.random.default_rng(seed)
+    mask = np.zeros(len(ids), dtype=bool)
+    mask[rnd.choice(len(ids), size=min(n_queries, len(ids) // 10), replace=False)] = True
+    return vecs[~mask], ids[~mask], vecs[mask]
+
+
+def search_latencies(index: faiss.Index, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Ищет по одному запросу (как сервер) и возвращает найденные id и задержки в мс."""
+    found = np.empty((len(queries), k), dtype="int64")
+    latencies = np.empty(len(queries))
+    for i in range(len(queries)):
+        started = time.perf_counter()
+        _, found[i:i + 1] = index.search(queries[i:i + 1], k)
+        latencies[i] = (time.perf_counter() - started) * 1000
+    return found, latencies
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def tune(vecs: np.ndarray, ids: np.ndarray, queries: np.ndarray, k: int = 30) -> List[Dict]:
+    n = len(ids)
+    nlist = choose_nlist(n, force=True)
+    exact = build_index(vecs, ids, "FLAT")
+    _, truth = exact.search(queries, k)
+
+    candidates = [("FLAT", 0, [None]), ("IVF_FLAT", nlist, NPROBE_GRID), ("IVF_SQ8", nlist, NPROBE_GRID),
+                  ("IVF_PQ", nlist, NPROBE_GRID), ("HNSW", 0, EF_SEARCH_GRID)]
+    rows = []
+    for kind, kind_nlist, grid in candidates:
+        started = time.perf_counter()
+        try:
+            index = exact if kind == "FLAT" else build_index(vecs, ids, kind, kind_nlist)
+        except RuntimeError as e:
+            print(f"[TUNE] {kind} пропущен: {e}")
+            continue
+        build_s = time.perf_counter() - started
+        memory = index_bytes(index)
+        for param in grid:
+            if kind.startswith("IVF"):
+                apply_search_params(index, nprobe=param)
+            elif kind == "HNSW":
+                apply_search_params(index, ef_search=param)
+            found, latencies = search_latencies(index, queries, k)
+            rows.append({
+                "type": kind,
+                "param": "" if param is None else (f"nprobe={param}" if kind.startswith("IVF") else f"efSearch={param}"),
+                "memory_mb": memory / 2 ** 20,
+                "bytes_per_vector": memory / max(n, 1),
+                "build_s": build_s,
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p95_ms": float(np.percentile(latencies, 95)),
+                f"recall@{k}": recall_at_k(found, truth),
+            })
+    return rows
+
+
+def print_report(rows: List[Dict], n: int, dim: int, n_queries: int, k: int):
+    print(f"\n[TUNE] {n} векторов, dim={dim}, {n_queries} запросов, k={k} "
+          f"(сейчас N_PROBE={N_PROBE}, HNSW_EF_SEARCH={HNSW_EF_SEARCH})")
+    print(f"{'тип':<9} {'параметр':<13} {'память МБ':>10} {'Б/вектор':>9} {'сборка с':>9} "
+          f"{'p50 мс':>8} {'p95 мс':>8} {f'recall@{k}':>10}")
+    for r in rows:
+        print(f"{r['type']:<9} {r['param']:<13} {r['memory_mb']:>10.1f} {r['bytes_per_vector']:>9.0f} "
+              f"{r['build_s']:>9.1f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r[f'recall@{k}']:>10.3f}")
+
+
+def main(n_queries: int = 200, k: int = 30, shard: str = MAIN_SHARD):
+    vecs, ids = load_corpus_vectors(shard=shard)
+    base, base_ids, queries = split_queries(vecs, ids, n_queries)
+    rows = tune(base, base_ids, queries, k)
+    print_report(rows, len(base_ids), base.shape[1], len(queries), k)
+    return rows
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]), *sys.argv[3:4])
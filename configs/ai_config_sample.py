@@ -4,12 +4,32 @@ sentence_transformers_embedding_model = "sentence-transformers/paraphrase-multil
 sentence_transformers_embedding_dim = 384
 sentence_transformers_threshold = 0.81
 
+# рантайм модели: "torch", "onnx" или "openvino" (два последних — sentence-transformers>=3.2 и optimum)
+sentence_transformers_backend = "torch"
+# файл экспортированной модели для onnx/openvino, например "onnx/model_qint8_avx512_vnni.onnx" ("" — по умолчанию)
+sentence_transformers_model_file = ""
+# динамическая int8-квантизация линейных слоёв (только torch на cpu)
+sentence_transformers_quantize_int8 = False
+# процессов для эмбеддинга при индексации на cpu (0 — по числу ядер, 1 — без пула)
+sentence_transformers_encode_workers = 0
+# батчи собираются из текстов близкой длины: не больше max_batch_tokens токенов с паддингом и max_batch_size текстов
+sentence_transformers_max_batch_tokens = 8192
+sentence_transformers_max_batch_size = 256
+
 openai_embedding_model = "text-embedding-3-large"
 openai_embedding_dim = 3072
 openai_threshold = 0.6
 
+# клиент эмбеддингов для индексации: параллельные запросы, размер батча в токенах, повторы
+openai_embedding_concurrency = 8
+openai_embedding_max_batch_tokens = 100000
+openai_embedding_max_batch_items = 2048
+openai_embedding_max_retries = 6
+
 preprocessing_model = "openai/gpt-4o-mini"
 postprocessing_model = "google/gemini-2.5-flash"
+# сколько расширений запросов LLM (pre_proccessing) хранить в кэше на диске (SQLite, LRU); 0 — кэш отключён
+expansion_cache_size = 10000
 
 llm_search_model = "openai/gpt-4"
 
@@ -17,11 +37,114 @@ faiss_deep = 100
 N_LIST = 100
 N_PROBE = 20
 
+# выбирать число списков IVF по размеру корпуса (~4*sqrt(N)) вместо фиксированного N_LIST
+IVF_AUTO_NLIST = True
+# до этого числа векторов используется точный плоский индекс вместо IVF
+FLAT_INDEX_MAX_VECTORS = 20000
+# перетренировать IVF, когда перекос длин списков (imbalance factor) превышает порог
+IVF_IMBALANCE_THRESHOLD = 3.0
+
+# тип индекса для корпуса больше FLAT_INDEX_MAX_VECTORS:
+# "IVF_FLAT", "IVF_SQ8" (int8, в 4 раза меньше памяти), "IVF_PQ" (сжатие PQ), "HNSW" или "FLAT" (всегда точный)
+INDEX_TYPE = "IVF_FLAT"
+# HNSW: число связей на вершину, глубина поиска при построении и при запросе
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 128
+# IVF_PQ: число подвекторов (0 — dim/16) и бит на подвектор
+PQ_M = 0
+PQ_NBITS = 8
+# у IVF_SQ8/IVF_PQ score приближённые: из индекса берётся в RERANK_OVERFETCH раз больше
+# кандидатов, и их score пересчитывается точно по векторам чанков (chunk/). 0 — без пересчёта
+RERANK_OVERFETCH = 4
+# перестроить индекс, когда доля устаревших векторов (HNSW не умеет удалять) превышает порог
+INDEX_STALE_FRACTION = 0.1
+# сервер открывает индекс через mmap (быстрый старт, общая память процессов на одной машине)
+INDEX_MMAP = True
+
+# уменьшение размерности векторов в индексе и chunk/ (запросы приводятся так же):
+# "" — без уменьшения, "truncate" — первые EMBEDDING_REDUCED_DIM координат с перенормировкой
+# (для моделей с Matryoshka-обучением, например text-embedding-3-*), "pca" — PCA, обученный на корпусе.
+# После смены режима или размерности индекс пересобирается из кэша эмбеддингов.
+EMBEDDING_REDUCTION = ""
+EMBEDDING_REDUCED_DIM = 1024
+
+# отдельный индекс (шард) на каждый топик cv.json: шарды пересобираются независимо,
+# поиск идёт по ним параллельно и может ограничиваться частью шардов
+INDEX_SHARDING = False
+# имя шарда для топика (ключа cv.json); топики без имени получают шард с именем топика
+INDEX_SHARDS = {"1275": "about"}
+# потоков для параллельного поиска по шардам (0 — по числу шардов)
+SEARCH_SHARD_THREADS = 0
+# кодирование запросов и поиск по индексу идут в отдельных пулах потоков, а не в event loop сервера:
+# потоков для модели sentence_transformers, потоков для FAISS и максимум задач в каждой стадии
+# (остальные запросы ждут очереди, не занимая потоков)
+SEARCH_ENCODE_WORKERS = 1
+SEARCH_INDEX_WORKERS = 2
+SEARCH_STAGE_MAX_PENDING = 64
+# микробатчинг: пока предыдущий батч в работе, запросы одновременных пользователей копятся
+# до SEARCH_BATCH_MAX_WAIT_MS мс или SEARCH_BATCH_MAX_SIZE текстов и кодируются/ищутся вместе
+# (0 мс — без батчинга)
+SEARCH_BATCH_MAX_WAIT_MS = 5
+SEARCH_BATCH_MAX_SIZE = 64
+
+# поиск на уровне записей: score чанков одной записи сводится в один ("max" — лучший чанк,
+# "sum" — сумма по найденным чанкам, "" — выдача по чанкам, как раньше). k удваивается,
+# пока у запроса не наберётся SEARCH_RECORDS_PER_QUERY различных записей выше threshold
+# или k не дойдёт до SEARCH_MAX_K
+RECORD_AGGREGATION = "max"
+SEARCH_RECORDS_PER_QUERY = 30
+SEARCH_MAX_K = 480
+# /get_relevant_nodes отдаёт выдачу страницами: ранжированные ссылки на записи хранятся
+# в кэше сессии, тексты записей читаются только для запрошенной страницы
+SEARCH_PAGE_SIZE = 20
+# через сколько секунд без обращений кэш выдач сессии удаляется
+SESSION_CACHE_TTL = 1800
+
+# каждая сборка индекса публикуется отдельной версией (каталог published/ рядом с индексом);
+# сколько прежних версий хранить, пока сервер может их ещё читать
+INDEX_KEEP_VERSIONS = 3
+# раз в сколько секунд сервер проверяет, не опубликована ли новая версия индекса (0 — не проверять)
+INDEX_RELOAD_INTERVAL = 10
+
+# сколько записей обрабатывается и коммитится в индекс за один батч при индексации
+index_batch_size = 1000
+
+# индекс целиком сохраняется раз в столько батчей и в конце прогона (MetaStore коммитится каждый батч;
+# после сбоя недостающие в индексе векторы добавляются из кэша эмбеддингов)
+index_checkpoint_batches = 10
+
+# число процессов для нарезки записей на чанки при индексации (0 — по числу ядер, 1 — без пула)
+index_chunking_workers = 0
+
+# тип хранения векторов чанков по записям (chunk/): "float32" или "float16"
+chunk_vectors_dtype = "float32"
+
+# сколько эмбеддингов поисковых запросов хранить в кэше на диске (SQLite, LRU); 0 — кэш отключён
+query_cache_size = 10000
+
 # EMBEDDING_MODE = "sentence_transformers"
 EMBEDDING_MODE = "openai"
 
 SEARCH_MODE = "FAISS"
 # SEARCH_MODE = "LLM"
+# "HYBRID" — FAISS + лексический BM25 по записям, выдачи сливаются reciprocal rank fusion
+# SEARCH_MODE = "HYBRID"
+
+# BM25: насыщение частоты терма и нормировка по длине записи
+BM25_K1 = 1.5
+BM25_B = 0.75
+# сколько записей берёт лексический поиск в HYBRID и константа RRF (1 / (RRF_K + место))
+HYBRID_LEXICAL_K = 50
+RRF_K = 60
+
+# быстрый путь: запрос из FAST_PATH_MAX_TOKENS аббревиатур (utils/abbr_f) или коротких точных токенов
+# (не длиннее FAST_PATH_MAX_TOKEN_LEN символов или с цифрами: 1С, n8n, Go) ищется по лексическому
+# индексу без LLM, перевода и эмбеддингов; если ничего не найдено — обычный поиск
+ABBR_FAST_PATH = True
+FAST_PATH_MAX_TOKENS = 2
+FAST_PATH_MAX_TOKEN_LEN = 3
+FAST_PATH_MAX_RESULTS = 100
 
 PRE_PROCESSING_LLM_FLAG = True
 PRE_PROCESSING_SIMPLE_FLAG = False
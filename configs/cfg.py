@@ -18,22 +18,75 @@ max_processing_message_count = configs.ai_config_sample.max_processing_message_c
 sentence_transformers_embedding_model = configs.ai_config_sample.sentence_transformers_embedding_model
 sentence_transformers_embedding_dim = configs.ai_config_sample.sentence_transformers_embedding_dim
 sentence_transformers_threshold = configs.ai_config_sample.sentence_transformers_threshold
+sentence_transformers_backend = configs.ai_config_sample.sentence_transformers_backend
+sentence_transformers_model_file = configs.ai_config_sample.sentence_transformers_model_file
+sentence_transformers_quantize_int8 = configs.ai_config_sample.sentence_transformers_quantize_int8
+sentence_transformers_encode_workers = configs.ai_config_sample.sentence_transformers_encode_workers
+sentence_transformers_max_batch_tokens = configs.ai_config_sample.sentence_transformers_max_batch_tokens
+sentence_transformers_max_batch_size = configs.ai_config_sample.sentence_transformers_max_batch_size
 
 openai_embedding_model = configs.ai_config_sample.openai_embedding_model
 openai_embedding_dim = configs.ai_config_sample.openai_embedding_dim
 openai_threshold = configs.ai_config_sample.openai_threshold
+openai_embedding_concurrency = configs.ai_config_sample.openai_embedding_concurrency
+openai_embedding_max_batch_tokens = configs.ai_config_sample.openai_embedding_max_batch_tokens
+openai_embedding_max_batch_items = configs.ai_config_sample.openai_embedding_max_batch_items
+openai_embedding_max_retries = configs.ai_config_sample.openai_embedding_max_retries
 
 preprocessing_model = configs.ai_config_sample.preprocessing_model
 postprocessing_model = configs.ai_config_sample.postprocessing_model
+expansion_cache_size = configs.ai_config_sample.expansion_cache_size
 
 llm_search_model = configs.ai_config_sample.llm_search_model
 
 faiss_deep = configs.ai_config_sample.faiss_deep
 N_LIST = configs.ai_config_sample.N_LIST
 N_PROBE = configs.ai_config_sample.N_PROBE
+IVF_AUTO_NLIST = configs.ai_config_sample.IVF_AUTO_NLIST
+FLAT_INDEX_MAX_VECTORS = configs.ai_config_sample.FLAT_INDEX_MAX_VECTORS
+IVF_IMBALANCE_THRESHOLD = configs.ai_config_sample.IVF_IMBALANCE_THRESHOLD
+INDEX_TYPE = configs.ai_config_sample.INDEX_TYPE
+HNSW_M = configs.ai_config_sample.HNSW_M
+HNSW_EF_CONSTRUCTION = configs.ai_config_sample.HNSW_EF_CONSTRUCTION
+HNSW_EF_SEARCH = configs.ai_config_sample.HNSW_EF_SEARCH
+PQ_M = configs.ai_config_sample.PQ_M
+PQ_NBITS = configs.ai_config_sample.PQ_NBITS
+RERANK_OVERFETCH = configs.ai_config_sample.RERANK_OVERFETCH
+INDEX_STALE_FRACTION = configs.ai_config_sample.INDEX_STALE_FRACTION
+INDEX_MMAP = configs.ai_config_sample.INDEX_MMAP
+EMBEDDING_REDUCTION = configs.ai_config_sample.EMBEDDING_REDUCTION
+EMBEDDING_REDUCED_DIM = configs.ai_config_sample.EMBEDDING_REDUCED_DIM
+INDEX_SHARDING = configs.ai_config_sample.INDEX_SHARDING
+INDEX_SHARDS = configs.ai_config_sample.INDEX_SHARDS
+SEARCH_SHARD_THREADS = configs.ai_config_sample.SEARCH_SHARD_THREADS
+SEARCH_ENCODE_WORKERS = configs.ai_config_sample.SEARCH_ENCODE_WORKERS
+SEARCH_INDEX_WORKERS = configs.ai_config_sample.SEARCH_INDEX_WORKERS
+SEARCH_STAGE_MAX_PENDING = configs.ai_config_sample.SEARCH_STAGE_MAX_PENDING
+SEARCH_BATCH_MAX_WAIT_MS = configs.ai_config_sample.SEARCH_BATCH_MAX_WAIT_MS
+SEARCH_BATCH_MAX_SIZE = configs.ai_config_sample.SEARCH_BATCH_MAX_SIZE
+RECORD_AGGREGATION = configs.ai_config_sample.RECORD_AGGREGATION
+SEARCH_RECORDS_PER_QUERY = configs.ai_config_sample.SEARCH_RECORDS_PER_QUERY
+SEARCH_MAX_K = configs.ai_config_sample.SEARCH_MAX_K
+SEARCH_PAGE_SIZE = configs.ai_config_sample.SEARCH_PAGE_SIZE
+SESSION_CACHE_TTL = configs.ai_config_sample.SESSION_CACHE_TTL
+INDEX_KEEP_VERSIONS = configs.ai_config_sample.INDEX_KEEP_VERSIONS
+INDEX_RELOAD_INTERVAL = configs.ai_config_sample.INDEX_RELOAD_INTERVAL
+chunk_vectors_dtype = configs.ai_config_sample.chunk_vectors_dtype
+query_cache_size = configs.ai_config_sample.query_cache_size
+index_batch_size = configs.ai_config_sample.index_batch_size
+index_checkpoint_batches = configs.ai_config_sample.index_checkpoint_batches
+index_chunking_workers = configs.ai_config_sample.index_chunking_workers
 
 EMBEDDING_MODE = configs.ai_config_sample.EMBEDDING_MODE
 SEARCH_MODE = configs.ai_config_sample.SEARCH_MODE
+BM25_K1 = configs.ai_config_sample.BM25_K1
+BM25_B = configs.ai_config_sample.BM25_B
+HYBRID_LEXICAL_K = configs.ai_config_sample.HYBRID_LEXICAL_K
+RRF_K = configs.ai_config_sample.RRF_K
+ABBR_FAST_PATH = configs.ai_config_sample.ABBR_FAST_PATH
+FAST_PATH_MAX_TOKENS = configs.ai_config_sample.FAST_PATH_MAX_TOKENS
+FAST_PATH_MAX_TOKEN_LEN = configs.ai_config_sample.FAST_PATH_MAX_TOKEN_LEN
+FAST_PATH_MAX_RESULTS = configs.ai_config_sample.FAST_PATH_MAX_RESULTS
 
 PRE_PROCESSING_LLM_FLAG = configs.ai_config_sample.PRE_PROCESSING_LLM_FLAG
 PRE_PROCESSING_SIMPLE_FLAG = configs.ai_config_sample.PRE_PROCESSING_SIMPLE_FLAG
@@ -93,6 +146,24 @@ try:
         if hasattr(configs.ai_config, 'sentence_transformers_threshold'):
             sentence_transformers_threshold = configs.ai_config.sentence_transformers_threshold
 
+        if hasattr(configs.ai_config, 'sentence_transformers_backend'):
+            sentence_transformers_backend = configs.ai_config.sentence_transformers_backend
+
+        if hasattr(configs.ai_config, 'sentence_transformers_model_file'):
+            sentence_transformers_model_file = configs.ai_config.sentence_transformers_model_file
+
+        if hasattr(configs.ai_config, 'sentence_transformers_quantize_int8'):
+            sentence_transformers_quantize_int8 = configs.ai_config.sentence_transformers_quantize_int8
+
+        if hasattr(configs.ai_config, 'sentence_transformers_encode_workers'):
+            sentence_transformers_encode_workers = configs.ai_config.sentence_transformers_encode_workers
+
+        if hasattr(configs.ai_config, 'sentence_transformers_max_batch_tokens'):
+            sentence_transformers_max_batch_tokens = configs.ai_config.sentence_transformers_max_batch_tokens
+
+        if hasattr(configs.ai_config, 'sentence_transformers_max_batch_size'):
+            sentence_transformers_max_batch_size = configs.ai_config.sentence_transformers_max_batch_size
+
         if hasattr(configs.ai_config, 'openai_embedding_model'):
             openai_embedding_model = configs.ai_config.openai_embedding_model
 
@@ -102,12 +173,27 @@ try:
         if hasattr(configs.ai_config, 'openai_threshold'):
             openai_threshold = configs.ai_config.openai_threshold
 
+        if hasattr(configs.ai_config, 'openai_embedding_concurrency'):
+            openai_embedding_concurrency = configs.ai_config.openai_embedding_concurrency
+
+        if hasattr(configs.ai_config, 'openai_embedding_max_batch_tokens'):
+            openai_embedding_max_batch_tokens = configs.ai_config.openai_embedding_max_batch_tokens
+
+        if hasattr(configs.ai_config, 'openai_embedding_max_batch_items'):
+            openai_embedding_max_batch_items = configs.ai_config.openai_embedding_max_batch_items
+
+        if hasattr(configs.ai_config, 'openai_embedding_max_retries'):
+            openai_embedding_max_retries = configs.ai_config.openai_embedding_max_retries
+
         if hasattr(configs.ai_config, 'preprocessing_model'):
             preprocessing_model = configs.ai_config.preprocessing_model
 
         if hasattr(configs.ai_config, 'postprocessing_model'):
             postprocessing_model = configs.ai_config.postprocessing_model
 
+        if hasattr(configs.ai_config, 'expansion_cache_size'):
+            expansion_cache_size = configs.ai_config.expansion_cache_size
+
         if hasattr(configs.ai_config, 'llm_search_model'):
             llm_search_model = configs.ai_config.llm_search_model
 
@@ -117,6 +203,108 @@ try:
         if hasattr(configs.ai_config, 'N_PROBE'):
             N_PROBE = configs.ai_config.N_PROBE
 
+        if hasattr(configs.ai_config, 'IVF_AUTO_NLIST'):
+            IVF_AUTO_NLIST = configs.ai_config.IVF_AUTO_NLIST
+
+        if hasattr(configs.ai_config, 'FLAT_INDEX_MAX_VECTORS'):
+            FLAT_INDEX_MAX_VECTORS = configs.ai_config.FLAT_INDEX_MAX_VECTORS
+
+        if hasattr(configs.ai_config, 'IVF_IMBALANCE_THRESHOLD'):
+            IVF_IMBALANCE_THRESHOLD = configs.ai_config.IVF_IMBALANCE_THRESHOLD
+
+        if hasattr(configs.ai_config, 'INDEX_TYPE'):
+            INDEX_TYPE = configs.ai_config.INDEX_TYPE
+
+        if hasattr(configs.ai_config, 'HNSW_M'):
+            HNSW_M = configs.ai_config.HNSW_M
+
+        if hasattr(configs.ai_config, 'HNSW_EF_CONSTRUCTION'):
+            HNSW_EF_CONSTRUCTION = configs.ai_config.HNSW_EF_CONSTRUCTION
+
+        if hasattr(configs.ai_config, 'HNSW_EF_SEARCH'):
+            HNSW_EF_SEARCH = configs.ai_config.HNSW_EF_SEARCH
+
+        if hasattr(configs.ai_config, 'PQ_M'):
+            PQ_M = configs.ai_config.PQ_M
+
+        if hasattr(configs.ai_config, 'PQ_NBITS'):
+            PQ_NBITS = configs.ai_config.PQ_NBITS
+
+        if hasattr(configs.ai_config, 'RERANK_OVERFETCH'):
+            RERANK_OVERFETCH = configs.ai_config.RERANK_OVERFETCH
+
+        if hasattr(configs.ai_config, 'INDEX_STALE_FRACTION'):
+            INDEX_STALE_FRACTION = configs.ai_config.INDEX_STALE_FRACTION
+
+        if hasattr(configs.ai_config, 'INDEX_MMAP'):
+            INDEX_MMAP = configs.ai_config.INDEX_MMAP
+
+        if hasattr(configs.ai_config, 'EMBEDDING_REDUCTION'):
+            EMBEDDING_REDUCTION = configs.ai_config.EMBEDDING_REDUCTION
+
+        if hasattr(configs.ai_config, 'EMBEDDING_REDUCED_DIM'):
+            EMBEDDING_REDUCED_DIM = configs.ai_config.EMBEDDING_REDUCED_DIM
+
+        if hasattr(configs.ai_config, 'INDEX_SHARDING'):
+            INDEX_SHARDING = configs.ai_config.INDEX_SHARDING
+
+        if hasattr(configs.ai_config, 'INDEX_SHARDS'):
+            INDEX_SHARDS = configs.ai_config.INDEX_SHARDS
+
+        if hasattr(configs.ai_config, 'SEARCH_SHARD_THREADS'):
+            SEARCH_SHARD_THREADS = configs.ai_config.SEARCH_SHARD_THREADS
+
+        if hasattr(configs.ai_config, 'SEARCH_ENCODE_WORKERS'):
+            SEARCH_ENCODE_WORKERS = configs.ai_config.SEARCH_ENCODE_WORKERS
+
+        if hasattr(configs.ai_config, 'SEARCH_INDEX_WORKERS'):
+            SEARCH_INDEX_WORKERS = configs.ai_config.SEARCH_INDEX_WORKERS
+
+        if hasattr(configs.ai_config, 'SEARCH_STAGE_MAX_PENDING'):
+            SEARCH_STAGE_MAX_PENDING = configs.ai_config.SEARCH_STAGE_MAX_PENDING
+
+        if hasattr(configs.ai_config, 'SEARCH_BATCH_MAX_WAIT_MS'):
+            SEARCH_BATCH_MAX_WAIT_MS = configs.ai_config.SEARCH_BATCH_MAX_WAIT_MS
+
+        if hasattr(configs.ai_config, 'SEARCH_BATCH_MAX_SIZE'):
+            SEARCH_BATCH_MAX_SIZE = configs.ai_config.SEARCH_BATCH_MAX_SIZE
+
+        if hasattr(configs.ai_config, 'RECORD_AGGREGATION'):
+            RECORD_AGGREGATION = configs.ai_config.RECORD_AGGREGATION
+
+        if hasattr(configs.ai_config, 'SEARCH_RECORDS_PER_QUERY'):
+            SEARCH_RECORDS_PER_QUERY = configs.ai_config.SEARCH_RECORDS_PER_QUERY
+
+        if hasattr(configs.ai_config, 'SEARCH_MAX_K'):
+            SEARCH_MAX_K = configs.ai_config.SEARCH_MAX_K
+
+        if hasattr(configs.ai_config, 'SEARCH_PAGE_SIZE'):
+            SEARCH_PAGE_SIZE = configs.ai_config.SEARCH_PAGE_SIZE
+
+        if hasattr(configs.ai_config, 'SESSION_CACHE_TTL'):
+            SESSION_CACHE_TTL = configs.ai_config.SESSION_CACHE_TTL
+
+        if hasattr(configs.ai_config, 'INDEX_KEEP_VERSIONS'):
+            INDEX_KEEP_VERSIONS = configs.ai_config.INDEX_KEEP_VERSIONS
+
+        if hasattr(configs.ai_config, 'INDEX_RELOAD_INTERVAL'):
+            INDEX_RELOAD_INTERVAL = configs.ai_config.INDEX_RELOAD_INTERVAL
+
+        if hasattr(configs.ai_config, 'chunk_vectors_dtype'):
+            chunk_vectors_dtype = configs.ai_config.chunk_vectors_dtype
+
+        if hasattr(configs.ai_config, 'query_cache_size'):
+            query_cache_size = configs.ai_config.query_cache_size
+
+        if hasattr(configs.ai_config, 'index_batch_size'):
+            index_batch_size = configs.ai_config.index_batch_size
+
+        if hasattr(configs.ai_config, 'index_checkpoint_batches'):
+            index_checkpoint_batches = configs.ai_config.index_checkpoint_batches
+
+        if hasattr(configs.ai_config, 'index_chunking_workers'):
+            index_chunking_workers = configs.ai_config.index_chunking_workers
+
         if hasattr(configs.ai_config, 'faiss_deep'):
             faiss_deep = configs.ai_config.faiss_deep
 
@@ -126,6 +314,30 @@ try:
         if hasattr(configs.ai_config, 'SEARCH_MODE'):
             SEARCH_MODE = configs.ai_config.SEARCH_MODE
 
+        if hasattr(configs.ai_config, 'BM25_K1'):
+            BM25_K1 = configs.ai_config.BM25_K1
+
+        if hasattr(configs.ai_config, 'BM25_B'):
+            BM25_B = configs.ai_config.BM25_B
+
+        if hasattr(configs.ai_config, 'HYBRID_LEXICAL_K'):
+            HYBRID_LEXICAL_K = configs.ai_config.HYBRID_LEXICAL_K
+
+        if hasattr(configs.ai_config, 'RRF_K'):
+            RRF_K = configs.ai_config.RRF_K
+
+        if hasattr(configs.ai_config, 'ABBR_FAST_PATH'):
+            ABBR_FAST_PATH = configs.ai_config.ABBR_FAST_PATH
+
+        if hasattr(configs.ai_config, 'FAST_PATH_MAX_TOKENS'):
+            FAST_PATH_MAX_TOKENS = configs.ai_config.FAST_PATH_MAX_TOKENS
+
+        if hasattr(configs.ai_config, 'FAST_PATH_MAX_TOKEN_LEN'):
+            FAST_PATH_MAX_TOKEN_LEN = configs.ai_config.FAST_PATH_MAX_TOKEN_LEN
+
+        if hasattr(configs.ai_config, 'FAST_PATH_MAX_RESULTS'):
+            FAST_PATH_MAX_RESULTS = configs.ai_config.FAST_PATH_MAX_RESULTS
+
         if hasattr(configs.ai_config, 'PRE_PROCESSING_LLM_FLAG'):
             PRE_PROCESSING_LLM_FLAG = configs.ai_config.PRE_PROCESSING_LLM_FLAG
 
@@ -197,6 +409,8 @@ tg_dump_last_dump_path = os.path.join(tg_dump_path, "last_dump")
 
 sentence_transformers_path = os.path.join(FAISS_PATH, "SENTENCE_TRANSFORMERS")
 openai_path = os.path.join(FAISS_PATH, "OPENAI")
+# расширения запросов не зависят от модели эмбеддингов
+expansion_cache_path = os.path.join(FAISS_PATH, "expansion_cache.sqlite")
 
 db_path = os.path.join(DATABASE_PATH, "database")
 db_schema_path = os.path.join(db_path, "dbschema")
@@ -210,8 +424,12 @@ threshold = 0
 index_path = ''
 metadata_path = ''
 chunk_path = ''
+emb_cache_path = ''
+reducer_path = ''
+query_cache_path = ''
+shards_path = ''
 
-if SEARCH_MODE == "FAISS":
+if SEARCH_MODE in ("FAISS", "HYBRID"):
     if EMBEDDING_MODE == 'sentence_transformers':
         embedding_model = sentence_transformers_embedding_model
         embedding_dim = sentence_transformers_embedding_dim
@@ -219,8 +437,12 @@ if SEARCH_MODE == "FAISS":
 
         os.makedirs(os.path.join(sentence_transformers_path, f"{embedding_model}"), exist_ok=True)
         index_path = os.path.join(sentence_transformers_path, f"{embedding_model}", "index.index")
-        metadata_path = os.path.join(sentence_transformers_path, f"{embedding_model}", "metadata.json")
-        chunk_path = os.path.join(sentence_transformers_path, f"{embedding_model}", "chunk.npy")
+        metadata_path = os.path.join(sentence_transformers_path, f"{embedding_model}", "meta")
+        chunk_path = os.path.join(sentence_transformers_path, f"{embedding_model}", "chunk")
+        emb_cache_path = os.path.join(sentence_transformers_path, f"{embedding_model}", "emb_cache")
+        reducer_path = os.path.join(sentence_transformers_path, f"{embedding_model}", "reducer")
+        query_cache_path = os.path.join(sentence_transformers_path, f"{embedding_model}", "query_cache.sqlite")
+        shards_path = os.path.join(sentence_transformers_path, f"{embedding_model}", "shards")
     else:
         if EMBEDDING_MODE == 'openai':
             embedding_model = openai_embedding_model
@@ -229,8 +451,12 @@ if SEARCH_MODE == "FAISS":
 
             os.makedirs(os.path.join(openai_path, f"{embedding_model}"), exist_ok=True)
             index_path = os.path.join(openai_path, f"{embedding_model}", "index.index")
-            metadata_path = os.path.join(openai_path, f"{embedding_model}", "metadata.json")
-            chunk_path = os.path.join(openai_path, f"{embedding_model}", "chunk.npy")
+            metadata_path = os.path.join(openai_path, f"{embedding_model}", "meta")
+            chunk_path = os.path.join(openai_path, f"{embedding_model}", "chunk")
+            emb_cache_path = os.path.join(openai_path, f"{embedding_model}", "emb_cache")
+            reducer_path = os.path.join(openai_path, f"{embedding_model}", "reducer")
+            query_cache_path = os.path.join(openai_path, f"{embedding_model}", "query_cache.sqlite")
+            shards_path = os.path.join(openai_path, f"{embedding_model}", "shards")
         else:
             raise ValueError('ОШИБКА КОНФИГУРИРОВАНИЯ ЕМБЕД МОДЕЛИ')
 else:
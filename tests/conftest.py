@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from configs.cfg import embedding_dim
+from backend.bench_search import HashEmbedder
+
+
+@pytest.fixture
+def hash_embed():
+    """Детерминированная замена модели эмбеддингов размерности из конфига."""
+    return HashEmbedder(embedding_dim)
+
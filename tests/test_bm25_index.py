@@ -0,0 +1,113 @@
+import math
+import os
+
+import numpy as np
+import pytest
+
+from backend.bm25_index import BM25Index, BM25IndexBuilder, sync_lexical_index
+from backend.meta_store import MetaStore, MetaStoreBuilder
+from backend.search_FAISS import rrf_fuse
+from backend.text_norm import lexical_tokens, record_lexical_text
+
+DOCS = [
+    "python разработчик django",
+    "python python аналитик",
+    "go разработчик",
+    "дизайнер интерфейсов",
+]
+
+
+def reference_scores(docs, query, k1=1.2, b=0.75):
+    """BM25 «в лоб» по определению: idf = ln(1 + (N - df + 0.5) / (df + 0.5))."""
+    tokens = [lexical_tokens(doc) for doc in docs]
+    avgdl = sum(map(len, tokens)) / len(tokens)
+    scores = []
+    for doc in tokens:
+        score = 0.0
+        for term in dict.fromkeys(lexical_tokens(query)):
+            df = sum(term in other for other in tokens)
+            tf = doc.count(term)
+            if tf:
+                idf = math.log1p((len(tokens) - df + 0.5) / (df + 0.5))
+                score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(doc) / avgdl))
+        scores.append(score)
+    return scores
+
+
+def record(tid, content):
+    return {"telegram_id": tid, "date": "2024-01-01", "content": content, "author": f"@user{tid}",
+            "media_path": None, "c_translated": None}
+
+
+def test_scores_match_definition(tmp_path):
+    builder = BM25IndexBuilder(str(tmp_path))
+    for i, doc in enumerate(DOCS[:2]):
+        builder.add(i, doc)
+    builder.flush()
+    # вторая порция вливается в уже записанные posting-списки
+    builder = BM25IndexBuilder(str(tmp_path))
+    for i, doc in enumerate(DOCS[2:], start=2):
+        builder.add(i, doc)
+    builder.flush()
+
+    index = BM25Index(str(tmp_path), np.ones(len(DOCS), dtype=bool), k1=1.2, b=0.75)
+    docs, scores = index.search(lexical_tokens("python разработчик"), k=10)
+    expected = reference_scores(DOCS, "python разработчик")
+    assert docs.tolist() == [0, 1, 2]
+    assert scores.tolist() == pytest.approx([expected[d] for d in docs], rel=1e-5)
+    assert index.match_all([["python"], ["разработчик"]]).tolist() == [0]
+
+
+def test_sync_after_edits_and_deletes(tmp_path):
+    path = str(tmp_path / "meta")
+    meta = MetaStoreBuilder(path)
+    for tid, doc in enumerate(DOCS):
+        meta.add_record(record(tid, doc))
+    meta.flush()
+    assert sync_lexical_index(path) == len(DOCS)
+
+    # правка записи 1 (новая версия дописывается) и удаление записи 3
+    meta.remove_record(meta.live_row(1))
+    meta.add_record(record(1, "rust аналитик"))
+    meta.remove_record(meta.live_row(3))
+    meta.flush()
+    meta.close()
+    assert sync_lexical_index(path) == 1
+
+    store = MetaStore(path)
+    index = BM25Index(path, store.alive)
+    assert index.n_docs == store.n_records
+
+    def tids(query):
+        return [int(store.telegram_ids[d]) for d in index.search(lexical_tokens(query), k=10)[0]]
+
+    assert tids("rust") == [1]
+    assert tids("python") == [0]
+    assert tids("дизайнер") == []
+
+    # idf и средняя длина считаются только по живым записям: как у индекса с нуля
+    fresh = str(tmp_path / "fresh")
+    os.makedirs(fresh)
+    live = [store.record(row) for row in np.flatnonzero(store.alive)]
+    builder = BM25IndexBuilder(fresh)
+    for i, rec in enumerate(live):
+        builder.add(i, record_lexical_text(rec))
+    builder.flush()
+    fresh_index = BM25Index(fresh, np.ones(len(live), dtype=bool))
+    for query in ("python разработчик", "аналитик", "go"):
+        docs, scores = index.search(lexical_tokens(query), k=10)
+        fresh_docs, fresh_scores = fresh_index.search(lexical_tokens(query), k=10)
+        assert [int(store.telegram_ids[d]) for d in docs] == [live[d]["telegram_id"] for d in fresh_docs]
+        assert scores.tolist() == pytest.approx(fresh_scores.tolist(), rel=1e-5)
+
+
+def test_rrf_fuse_ranking():
+    def ranking(*tids):
+        return [({"telegram_id": tid, "score": 1.0}, f"выдача {tid}") for tid in tids]
+
+    records, highlights = rrf_fuse([ranking(1, 2, 3), ranking(3, 4, 1)], k=60)
+    # 1: 1/61 + 1/63, 3: 1/63 + 1/61 — поровну, порядок по первому появлению; затем 2 и 4
+    assert [rec["telegram_id"] for rec in records] == [1, 3, 2, 4]
+    assert records[0]["score"] == pytest.approx(1 / 61 + 1 / 63)
+    assert records[2]["score"] == pytest.approx(1 / 62) and records[3]["score"] == pytest.approx(1 / 62)
+    assert highlights[1] == "выдача 3"
@@ -0,0 +1,111 @@
+import json
+
+import numpy as np
+import pytest
+
+import backend.create_FAISS as create_FAISS
+import backend.faiss_index as faiss_index
+from backend.bench_search import synthetic_records
+from backend.chunk_store import ChunkVectorStore
+from backend.faiss_index import index_ids, index_type
+from backend.index_publish import verify_version, version_paths
+from backend.create_FAISS import cv_record
+from backend.meta_store import MetaStore, MetaStoreBuilder
+from utils.json_stream import iter_json_arrays
+
+
+def build(base, records, batch_size=64):
+    index_file, meta_dir, chunk_dir, reducer_dir = version_paths(str(base))
+    create_FAISS.process_index(index_file, meta_dir, chunk_dir, [dict(rec) for rec in records],
+                               batch_size=batch_size, reducer_dir=reducer_dir)
+
+
+def test_hnsw_edit_then_revert_keeps_ids_unique(tmp_path, monkeypatch, hash_embed):
+    # HNSW не умеет удалять векторы: чанк, вернувшийся в запись после отката правки,
+    # не должен второй раз попасть в индекс со своим старым id
+    monkeypatch.setattr(create_FAISS, "embed_chunks", hash_embed)
+    monkeypatch.setattr(create_FAISS, "emb_cache_path", str(tmp_path / "emb_cache"))
+    monkeypatch.setattr(faiss_index, "INDEX_TYPE", "HNSW")
+    monkeypatch.setattr(faiss_index, "FLAT_INDEX_MAX_VECTORS", 50)
+    base = tmp_path / "shard"
+    records = synthetic_records(120, seed=1)
+
+    build(base, records)
+    edited = [dict(rec) for rec in records]
+    edited[0]["content"] = "Резюме обновлено: ищу работу Rust разработчиком."
+    build(base, edited)
+    build(base, records)
+
+    index = faiss_index.open_index(version_paths(str(base))[0], mmap=False)
+    assert index_type(index) == "HNSW"
+    ids = index_ids(index)
+    assert len(np.unique(ids)) == len(ids)
+    verify_version(str(base))
+
+
+def test_resume_rolls_back_uncommitted_chunk_vectors(tmp_path, monkeypatch, hash_embed):
+    # сбой после записи chunk/, но до коммита MetaStore: строки chunk/ ссылаются на незакоммиченные чанки
+    monkeypatch.setattr(create_FAISS, "embed_chunks", hash_embed)
+    monkeypatch.setattr(create_FAISS, "emb_cache_path", str(tmp_path / "emb_cache"))
+    base = tmp_path / "shard"
+    records = synthetic_records(60, seed=3)
+    build(base, records[:40])
+
+    flush = MetaStoreBuilder.flush
+    monkeypatch.setattr(MetaStoreBuilder, "flush", lambda self: (_ for _ in ()).throw(RuntimeError("сбой")))
+    with pytest.raises(RuntimeError):
+        build(base, records)
+    chunk_dir = version_paths(str(base))[2]
+    assert np.asarray(ChunkVectorStore(chunk_dir).chunk_ids).max() >= MetaStore(version_paths(str(base))[1]).n_chunks
+
+    # следующий запуск с другими данными не переназначит эти id чанков — откатиться должен сам chunk/
+    monkeypatch.setattr(MetaStoreBuilder, "flush", flush)
+    build(base, records[:40])
+    verify_version(str(base))
+    build(base, records)
+    verify_version(str(base))
+
+
+def test_index_is_saved_every_k_batches_and_resumed(tmp_path, monkeypatch, hash_embed):
+    monkeypatch.setattr(create_FAISS, "embed_chunks", hash_embed)
+    monkeypatch.setattr(create_FAISS, "emb_cache_path", str(tmp_path / "emb_cache"))
+    monkeypatch.setattr(create_FAISS, "index_checkpoint_batches", 3)
+    writes = []
+    write_index = create_FAISS.write_index
+    monkeypatch.setattr(create_FAISS, "write_index", lambda index, path: (writes.append(index.ntotal),
+                                                                          write_index(index, path)))
+    base = tmp_path / "shard"
+    records = synthetic_records(100, seed=4)
+
+    # 10 батчей по 10 записей: сохранения после 3, 6, 9 батчей и в конце
+    build(base, records, batch_size=10)
+    assert len(writes) == 4
+    verify_version(str(base))
+
+    # сбой после коммита MetaStore, но до сохранения индекса: при следующем запуске
+    # недостающие векторы добавляются из кэша эмбеддингов
+    monkeypatch.setattr(create_FAISS, "apply_index_policy", lambda *args: (_ for _ in ()).throw(RuntimeError("сбой")))
+    more = records + synthetic_records(140, seed=5)[100:]
+    with pytest.raises(RuntimeError):
+        build(base, more, batch_size=10)
+    with pytest.raises(ValueError):
+        verify_version(str(base))
+    monkeypatch.undo()
+    monkeypatch.setattr(create_FAISS, "embed_chunks", hash_embed)
+    monkeypatch.setattr(create_FAISS, "emb_cache_path", str(tmp_path / "emb_cache"))
+    build(base, more, batch_size=10)
+    verify_version(str(base))
+
+
+def test_cv_json_is_streamed_like_json_load(tmp_path):
+    def item(tid, text):
+        return {"downloaded_text": [tid, "2024-01-01", text, "@user"], "downloaded_media": {"path": None},
+                "c_translated": None}
+
+    data = {"1": [item(1, "Python разработчик"), item(2, "")], "2": [], "3": [item(3, "Go \"backend\" 12345")]}
+    path = tmp_path / "cv.json"
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    for buffer_size in (1, 7, 1 << 20):
+        streamed = [cv_record(item) for _, item in iter_json_arrays(str(path), ["1", "3"], buffer_size)]
+        assert [rec for rec in streamed if rec] == list(create_FAISS.iter_records(data, ["1", "3"]))
+    assert list(create_FAISS.iter_cv_records(str(path))) == create_FAISS.flatten_json(data)
@@ -0,0 +1,155 @@
+import json
+import os
+
+import numpy as np
+
+from backend.bench_search import synthetic_records
+from backend.meta_store import MetaStore, MetaStoreBuilder, _save_array
+from backend.text_norm import record_chunks
+
+
+def add(meta, rec):
+    row = meta.live_row(rec["telegram_id"])
+    orphaned = meta.remove_record(row) if row is not None else []
+    rec_idx = meta.add_record(rec)
+    for chunk in record_chunks(rec):
+        meta.add_chunk_ref(chunk, rec_idx)
+    return orphaned
+
+
+def postings_by_text(store):
+    """Текст чанка -> telegram_id живых записей: сравнение не зависит от нумерации."""
+    result = {}
+    for cid in range(store.n_chunks):
+        tids = sorted(int(store.telegram_ids[r]) for r in store.postings(cid))
+        if tids:
+            result[store.chunk(cid)] = tids
+    return result
+
+
+def expected_postings(records):
+    result = {}
+    for rec in records:
+        for chunk in dict.fromkeys(record_chunks(rec)):
+            result.setdefault(chunk, []).append(rec["telegram_id"])
+    return {chunk: sorted(tids) for chunk, tids in result.items()}
+
+
+def test_edits_and_deletes_across_reopens(tmp_path):
+    path = str(tmp_path / "meta")
+    records = synthetic_records(80, seed=7)
+    meta = MetaStoreBuilder(path)
+    for rec in records[:50]:
+        add(meta, rec)
+    meta.flush()
+    meta.close()
+
+    # второй прогон: правки, удаления и новые записи поверх закоммиченного каталога
+    meta = MetaStoreBuilder(path)
+    current = {rec["telegram_id"]: rec for rec in records[:50]}
+    for rec in records[:10]:
+        rec = dict(rec, content=rec["content"] + " Опыт с Kubernetes.")
+        add(meta, rec)
+        current[rec["telegram_id"]] = rec
+    for rec in records[10:15]:
+        meta.remove_record(meta.live_row(rec["telegram_id"]))
+        del current[rec["telegram_id"]]
+    for rec in records[50:]:
+        add(meta, rec)
+        current[rec["telegram_id"]] = rec
+    meta.flush()
+    assert not meta.is_compacted
+
+    # без post.csr.bin posting-списки собираются из журнала пар
+    store = MetaStore(path)
+    assert postings_by_text(store) == expected_postings(current.values())
+    assert int(np.count_nonzero(store.alive)) == len(current) == meta.n_live
+
+    meta.flush(compact=True)
+    meta.close()
+    store = MetaStore(path)
+    assert os.path.exists(os.path.join(path, "post.csr.bin"))
+    assert postings_by_text(store) == expected_postings(current.values())
+    live = sorted((store.record(r) for r in np.flatnonzero(store.alive)), key=lambda rec: rec["telegram_id"])
+    assert live == sorted(current.values(), key=lambda rec: rec["telegram_id"])
+
+
+def test_uncommitted_tail_is_dropped(tmp_path):
+    path = str(tmp_path / "meta")
+    records = synthetic_records(30, seed=8)
+    meta = MetaStoreBuilder(path)
+    for rec in records[:20]:
+        add(meta, rec)
+    meta.flush(compact=True)
+    sizes = {name: os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)}
+
+    # сбой посреди flush: хвосты файлов дописаны, info.json нет
+    for rec in records[20:]:
+        add(meta, rec)
+    meta._append("records.jsonl", os.path.getsize(os.path.join(path, "records.jsonl")), b"{\"telegram_id\": 1}\n")
+    meta._append("post.pair.bin", os.path.getsize(os.path.join(path, "post.pair.bin")), b"\x01" * 40)
+    meta.close()
+
+    store = MetaStore(path)
+    assert store.n_records == 20
+    assert postings_by_text(store) == expected_postings(records[:20])
+
+    meta = MetaStoreBuilder(path)
+    for rec in records[20:]:
+        add(meta, rec)
+    meta.flush(compact=True)
+    meta.close()
+    assert os.path.getsize(os.path.join(path, "records.tid.bin")) == sizes["records.tid.bin"] + 8 * 10
+    assert postings_by_text(MetaStore(path)) == expected_postings(records)
+
+
+def test_legacy_store_is_migrated(tmp_path):
+    # каталог формата 1: массивы .npy, posting-списки CSR
+    path = str(tmp_path / "meta")
+    os.makedirs(path)
+    records = synthetic_records(20, seed=9)
+    chunk_ids, postings, lines = {}, [], []
+    for row, rec in enumerate(records):
+        lines.append(json.dumps(rec, ensure_ascii=False) + "\n")
+        for chunk in dict.fromkeys(record_chunks(rec)):
+            cid = chunk_ids.setdefault(chunk, len(chunk_ids))
+            if cid == len(postings):
+                postings.append([])
+            postings[cid].append(row)
+    records_blob = "".join(lines).encode("utf-8")
+    chunks = [chunk.encode("utf-8") for chunk in chunk_ids]
+    with open(os.path.join(path, "records.jsonl"), "wb") as f:
+        f.write(records_blob)
+    with open(os.path.join(path, "chunks.txt"), "wb") as f:
+        f.write(b"".join(chunks))
+    alive = np.ones(len(records), dtype="bool")
+    alive[3] = False
+    postings = [[r for r in p if r != 3] for p in postings]
+    _save_array(os.path.join(path, "records.off.npy"),
+                np.concatenate([[0], np.cumsum([len(line.encode("utf-8")) for line in lines])]).astype("int64"))
+    _save_array(os.path.join(path, "records.tid.npy"), np.array([rec["telegram_id"] for rec in records], dtype="int64"))
+    _save_array(os.path.join(path, "records.hash.npy"), np.zeros(len(records), dtype="int64"))
+    _save_array(os.path.join(path, "records.alive.npy"), alive)
+    _save_array(os.path.join(path, "chunks.off.npy"),
+                np.concatenate([[0], np.cumsum([len(c) for c in chunks])]).astype("int64"))
+    _save_array(os.path.join(path, "post.off.npy"),
+                np.concatenate([[0], np.cumsum([len(p) for p in postings])]).astype("int64"))
+    _save_array(os.path.join(path, "post.rec.npy"), np.array([r for p in postings for r in p], dtype="int32"))
+    with open(os.path.join(path, MetaStore.INFO), "w", encoding="utf-8") as f:
+        json.dump({"n_records": len(records), "n_chunks": len(chunks), "failed_chunks": []}, f)
+
+    live = [rec for row, rec in enumerate(records) if row != 3]
+    assert postings_by_text(MetaStore(path)) == expected_postings(live)
+
+    meta = MetaStoreBuilder(path)
+    assert meta.n_live == len(live) and meta.live_row(records[3]["telegram_id"]) is None
+    # тот же текст чанка получает прежний id
+    rec_idx = meta.add_record(dict(records[3], telegram_id=-1))
+    cid, needs_vector = meta.add_chunk_ref(record_chunks(records[3])[0], rec_idx)
+    assert cid == chunk_ids[record_chunks(records[3])[0]]
+    meta.flush(compact=True)
+    meta.close()
+
+    store = MetaStore(path)
+    assert store.format == 2 and not os.path.exists(os.path.join(path, "post.rec.npy"))
+    assert store.record(5) == records[5]
@@ -0,0 +1,85 @@
+import asyncio
+import shutil
+
+import openai
+import pytest
+
+import backend.create_FAISS as create_FAISS
+import backend.faiss_index as faiss_index
+from backend.bench_search import synthetic_records
+from backend.faiss_index import index_type
+from backend.index_publish import verify_version, version_paths
+from backend.openai_embedder import embed_texts
+
+
+def fake_openai(monkeypatch, hash_embed):
+    calls = []
+
+    async def acreate(input, model):
+        calls.append(len(input))
+        return {"data": [{"index": i, "embedding": vec.tolist()} for i, vec in enumerate(hash_embed(input))]}
+
+    monkeypatch.setattr(openai.Embedding, "acreate", acreate)
+    return calls
+
+
+def test_embed_texts_inside_running_loop(monkeypatch, hash_embed):
+    calls = fake_openai(monkeypatch, hash_embed)
+
+    async def main():
+        return embed_texts(["Python разработчик", "Go разработчик"])
+
+    embs, failed = asyncio.run(main())
+    assert embs.shape == (2, hash_embed.dim) and not failed and calls
+
+
+def test_rebuild_with_cache_misses_under_running_loop(tmp_path, monkeypatch, hash_embed):
+    # bin/create_FAISS вызывает сборку из asyncio.run, а перестройка индекса эмбеддит
+    # промахи кэша в главном потоке, где event loop уже запущен
+    calls = fake_openai(monkeypatch, hash_embed)
+    monkeypatch.setattr(create_FAISS, "EMBEDDING_MODE", "openai")
+    monkeypatch.setattr(create_FAISS, "emb_cache_path", str(tmp_path / "emb_cache"))
+    base = str(tmp_path / "shard")
+    index_file, meta_dir, chunk_dir, reducer_dir = version_paths(base)
+    records = synthetic_records(60, seed=2)
+
+    create_FAISS.process_index(index_file, meta_dir, chunk_dir, records[:-1], reducer_dir=reducer_dir)
+    shutil.rmtree(tmp_path / "emb_cache")
+    calls.clear()
+    monkeypatch.setattr(faiss_index, "INDEX_TYPE", "HNSW")
+    monkeypatch.setattr(faiss_index, "FLAT_INDEX_MAX_VECTORS", 50)
+
+    async def main():
+        create_FAISS.process_index(index_file, meta_dir, chunk_dir, records, reducer_dir=reducer_dir)
+
+    asyncio.run(main())
+    assert calls
+    assert index_type(faiss_index.open_index(index_file, mmap=False)) == "HNSW"
+    verify_version(base)
+
+
+def test_invalid_text_is_isolated_by_splitting(monkeypatch, hash_embed):
+    async def acreate(input, model):
+        if "плохой" in input:
+            raise openai.error.InvalidRequestError("слишком длинный текст", "input")
+        return {"data": [{"index": i, "embedding": vec.tolist()} for i, vec in enumerate(hash_embed(input))]}
+
+    monkeypatch.setattr(openai.Embedding, "acreate", acreate)
+    texts = [f"текст {i}" for i in range(8)]
+    texts[5] = "плохой"
+    embs, failed = embed_texts(texts)
+    assert failed == [5]
+    assert embs[[i for i in range(8) if i != 5]].any(axis=1).all() and not embs[5].any()
+
+
+def test_non_request_error_fails_fast(monkeypatch):
+    calls = []
+
+    async def acreate(input, model):
+        calls.append(len(input))
+        raise openai.error.AuthenticationError("неверный ключ")
+
+    monkeypatch.setattr(openai.Embedding, "acreate", acreate)
+    with pytest.raises(openai.error.AuthenticationError):
+        embed_texts([f"текст {i}" for i in range(2000)], concurrency=1)
+    assert len(calls) == 1
@@ -0,0 +1,82 @@
+from types import SimpleNamespace
+
+import faiss
+import numpy as np
+import pytest
+
+from backend.search_FAISS import aggregate_records, search_records
+
+
+class FakeShard:
+    """
+    Шард из векторов-ортов: score чанка i для запроса равен i-й координате запроса.
+    postings — записи каждого чанка; k каждого поиска запоминается в calls.
+    """
+
+    def __init__(self, postings):
+        n_chunks = len(postings)
+        self.index = faiss.IndexIDMap(faiss.IndexFlatIP(n_chunks))
+        self.index.add_with_ids(np.eye(n_chunks, dtype="float32"), np.arange(n_chunks, dtype="int64"))
+        offsets = np.zeros(n_chunks + 1, dtype="int64")
+        np.cumsum([len(p) for p in postings], out=offsets[1:])
+        self.metadata = SimpleNamespace(post_offsets=offsets,
+                                        post_records=np.array([r for p in postings for r in p], dtype="int32"))
+        self.calls = []
+
+    def search(self, vecs, k):
+        self.calls.append(k)
+        return self.index.search(vecs, k)
+
+
+@pytest.mark.parametrize("mode", ["max", "sum"])
+def test_one_hit_per_record(mode):
+    # записи 0 и 1 делят чанк 2, у записи 0 ещё два чанка
+    shard = FakeShard([[0], [0], [0, 1], [1], [2]])
+    query = np.array([[0.9, 0.5, 0.4, 0.3, 0.2]], dtype="float32")
+    q, keys, scores, chunks = search_records([shard], query, k=5, n_records=3, max_k=5, mode=mode, min_score=0.1)
+
+    assert q.tolist() == [0, 0, 0] and sorted(keys.tolist()) == [0, 1, 2]
+    expected = {0: (0.9 + 0.5 + 0.4, 0), 1: (0.4 + 0.3, 2), 2: (0.2, 4)} if mode == "sum" else \
+        {0: (0.9, 0), 1: (0.4, 2), 2: (0.2, 4)}
+    # лучший чанк записи остаётся highlight'ом, score сводится по режиму, порядок — по score
+    assert {int(key): (pytest.approx(float(s), abs=1e-6), int(c)) for key, s, c in zip(keys, scores, chunks)} == expected
+    assert np.all(np.diff(scores) <= 0)
+
+
+def test_aggregate_records_groups_by_query_and_record():
+    q = np.array([1, 0, 0, 1, 0])
+    key = np.array([7, 3, 3, 7, 5])
+    score = np.array([0.2, 0.5, 0.7, 0.6, 0.1], dtype="float32")
+    chunk = np.array([10, 11, 12, 13, 14])
+    q, key, agg, best = aggregate_records(q, key, score, chunk, "sum")
+    assert q.tolist() == [0, 0, 1] and key.tolist() == [3, 5, 7]
+    assert agg.tolist() == pytest.approx([1.2, 0.1, 0.8]) and best.tolist() == [12, 14, 13]
+
+
+def test_widening_stops_once_enough_records():
+    # по четыре чанка на запись, score убывает: первые k = 2 чанка дают одну запись
+    shard = FakeShard([[rec] for rec in range(4) for _ in range(4)])
+    query = np.linspace(1.0, 0.5, 16, dtype="float32")[None, :]
+    q, keys, _, _ = search_records([shard], query, k=2, n_records=2, max_k=64, min_score=0.1)
+    assert shard.calls == [2, 4, 8]
+    assert keys.tolist() == [0, 1]
+
+
+def test_widening_stops_at_index_size():
+    # записей меньше, чем просим: k растёт, пока индекс не исчерпан, но не до max_k
+    shard = FakeShard([[rec] for rec in range(4) for _ in range(4)])
+    query = np.linspace(1.0, 0.5, 16, dtype="float32")[None, :]
+    q, keys, _, _ = search_records([shard], query, k=2, n_records=10, max_k=1024, min_score=0.1)
+    assert shard.calls == [2, 4, 8, 16, 32]
+    assert keys.tolist() == [0, 1, 2, 3]
+
+
+def test_widening_only_for_unfinished_queries():
+    shard = FakeShard([[rec] for rec in range(4) for _ in range(4)])
+    # первый запрос набирает две записи с первых двух чанков, второму нужно расширение
+    spread = np.zeros(16, dtype="float32")
+    spread[[0, 4]] = 1.0
+    query = np.stack([spread, np.linspace(1.0, 0.5, 16, dtype="float32")])
+    q, keys, _, _ = search_records([shard], query, k=2, n_records=2, max_k=64, min_score=0.1)
+    assert shard.calls == [2, 4, 8]
+    assert q.tolist() == [0, 0, 1, 1] and keys.tolist() == [0, 1, 0, 1]
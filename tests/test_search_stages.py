@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+from backend.search_stages import QueryBatcher
+
+
+class FakeSearch:
+    """run_batch для QueryBatcher: запоминает батчи; первый батч можно задержать событием."""
+
+    def __init__(self, hold_first: bool = False):
+        self.batches = []
+        self.release = asyncio.Event()
+        if not hold_first:
+            self.release.set()
+
+    async def __call__(self, queries, k, shard_names):
+        self.batches.append((list(queries), k, shard_names))
+        if len(self.batches) == 1:
+            await self.release.wait()
+        return [({"telegram_id": i}, f"{q}/{k}", q) for i, q in enumerate(queries)]
+
+
+def test_concurrent_submits_share_one_batch():
+    async def main():
+        search = FakeSearch()
+        batcher = QueryBatcher(search, max_wait=0.05, max_size=100)
+        results = await asyncio.gather(
+            batcher.submit(["python"], 10),
+            batcher.submit(["go", "python"], 10),
+            batcher.submit(["rust"], 10),
+        )
+        return search, batcher, results
+
+    search, batcher, results = asyncio.run(main())
+    # уникальные тексты всех вызовов уходят одним батчем, каждый получает только свои тройки
+    assert search.batches == [(["python", "go", "rust"], 10, None)]
+    assert [[t[2] for t in r] for r in results] == [["python"], ["go", "python"], ["rust"]]
+    assert batcher.stats()["calls_per_batch"] == 3.0
+
+
+def test_different_k_goes_to_separate_batches():
+    async def main():
+        search = FakeSearch()
+        batcher = QueryBatcher(search, max_wait=0.05, max_size=100)
+        await asyncio.gather(batcher.submit(["python"], 10), batcher.submit(["python"], 30))
+        return search
+
+    assert sorted(k for _, k, _ in asyncio.run(main()).batches) == [10, 30]
+
+
+def test_requests_wait_max_wait_while_batch_in_flight():
+    max_wait = 0.2
+
+    async def main():
+        search = FakeSearch(hold_first=True)
+        batcher = QueryBatcher(search, max_wait=max_wait, max_size=100)
+        first = asyncio.ensure_future(batcher.submit(["python"], 10))
+        await asyncio.sleep(0.01)
+        assert len(search.batches) == 1 and batcher.in_flight == 1
+
+        # пока первый батч выполняется, новые запросы копятся до max_wait и уходят вместе
+        started = time.monotonic()
+        second = asyncio.ensure_future(batcher.submit(["go"], 10))
+        await asyncio.sleep(max_wait / 4)
+        third = asyncio.ensure_future(batcher.submit(["rust"], 10))
+        await asyncio.sleep(max_wait / 4)
+        assert len(search.batches) == 1
+        results = await asyncio.gather(second, third)
+        elapsed = time.monotonic() - started
+
+        search.release.set()
+        await first
+        return search, results, elapsed
+
+    search, results, elapsed = asyncio.run(main())
+    assert elapsed >= max_wait * 0.9
+    assert [queries for queries, _, _ in search.batches] == [["python"], ["go", "rust"]]
+    assert [[t[2] for t in r] for r in results] == [["go"], ["rust"]]
+
+
+def test_max_size_flushes_without_waiting():
+    async def main():
+        search = FakeSearch(hold_first=True)
+        batcher = QueryBatcher(search, max_wait=10.0, max_size=2)
+        first = asyncio.ensure_future(batcher.submit(["python"], 10))
+        await asyncio.sleep(0.01)
+        # max_size текстов набралось — батч уходит сразу, не дожидаясь max_wait
+        result = await asyncio.wait_for(batcher.submit(["go", "rust"], 10), timeout=1.0)
+        search.release.set()
+        await first
+        return search, result
+
+    search, result = asyncio.run(main())
+    assert len(search.batches) == 2 and [t[2] for t in result] == ["go", "rust"]
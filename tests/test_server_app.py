@@ -0,0 +1,90 @@
+import asyncio
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from configs.cfg import relevant_media_path
+
+# StaticFiles проверяет каталог медиа при импорте приложения
+os.makedirs(relevant_media_path, exist_ok=True)
+
+import backend.search_FAISS as search_FAISS  # noqa: E402
+import ui.server.app as app  # noqa: E402
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """25 записей в выдаче; считаются поиски и прочитанные записи, версия индекса задаётся тестом."""
+    state = {"searches": 0, "loaded": [], "version": (("main", "v1"),)}
+
+    async def full_pipeline(query, shard_names=None):
+        state["searches"] += 1
+        nodes = [{"ref": ("main", i), "score": 1.0 - i / 100, "content": f"{query} {i}"} for i in range(25)]
+        return nodes, [[f"hl {i}"] for i in range(25)]
+
+    def load_records(refs):
+        state["loaded"].append([rec_idx for _, rec_idx in refs])
+        return [{"date": "2024-01-01", "content": f"запись {rec_idx}", "author": "@user", "media_path": None}
+                for _, rec_idx in refs]
+
+    monkeypatch.setattr(app, "SEARCH_MODE", "FAISS")
+    monkeypatch.setattr(search_FAISS, "full_pipeline", full_pipeline)
+    monkeypatch.setattr(search_FAISS, "load_records", load_records)
+    monkeypatch.setattr(search_FAISS, "index_version", lambda: state["version"])
+    monkeypatch.setattr(app, "session_cache", {})
+    monkeypatch.setattr(app, "session_used", app.OrderedDict())
+    return state
+
+
+def get(session_id, query, **params):
+    response = asyncio.run(app.get_relevant_nodes(session_id, query, **params))
+    return json.loads(response.body)
+
+
+def test_ranked_entries_keep_refs_not_texts():
+    nodes = [{"ref": ("main", 3), "score": 0.9, "content": "текст"}, {"score": 0.5, "content": "LLM"}]
+    entries = app.ranked_entries(nodes, ["a", "b"])
+    assert entries == [(("main", 3), 0.9, "a"), (nodes[1], 0.5, "b")]
+
+
+def test_pages_are_sliced_from_one_search(server):
+    pages = [get("s1", "python", page=page, page_size=10) for page in (1, 2, 3)]
+    assert [len(p["data"]) for p in pages] == [10, 10, 5]
+    assert {p["count"] for p in pages} == {25}
+    assert [p["next_page"] for p in pages] == [2, 3, None]
+    # поиск один, тексты читаются только для записей своей страницы
+    assert server["searches"] == 1
+    assert server["loaded"] == [list(range(10)), list(range(10, 20)), list(range(20, 25))]
+    assert pages[2]["data"][0]["text"] == "запись 20" and pages[2]["data"][0]["hl"] == ["hl 20"]
+
+    assert get("s1", "python", page=4, page_size=10)["data"] == []
+    whole = get("s1", "python")
+    assert len(whole["data"]) == whole["count"] == 25 and whole["next_page"] is None
+    assert server["searches"] == 1
+
+
+def test_index_reload_keeps_other_sessions(server):
+    get("s1", "python", page=1, page_size=10)
+    get("s2", "go", page=1, page_size=10)
+    server["version"] = (("main", "v2"),)
+
+    # после перезагрузки индекса сессия ищет заново, выдача прежней версии из неё уходит
+    get("s1", "python", page=2, page_size=10)
+    assert server["searches"] == 3
+    assert list(app.session_cache["s1"]) == [("python", None, (("main", "v2"),))]
+    # чужие сессии не сбрасываются разом, а ждут своего обращения
+    assert list(app.session_cache["s2"]) == [("go", None, (("main", "v1"),))]
+
+
+def test_idle_sessions_expire(server, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(app, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    monkeypatch.setattr(app, "SESSION_CACHE_TTL", 60)
+    get("s1", "python", page=1)
+    clock[0] += 30
+    get("s2", "go", page=1)
+    clock[0] += 40
+    get("s2", "go", page=2)
+    assert list(app.session_cache) == ["s2"] and server["searches"] == 2
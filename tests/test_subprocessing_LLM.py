@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+import pytest
+
+import backend.subprocessing_LLM as subprocessing_LLM
+from utils.sqlite_lru import SqliteLRU
+
+
+@pytest.fixture
+def llm(tmp_path, monkeypatch):
+    """Кэш расширений во временном каталоге и LLM, считающая вызовы."""
+    calls = []
+
+    async def chat_completion(messages, model):
+        calls.append(messages[-1]["content"])
+        await asyncio.sleep(0.01)
+        return f"{messages[-1]['content']}, расширение"
+
+    monkeypatch.setattr(subprocessing_LLM, "chat_completion_openrouter", chat_completion)
+    monkeypatch.setattr(subprocessing_LLM, "expansion_cache", SqliteLRU(str(tmp_path / "expansions.sqlite"), 100))
+    return calls
+
+
+def test_concurrent_identical_queries_call_llm_once(llm):
+    async def main():
+        return await asyncio.gather(*(subprocessing_LLM.pre_proccessing(q) for q in ["Python", "python ", "Python"]))
+
+    assert asyncio.run(main()) == ["Python, расширение"] * 3
+    assert llm == ["Python"]
+    # следующий запрос берётся из кэша
+    assert asyncio.run(subprocessing_LLM.pre_proccessing("PYTHON")) == "Python, расширение"
+    assert llm == ["Python"] and not subprocessing_LLM._in_flight
+
+
+def test_query_during_slow_cache_read_joins_call(llm, monkeypatch):
+    # второй запрос приходит, пока первый читает кэш; первый успевает закончиться,
+    # пока второй ждал бы своего чтения кэша, — второй вызов LLM не нужен
+    cache = subprocessing_LLM.expansion_cache
+    get_many = cache.get_many
+
+    def slow_get_many(keys):
+        found = get_many(keys)
+        time.sleep(0.05)
+        return found
+
+    monkeypatch.setattr(cache, "get_many", slow_get_many)
+
+    async def main():
+        first = asyncio.ensure_future(subprocessing_LLM.pre_proccessing("Go"))
+        await asyncio.sleep(0.04)
+        second = asyncio.ensure_future(subprocessing_LLM.pre_proccessing("go"))
+        return await asyncio.gather(first, second)
+
+    assert asyncio.run(main()) == ["Go, расширение"] * 2
+    assert llm == ["Go"]
+
+
+def test_errors_are_not_cached(llm, monkeypatch):
+    async def failing(messages, model):
+        llm.append(messages[-1]["content"])
+        raise RuntimeError("LLM недоступна")
+
+    monkeypatch.setattr(subprocessing_LLM, "chat_completion_openrouter", failing)
+    with pytest.raises(RuntimeError):
+        asyncio.run(subprocessing_LLM.pre_proccessing("Rust"))
+    with pytest.raises(RuntimeError):
+        asyncio.run(subprocessing_LLM.pre_proccessing("Rust"))
+    assert llm == ["Rust", "Rust"] and not subprocessing_LLM._in_flight
@@ -18,7 +18,7 @@ export const fetchCards = async (url: string, pageNum: number, search: string):
     
     const sessionId = getSessionId();
     const endpoint = search
-      ? `${url}/get_relevant_nodes/${sessionId}/${encodeURIComponent(search)}`
+      ? `${url}/get_relevant_nodes/${sessionId}/${encodeURIComponent(search)}?page=${pageNum}&page_size=6`
       : `${url}/get_all_nodes/${sessionId}/${pageNum}`;
 
     console.log('Making request to endpoint:', endpoint);
@@ -78,8 +78,8 @@ export const Home = ({
           <CardsGrid isLoading={isLoading} onGoToHome={handleGoToHome} />
           <br />
           
-          {/* Показываем пагинацию только если не в режиме поиска и нет ошибки соединения */}
-          {!isSearchMode && !connectionError && (
+          {/* Пагинация и для всех записей, и для результатов поиска (сервер отдаёт их страницами) */}
+          {!connectionError && (
             <Pagination
               total={Math.ceil(totalCount / 6)}
               page={page}
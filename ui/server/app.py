@@ -1,5 +1,10 @@
+import asyncio
 import os
+import time
 import traceback
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
 import uvicorn
 
 from fastapi import FastAPI
@@ -14,7 +19,10 @@ from configs.cfg import (
     DATA_PATH,
     SERVER_PORT,
     SERVER_HOST,
-    SEARCH_MODE
+    SEARCH_MODE,
+    SEARCH_PAGE_SIZE,
+    SESSION_CACHE_TTL,
+    INDEX_RELOAD_INTERVAL
 )
 
 from utils.get_database import fetch_all_messages
@@ -26,20 +34,44 @@ from utils.logger import setup_logger
 
 logger = setup_logger("server")
 
-session_cache = {}
+# сессия -> {(запрос, шарды, версия индекса): выдача}; сессии упорядочены по последнему обращению
+session_cache: Dict[str, Dict[Tuple, List]] = {}
+session_used: "OrderedDict[str, float]" = OrderedDict()
+
+
+async def watch_index():
+    """
+    Раз в INDEX_RELOAD_INTERVAL секунд проверяет, не опубликовал ли create_FAISS
+    новую версию индекса, и подменяет её без перезапуска сервера. Новая версия
+    загружается в отдельном потоке, запросы в это время обслуживает прежняя.
+    """
+    while True:
+        await asyncio.sleep(INDEX_RELOAD_INTERVAL)
+        try:
+            if await asyncio.to_thread(backend.search_FAISS.reload_if_changed):
+                # выдачи прежней версии в кэше сессий больше не совпадут по ключу и уйдут при следующем обращении
+                logger.info("FAISS index reloaded")
+        except Exception as e:
+            logger.error(f"Error reloading FAISS index, keeping the current one: {str(e)}\n{traceback.format_exc()}")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     Жизненный цикл приложения FastAPI:
-    инициализация FAISS-ресурсов при запуске и логирование завершения при остановке.
+    инициализация FAISS-ресурсов при запуске, слежение за новыми версиями индекса
+    и логирование завершения при остановке.
     """
     logger.info("Starting application lifespan")
-    if SEARCH_MODE == "FAISS":
+    watcher = None
+    if SEARCH_MODE in ("FAISS", "HYBRID"):
         backend.search_FAISS.init_resources()
+        if INDEX_RELOAD_INTERVAL:
+            watcher = asyncio.create_task(watch_index())
     logger.info("FAISS resources initialized successfully")
     yield
+    if watcher is not None:
+        watcher.cancel()
     logger.info("Application shutdown completed")
 
 
@@ -78,6 +110,18 @@ async def init437721():
     return {"status": "ok"}
 
 
+@app.get("/search_stats")
+async def search_stats():
+    """
+    Глубина очередей стадий поиска (кодирование запросов, FAISS): сколько запросов
+    ждут места, стоят в очереди пула и выполняются.
+
+    Returns:
+        dict: Счётчики по стадиям.
+    """
+    return backend.search_FAISS.stage_stats() if SEARCH_MODE in ("FAISS", "HYBRID") else {}
+
+
 @app.get("/get_all_nodes/{session_id}/{page_number}")
 async def get_all_nodes(session_id: str, page_number: int = 1, request: Request = None):
     """
@@ -128,65 +172,129 @@ async def get_all_nodes(session_id: str, page_number: int = 1, request: Request
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
 
+def session_entries(session_id: str, version: Any) -> Dict[Tuple, List]:
+    """
+    Кэш выдач сессии. Ключ выдачи содержит версию индекса, поэтому после перезагрузки
+    индекса поиск идёт заново, а выдачи прежних версий удаляются из сессии при её
+    следующем обращении. Сессии без обращений дольше SESSION_CACHE_TTL удаляются целиком.
+    """
+    now = time.monotonic()
+    while session_used:
+        oldest, used = next(iter(session_used.items()))
+        if now - used <= SESSION_CACHE_TTL:
+            break
+        session_used.popitem(last=False)
+        session_cache.pop(oldest, None)
+
+    session_used[session_id] = now
+    session_used.move_to_end(session_id)
+    entries = {key: value for key, value in session_cache.get(session_id, {}).items() if key[2] == version}
+    session_cache[session_id] = entries
+    return entries
+
+
+def ranked_entries(nodes: List[dict], highlights: List[Any]) -> List[Tuple[Any, float, Any]]:
+    """
+    Выдача в виде для кэша сессии: (ссылка на запись, score, highlight). Результаты
+    FAISS/HYBRID хранятся ссылками "ref" на записи индекса, тексты не держатся в памяти;
+    записи без ссылки (режим LLM) хранятся как есть.
+    """
+    return [(node.get("ref", node), node["score"], hl) for node, hl in zip(nodes, highlights)]
+
+
+def hydrate_page(entries: List[Tuple[Any, float, Any]]) -> List[dict]:
+    """Читает записи одной страницы выдачи и собирает их для фронтенда."""
+    refs = [item for item, _, _ in entries if isinstance(item, tuple)]
+    loaded = iter(backend.search_FAISS.load_records(refs) if refs else [])
+
+    results = []
+    for item, score, hl in entries:
+        node = next(loaded) if isinstance(item, tuple) else item
+        media_url = None
+        if node["media_path"]:
+            media_path = os.path.join(DATA_PATH, str(node["media_path"]))
+            if os.path.exists(media_path):
+                media_url = f"/media/{os.path.basename(media_path)}"
+
+        results.append({
+            "date": node["date"],
+            "text": node["content"],
+            "author": node["author"],
+            "score": score,
+            "hl": hl if hl else [],
+            "photo": media_url
+        })
+    return results
+
+
 @app.get("/get_relevant_nodes/{session_id}/{query}")
-async def get_relevant_nodes(session_id: str, query: str, request: Request = None):
+async def get_relevant_nodes(session_id: str, query: str, shards: Optional[str] = None, page: Optional[int] = None,
+                             page_size: int = SEARCH_PAGE_SIZE, request: Request = None):
     """
-    Возвращает релевантные записи на основе запроса, включая подсвеченные фрагменты.
+    Возвращает страницу релевантных записей на основе запроса, включая подсвеченные фрагменты.
+
+    Поиск выполняется один раз на (сессия, запрос): ранжированный список записей
+    сохраняется в кэше сессии, а следующие страницы берутся из него, и тексты
+    читаются только для записей запрошенной страницы. Без page отдаётся вся выдача
+    одним списком, как раньше (клиенты, которые не знают о страницах).
 
     Args:
         session_id (str): Идентификатор пользовательской сессии.
         query (str): Поисковый запрос.
+        shards (str): Необязательный список шардов индекса через запятую (?shards=about),
+            по умолчанию поиск идёт по всем.
+        page (int): Номер страницы, начиная с 1; если не указан — вся выдача.
+        page_size (int): Записей на странице (по умолчанию SEARCH_PAGE_SIZE).
         request (Request): Объект запроса.
 
     Returns:
-        JSONResponse: Результаты поиска с подсветкой.
+        JSONResponse: Записи страницы с подсветкой, общее число записей и номер
+            следующей страницы (next_page, null на последней).
     """
     logger.info(
-        f"GET /get_relevant_nodes/{session_id}/'{query}' - Client IP: {request.client.host if request else 'unknown'}")
+        f"GET /get_relevant_nodes/{session_id}/'{query}' page {page} - "
+        f"Client IP: {request.client.host if request else 'unknown'}")
 
     try:
-        if session_id not in session_cache:
-            session_cache[session_id] = {}
-
-        if query in session_cache[session_id]:
-            nodes, highlights = session_cache[session_id][query]
-            session_cache[session_id] = {query: (nodes, highlights)}
+        shard_names = sorted({s.strip() for s in shards.split(",") if s.strip()}) if shards else None
+        version = backend.search_FAISS.index_version() if SEARCH_MODE in ("FAISS", "HYBRID") else None
+        cache_key = (query, tuple(shard_names) if shard_names else None, version)
+        session = session_entries(session_id, version)
+
+        if cache_key in session:
+            entries = session[cache_key]
+            session_cache[session_id] = {cache_key: entries}
         else:
-            if SEARCH_MODE == "FAISS":
-                nodes, highlights = await backend.search_FAISS.full_pipeline(query)
+            if SEARCH_MODE in ("FAISS", "HYBRID"):
+                nodes, highlights = await backend.search_FAISS.full_pipeline(query, shard_names)
             else:
                 if SEARCH_MODE == "LLM":
                     nodes, highlights = await backend.search_LLM.full_pipeline(query)
                 else:
                     raise ValueError("ОШИБКА ПОЛУЧЕНИЯ ПАЙПЛАЙНА")
-            session_cache[session_id][query] = (nodes, highlights)
+            entries = ranked_entries(nodes, highlights)
+            # за время поиска кэш сессии мог смениться — пишем в актуальный
+            session_entries(session_id, version)[cache_key] = entries
 
-        results = []
-
-        for idx, node in enumerate(nodes):
-            media_url = None
-            if node["media_path"]:
-                media_path = os.path.join(DATA_PATH, str(node["media_path"]))
-                if os.path.exists(media_path):
-                    media_url = f"/media/{os.path.basename(media_path)}"
-
-            logger.info(f"[FASTAPI/GET_RELEVANT_NODES] Хайлайт {highlights[idx]} для {idx} записи.")
-            results.append({
-                "date": node["date"],
-                "text": node["content"],
-                "author": node["author"],
-                "score": node["score"],
-                "hl":  highlights[idx] if highlights[idx] else [],
-                "photo": media_url
-            })
+        if page is None:
+            page, page_size = 1, max(len(entries), 1)
+        else:
+            page, page_size = max(page, 1), max(page_size, 1)
+        start = (page - 1) * page_size
+        end = start + page_size
+        results = hydrate_page(entries[start:end])
 
         response = {
             "data": results,
-            "count": len(nodes),
+            "count": len(entries),
+            "page": page,
+            "page_size": page_size,
+            "next_page": page + 1 if end < len(entries) else None,
             "session_id": session_id
         }
 
-        logger.info(f"[FASTAPI/GET_RELEVANT_NODES] На фронтенд уходит {len(results)} записей по запросу '{query}'")
+        logger.info(f"[FASTAPI/GET_RELEVANT_NODES] На фронтенд уходит {len(results)} из {len(entries)} записей "
+                    f"(страница {page}) по запросу '{query}'")
         return JSONResponse(content=response)
 
     except Exception as e:
@@ -112,6 +112,8 @@ RUSSIAN_INTERJECTIONS_AND_CONJUNCTIONS = [
     "от"
 ]
 
+INTERJECTIONS = frozenset(RUSSIAN_INTERJECTIONS_AND_CONJUNCTIONS + ENGLISH_INTERJECTIONS_AND_CONJUNCTIONS)
+
 
 def remove_interjections_singlewords(strings):
     pass
@@ -127,7 +129,7 @@ def remove_interjections(strings):
         A new list of strings with interjections removed.
     """
 
-    inter=RUSSIAN_INTERJECTIONS_AND_CONJUNCTIONS + ENGLISH_INTERJECTIONS_AND_CONJUNCTIONS
+    inter=INTERJECTIONS
     s2=[]
     for string in strings:
         arr = string.split()
@@ -0,0 +1,110 @@
+import json
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+_WHITESPACE = " \t\n\r"
+
+
+class _Reader:
+    """Буфер поверх текстового файла: JSON-значения разбираются по одному, прочитанное отбрасывается."""
+
+    def __init__(self, f, buffer_size: int):
+        self.f = f
+        self.buffer_size = buffer_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, size: int) -> bool:
+        if self.eof:
+            return False
+        data = self.f.read(size)
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Следующий непробельный символ ('' — конец файла)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill(self.buffer_size):
+                return ""
+
+    def expect(self, chars: str) -> str:
+        ch = self.peek()
+        if not ch or ch not in chars:
+            raise ValueError(f"ожидался один из символов {chars!r}, получено {ch!r}")
+        self.pos += 1
+        return ch
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # значение обрезано границей буфера; буфер растёт вдвое, чтобы большое значение
+                # не разбиралось заново на каждом чтении
+                if not self._fill(max(self.buffer_size, len(self.buf))):
+                    raise
+                continue
+            # число на границе буфера могло прочитаться не целиком
+            if end == len(self.buf) and self._fill(self.buffer_size):
+                continue
+            self.pos = end
+            return value
+
+
+# маркер начала значения ключа в _walk
+_KEY = object()
+
+
+def _walk(path: str, buffer_size: int) -> Iterator[Tuple[str, Any]]:
+    """(ключ, _KEY) в начале каждого значения и (ключ, элемент) для элементов массивов."""
+    with open(path, "r", encoding="utf-8") as f:
+        reader = _Reader(f, buffer_size)
+        reader.expect("{")
+        if reader.peek() == "}":
+            return
+        while True:
+            key = reader.value()
+            reader.expect(":")
+            yield key, _KEY
+            if reader.peek() != "[":
+                reader.value()
+            else:
+                reader.expect("[")
+                if reader.peek() == "]":
+                    reader.pos += 1
+                else:
+                    while True:
+                        yield key, reader.value()
+                        if reader.expect(",]") == "]":
+                            break
+            if reader.expect(",}") == "}":
+                return
+
+
+def iter_json_arrays(path: str, keys: Optional[Iterable[str]] = None,
+                     buffer_size: int = 1 << 20) -> Iterator[Tuple[str, Any]]:
+    """
+    Потоково читает JSON-объект вида {ключ: [элементы]} и отдаёт пары (ключ, элемент)
+    в порядке файла, не загружая файл целиком: в памяти только буфер и текущий элемент.
+    keys ограничивает ключи, элементы которых нужны (остальные разбираются и отбрасываются).
+    Значения, не являющиеся массивами, пропускаются.
+    """
+    keys = None if keys is None else set(keys)
+    for key, item in _walk(path, buffer_size):
+        if item is not _KEY and (keys is None or key in keys):
+            yield key, item
+
+
+def json_keys(path: str, buffer_size: int = 1 << 20) -> List[str]:
+    """Ключи верхнего уровня JSON-объекта в порядке файла (потоковый проход, как iter_json_arrays)."""
+    return [key for key, item in _walk(path, buffer_size) if item is _KEY]
@@ -0,0 +1,68 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+
+
+class SqliteLRU:
+    """
+    Ограниченный по числу записей LRU-кэш «строка -> bytes» в файле SQLite.
+
+    Переживает перезапуски; при переполнении удаляются записи, к которым дольше
+    всего не обращались. Одно соединение на объект, доступ из нескольких потоков
+    сериализуется блокировкой. max_items = 0 — без ограничения.
+    """
+
+    def __init__(self, path: str, max_items: int = 10000):
+        self.path = path
+        self.max_items = max_items
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                         "used INTEGER NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS cache_used ON cache (used)")
+        self._count = self._db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        """Найденные значения по ключам; найденные записи становятся самыми свежими."""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        found = {}
+        with self._lock:
+            # SQLite ограничивает число параметров запроса
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                rows = self._db.execute(f"SELECT key, value FROM cache WHERE key IN ({','.join('?' * len(part))})",
+                                        part).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time_ns()
+                self._db.executemany("UPDATE cache SET used = ? WHERE key = ?", [(now, key) for key in found])
+        return found
+
+    def put_many(self, items: List[Tuple[str, bytes]]):
+        if not items:
+            return
+        now = time.time_ns()
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany("INSERT OR REPLACE INTO cache (key, value, used) VALUES (?, ?, ?)",
+                                 [(key, value, now) for key, value in items])
+            self._count = self._db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            if self.max_items and self._count > self.max_items:
+                self._db.execute("DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY used LIMIT ?)",
+                                 (self._count - self.max_items,))
+                self._count = self.max_items
+            self._db.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            self._db.close()